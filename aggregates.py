@@ -0,0 +1,110 @@
+import json
+
+import atomic
+import money
+
+
+# Bumped when the bucket format changes so stale files are rebuilt; totals are integer cents.
+FORMAT = 2
+
+
+class Aggregates:
+    def __init__(self, data=None):
+        self.format = data.get("format") if data else FORMAT
+        data = data or {}
+        self.stamp = data.get("stamp")
+        self.expenses_by_category = dict(data.get("expenses_by_category", {}))
+        self.expenses_by_month = dict(data.get("expenses_by_month", {}))
+        self.income_by_source = dict(data.get("income_by_source", {}))
+        self.income_by_month = dict(data.get("income_by_month", {}))
+
+    @classmethod
+    def build(cls, expenses, income):
+        aggregates = cls()
+        for row in expenses:
+            aggregates.add("expense", row)
+        for row in income:
+            aggregates.add("income", row)
+        return aggregates
+
+    def _bump(self, buckets, key, amount, count):
+        total, rows = buckets.get(key, (0, 0))
+        rows += count
+        if rows <= 0:
+            buckets.pop(key, None)
+        else:
+            buckets[key] = (total + amount, rows)
+
+    def _apply(self, transaction_type, row, sign):
+        amount = money.to_cents(row.get("Amount") or 0) * sign
+        month = str(row.get("Date", ""))[:7]
+        if transaction_type.startswith("expense"):
+            self._bump(self.expenses_by_category, row.get("Category", ""), amount, sign)
+            self._bump(self.expenses_by_month, month, amount, sign)
+        else:
+            self._bump(self.income_by_source, row.get("Source", ""), amount, sign)
+            self._bump(self.income_by_month, month, amount, sign)
+
+    def add(self, transaction_type, row):
+        self._apply(transaction_type, row, 1)
+
+    def remove(self, transaction_type, row):
+        self._apply(transaction_type, row, -1)
+
+    def replace(self, transaction_type, old_row, new_row):
+        self.remove(transaction_type, old_row)
+        self.add(transaction_type, new_row)
+
+    def _cents(self, buckets):
+        return sum(total for total, _ in buckets.values())
+
+    @property
+    def total_expenses(self):
+        return money.from_cents(self._cents(self.expenses_by_category))
+
+    @property
+    def total_income(self):
+        return money.from_cents(self._cents(self.income_by_source))
+
+    @property
+    def net_balance(self):
+        return money.from_cents(self._cents(self.income_by_source) - self._cents(self.expenses_by_category))
+
+    def category_totals(self):
+        return {category: money.from_cents(total) for category, (total, _) in self.expenses_by_category.items()}
+
+    def spent(self, category):
+        return money.from_cents(self.expenses_by_category.get(category, (0, 0))[0])
+
+    def budget_status(self, budgets):
+        return [(category, money.from_cents(limit), self.spent(category)) for category, limit in budgets.items()]
+
+    def to_dict(self):
+        return {
+            "stamp": self.stamp,
+            "format": self.format,
+            "expenses_by_category": self.expenses_by_category,
+            "expenses_by_month": self.expenses_by_month,
+            "income_by_source": self.income_by_source,
+            "income_by_month": self.income_by_month,
+        }
+
+
+def load(path, stamp, rebuild):
+    try:
+        with open(path, "r") as file:
+            aggregates = Aggregates(json.load(file))
+        if aggregates.stamp == stamp and aggregates.format == FORMAT:
+            return aggregates
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    aggregates = rebuild()
+    save(path, aggregates, stamp)
+    return aggregates
+
+
+def save(path, aggregates, stamp):
+    aggregates.stamp = stamp
+    aggregates.format = FORMAT
+    # Derived data: it is rebuilt whenever the stamp does not match, so skip the fsync.
+    atomic.write_json(path, aggregates.to_dict(), durable=False)
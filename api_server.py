@@ -0,0 +1,515 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import cache
+import expense
+import locking
+import metrics
+import money
+import rates
+import sqlite_store
+import txlog
+
+
+STATIC_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_FILES = {
+    "/": ("index.html", "text/html; charset=utf-8"),
+    "/index.html": ("index.html", "text/html; charset=utf-8"),
+}
+METRICS_PATH = "/metrics"
+METRICS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+MAX_BODY = 1024 * 1024
+SESSION_TTL = 12 * 60 * 60
+PAGE_SIZE = 100
+TYPES = {
+    "expenses": ("expense", expense.EXPENSE_FIELDS),
+    "income": ("income", expense.INCOME_FIELDS),
+}
+REASONS = {
+    200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+static_cache = cache.FileCache()
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def read_bytes(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def parse_day(value, field="date"):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"{field} must be YYYY-MM-DD") from None
+
+
+def make_row(payload, transaction_type, base=None):
+    base = base or {}
+    label_field = "Category" if transaction_type == "expense" else "Source"
+    date = payload.get("date") or base.get("Date") or datetime.now().strftime("%Y-%m-%d")
+    parse_day(date)
+
+    currency = str(payload.get("currency") or base.get("Currency") or rates.BASE_CURRENCY).upper()
+    if currency not in rates.table():
+        raise HTTPError(400, f"Unknown currency: {currency}")
+
+    try:
+        amount = money.to_cents(payload["amount"] if "amount" in payload else base.get("Original_Amount"))
+    except (TypeError, ValueError):
+        raise HTTPError(400, "amount must be a number") from None
+
+    label = str(payload.get(label_field.lower()) or base.get(label_field) or "").strip()
+    if not label:
+        raise HTTPError(400, f"{label_field.lower()} is required")
+    notes = str(payload.get("notes", base.get("Notes", "")))
+    return expense.make_transaction(transaction_type, date, label, amount, currency, notes)
+
+
+def transaction_json(index, row):
+    return {
+        "id": index + 1,
+        "date": row["Date"],
+        "label": row.get("Category", row.get("Source")),
+        "amount": row["Amount"],
+        "original_amount": row["Original_Amount"],
+        "currency": row["Currency"],
+        "notes": row["Notes"],
+    }
+
+
+class UserState:
+    # One per logged-in user; the ledgers themselves live in expense's caches and stay warm between requests.
+    def __init__(self, username):
+        self.username = username
+        self.lock = asyncio.Lock()
+        self._key = None
+        self._totals = None
+        self._reports = {}
+
+    def warm(self):
+        self.ledger("expenses")
+        self.ledger("income")
+        self.budgets()
+        self.totals()
+
+    def ledger(self, data_type):
+        return expense.load_ledger(self.username, data_type)
+
+    def budgets(self):
+        return expense.load_user_data(self.username, "budgets")
+
+    def budget_limits(self):
+        return {category: money.from_cents(limit) for category, limit in self.budgets().items()}
+
+    def version(self):
+        return locking.read_version(expense.user_dir(self.username), self.username)
+
+    def totals(self):
+        # Any process that writes bumps the version, so it doubles as the cache key for derived data.
+        key = (self.version(), expense.ledger_stamp(self.username))
+        if key != self._key:
+            self._totals = expense.load_aggregates(self.username)
+            self._reports = {}
+            self._key = key
+        return self._totals
+
+    def _save_totals(self, totals, version):
+        expense.save_aggregates(self.username, totals, version + 1)
+        self._reports = {}
+        if self.version() == version + 1:
+            # Only this write happened since the totals were loaded, so they are still current.
+            self._key = (version + 1, expense.ledger_stamp(self.username))
+
+    def summary(self):
+        totals = self.totals()
+        if totals is None:
+            spent, earned = sqlite_store.net_totals(expense.ledger_db(), self.username)
+        else:
+            spent, earned = totals.total_expenses, totals.total_income
+        balance = money.from_cents(money.to_cents(earned) - money.to_cents(spent))
+        return {"total_expenses": spent, "total_income": earned, "net_balance": balance}
+
+    def transactions(self, data_type, query):
+        transactions = self.ledger(data_type)
+        start = parse_day(query["start"], "start").toordinal() if query.get("start") else None
+        end = parse_day(query["end"], "end").toordinal() if query.get("end") else None
+        labels = [name.strip() for name in query.get("label", "").split(",") if name.strip()] or None
+        text = query.get("text") or None
+        if start is None and end is None and labels is None and text is None:
+            indices = range(len(transactions))
+        else:
+            indices = transactions.query(start, end, labels, text)
+        try:
+            offset = max(int(query.get("offset", 0)), 0)
+            limit = max(min(int(query.get("limit", PAGE_SIZE)), 10 * PAGE_SIZE), 0)
+        except ValueError:
+            raise HTTPError(400, "offset and limit must be integers") from None
+        page = indices[offset:offset + limit]
+        return {"total": len(indices), "items": [transaction_json(index, transactions.row(index)) for index in page]}
+
+    def add(self, data_type, payload):
+        transaction_type, fieldnames = TYPES[data_type]
+        row = make_row(payload, transaction_type)
+        version = self.version()
+        totals = self.totals()
+        if not expense.append_user_data(self.username, row, data_type, fieldnames):
+            raise HTTPError(500, "Could not save the transaction")
+        if totals is not None:
+            totals.add(transaction_type, row)
+            self._save_totals(totals, version)
+        transactions = self.ledger(data_type)
+        return transaction_json(len(transactions) - 1, transactions.row(len(transactions) - 1))
+
+    def _existing(self, data_type, number):
+        transactions = self.ledger(data_type)
+        index = number - 1
+        if not 0 <= index < len(transactions):
+            raise HTTPError(404, f"No {TYPES[data_type][0]} with id {number}")
+        return index, transactions.row(index)
+
+    def update(self, data_type, number, payload):
+        transaction_type, fieldnames = TYPES[data_type]
+        version = self.version()
+        totals = self.totals()
+        index, previous = self._existing(data_type, number)
+        row = make_row(payload, transaction_type, previous)
+        if not expense.patch_user_data(self.username, index, row, data_type, fieldnames, previous, version):
+            raise HTTPError(409, "This record was changed by another session. Please try again.")
+        if totals is not None:
+            totals.replace(transaction_type, previous, row)
+            self._save_totals(totals, version)
+        return transaction_json(index, self.ledger(data_type).row(index))
+
+    def delete(self, data_type, number):
+        transaction_type, fieldnames = TYPES[data_type]
+        version = self.version()
+        totals = self.totals()
+        index, previous = self._existing(data_type, number)
+        if not expense.remove_user_data(self.username, index, data_type, fieldnames, previous, version):
+            raise HTTPError(409, "This record was changed by another session. Please try again.")
+        if totals is not None:
+            totals.remove(transaction_type, previous)
+            self._save_totals(totals, version)
+        return {"deleted": number}
+
+    def set_budget(self, category, payload):
+        try:
+            limit = money.to_cents(payload["limit"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPError(400, "limit must be a number") from None
+        version = self.version()
+        budgets = self.budgets()
+        loaded = dict(budgets)
+        budgets[category] = limit
+        if not expense.save_budgets(self.username, budgets, loaded, version):
+            raise HTTPError(500, "Could not save the budget")
+        return self.budget_limits()
+
+    def delete_budget(self, category):
+        version = self.version()
+        budgets = self.budgets()
+        if category not in budgets:
+            raise HTTPError(404, f"No budget for {category}")
+        loaded = dict(budgets)
+        del budgets[category]
+        if not expense.save_budgets(self.username, budgets, loaded, version):
+            raise HTTPError(500, "Could not save the budget")
+        return self.budget_limits()
+
+    def budget_status(self, currency):
+        status = expense.budget_status(self.ledger("expenses"), self.budgets(), self.username, self.totals(), currency)
+        return [{"category": category, "limit": limit, "spent": spent, "remaining": limit - spent}
+                for category, limit, spent in status]
+
+    def report(self, currency, window):
+        import reports
+
+        self.totals()
+        budgets = self.budgets()
+        key = (currency, window, tuple(sorted(budgets.items())))
+        if key not in self._reports:
+            self._reports[key] = reports.build_report(self.ledger("expenses"), self.ledger("income"), budgets,
+                                                      window, currency)
+        return self._reports[key]
+
+    def bills(self, days):
+        return expense.bills_due(self.ledger("expenses"), self.username, days, upcoming_only=True)
+
+
+class ApiServer:
+    def __init__(self, static_dir=STATIC_DIR, workers=4):
+        self.static_dir = static_dir
+        self.sessions = {}
+        self.users = {}
+        # File I/O and ledger work run here so one slow load does not stall every connection.
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self.routes = [
+            ("POST", re.compile(r"/api/login"), self.login),
+            ("POST", re.compile(r"/api/logout"), self.logout),
+            ("GET", re.compile(r"/api/currencies"), self.currencies),
+            ("GET", re.compile(r"/api/summary"), self.summary),
+            ("GET", re.compile(r"/api/(expenses|income)"), self.list_transactions),
+            ("POST", re.compile(r"/api/(expenses|income)"), self.add_transaction),
+            ("PUT", re.compile(r"/api/(expenses|income)/(\d+)"), self.update_transaction),
+            ("DELETE", re.compile(r"/api/(expenses|income)/(\d+)"), self.delete_transaction),
+            ("GET", re.compile(r"/api/budgets"), self.list_budgets),
+            ("GET", re.compile(r"/api/budgets/status"), self.budget_status),
+            ("PUT", re.compile(r"/api/budgets/([^/]+)"), self.set_budget),
+            ("DELETE", re.compile(r"/api/budgets/([^/]+)"), self.delete_budget),
+            ("GET", re.compile(r"/api/report"), self.report),
+            ("GET", re.compile(r"/api/bills"), self.bills),
+        ]
+
+    async def run(self, state, func, *args):
+        async with state.lock:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def user(self, headers):
+        token = headers.get("authorization", "").removeprefix("Bearer ").strip()
+        session = self.sessions.get(token)
+        if session is None or session[1] < time.time():
+            self.sessions.pop(token, None)
+            raise HTTPError(401, "Login required")
+        return self.users[session[0]]
+
+    async def login(self, request):
+        payload = request["json"]
+        username = str(payload.get("username", ""))
+        record = await asyncio.get_running_loop().run_in_executor(self.executor, expense.users_dir.get, username)
+        if not record or record["password"] != expense.hash_password(str(payload.get("password", ""))):
+            raise HTTPError(401, "Invalid username or password")
+        state = self.users.get(username)
+        if state is None:
+            state = self.users[username] = UserState(username)
+        await self.run(state, state.warm)
+        token = secrets.token_urlsafe(24)
+        now = time.time()
+        # Expired tokens are swept whenever a new one is issued, so the table only holds live sessions.
+        for expired in [key for key, session in self.sessions.items() if session[1] < now]:
+            del self.sessions[expired]
+        self.sessions[token] = (username, now + SESSION_TTL)
+        return 200, {"token": token, "username": username}
+
+    async def logout(self, request):
+        self.user(request["headers"])
+        self.sessions.pop(request["headers"]["authorization"].removeprefix("Bearer ").strip(), None)
+        return 200, {"logged_out": True}
+
+    async def currencies(self, request):
+        return 200, {"base": rates.BASE_CURRENCY, "currencies": rates.table().currencies}
+
+    async def summary(self, request):
+        state = self.user(request["headers"])
+        return 200, await self.run(state, state.summary)
+
+    async def list_transactions(self, request, data_type):
+        state = self.user(request["headers"])
+        return 200, await self.run(state, state.transactions, data_type, request["query"])
+
+    async def add_transaction(self, request, data_type):
+        state = self.user(request["headers"])
+        return 201, await self.run(state, state.add, data_type, request["json"])
+
+    async def update_transaction(self, request, data_type, number):
+        state = self.user(request["headers"])
+        return 200, await self.run(state, state.update, data_type, int(number), request["json"])
+
+    async def delete_transaction(self, request, data_type, number):
+        state = self.user(request["headers"])
+        return 200, await self.run(state, state.delete, data_type, int(number))
+
+    async def list_budgets(self, request):
+        state = self.user(request["headers"])
+        return 200, await self.run(state, state.budget_limits)
+
+    async def set_budget(self, request, category):
+        state = self.user(request["headers"])
+        return 200, await self.run(state, state.set_budget, unquote(category), request["json"])
+
+    async def delete_budget(self, request, category):
+        state = self.user(request["headers"])
+        return 200, await self.run(state, state.delete_budget, unquote(category))
+
+    def currency(self, request):
+        currency = request["query"].get("currency", rates.BASE_CURRENCY).upper()
+        if currency not in rates.table():
+            raise HTTPError(400, f"Unknown currency: {currency}")
+        return currency
+
+    async def budget_status(self, request):
+        state = self.user(request["headers"])
+        return 200, await self.run(state, state.budget_status, self.currency(request))
+
+    async def report(self, request):
+        state = self.user(request["headers"])
+        try:
+            window = max(int(request["query"].get("window", 3)), 1)
+        except ValueError:
+            raise HTTPError(400, "window must be an integer") from None
+        return 200, await self.run(state, state.report, self.currency(request), window)
+
+    async def bills(self, request):
+        state = self.user(request["headers"])
+        try:
+            days = int(request["query"].get("days", 7))
+        except ValueError:
+            raise HTTPError(400, "days must be an integer") from None
+        return 200, await self.run(state, state.bills, days)
+
+    def static(self, path):
+        name, content_type = STATIC_FILES[path]
+        return content_type, static_cache.get(os.path.join(self.static_dir, name), read_bytes)
+
+    async def dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        if method == "GET" and url.path in STATIC_FILES:
+            content_type, content = self.static(url.path)
+            return 200, content_type, content
+        if method == "GET" and url.path == METRICS_PATH:
+            return 200, METRICS_TYPE, metrics.render().encode("utf-8")
+
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.fullmatch(url.path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            request = {
+                "headers": headers,
+                "query": {key: values[-1] for key, values in parse_qs(url.query).items()},
+                "json": {},
+            }
+            if body:
+                try:
+                    request["json"] = json.loads(body)
+                except ValueError:
+                    raise HTTPError(400, "Request body must be JSON") from None
+                if not isinstance(request["json"], dict):
+                    raise HTTPError(400, "Request body must be a JSON object")
+            started = time.perf_counter()
+            try:
+                status, payload = await handler(request, *match.groups())
+            except Exception:
+                metrics.observe("api_" + handler.__name__, time.perf_counter() - started, error=True)
+                raise
+            metrics.observe("api_" + handler.__name__, time.perf_counter() - started)
+            return status, "application/json", json.dumps(payload).encode("utf-8")
+        if allowed:
+            raise HTTPError(405, f"{method} is not allowed on {url.path}")
+        raise HTTPError(404, f"Not found: {url.path}")
+
+    async def respond(self, method, target, headers, body):
+        try:
+            return await self.dispatch(method, target, headers, body)
+        except HTTPError as e:
+            status, message = e.status, str(e)
+        except Exception as e:
+            print(f"Error handling {method} {target}: {e!r}", file=sys.stderr)
+            status, message = 500, "Internal server error"
+        return status, "application/json", json.dumps({"error": message}).encode("utf-8")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    # The body cannot be skipped without a valid length, so the connection is closed after replying.
+                    status, content_type = 400, "application/json"
+                    content = json.dumps({"error": "Invalid Content-Length"}).encode("utf-8")
+                    keep_alive = False
+                elif length > MAX_BODY:
+                    status, content_type = 413, "application/json"
+                    content = json.dumps({"error": "Request body too large"}).encode("utf-8")
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, content_type, content = await self.respond(method, target, headers, body)
+
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(content)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + content)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        address = server.sockets[0].getsockname()
+        print(f"Serving on http://{address[0]}:{address[1]}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the expense tracker as a local HTTP/JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--data-dir", default=expense.DATA_DIR)
+    parser.add_argument("--workers", type=int, default=4, help="threads for file and ledger work")
+    parser.add_argument("--profile", metavar="PATH", help="write cProfile and tracemalloc reports to PATH.prof/.txt on exit")
+    parser.add_argument("--metrics", metavar="FILE", default=metrics.METRICS_FILE,
+                        help=f"also keep the {METRICS_PATH} text in FILE")
+    args = parser.parse_args()
+
+    expense.use_data_dir(args.data_dir)
+    os.makedirs(args.data_dir, exist_ok=True)
+    txlog.start_compactor()
+    metrics.start_exporter(args.metrics)
+    profiler = metrics.Profiler(args.profile).start() if args.profile else None
+    try:
+        asyncio.run(ApiServer(workers=args.workers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        txlog.compact_all()
+        if profiler:
+            profiler.stop()
+
+
+if __name__ == "__main__":
+    main()
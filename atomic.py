@@ -0,0 +1,110 @@
+import atexit
+import json
+import os
+import threading
+
+import metrics
+
+
+# Journal appends are visible at once but fsynced together at most this many seconds later.
+SYNC_WINDOW = float(os.environ.get("EXPENSE_SYNC_WINDOW", "0.05"))
+
+
+def fsync_dir(directory):
+    try:
+        fd = os.open(directory or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, write, newline=None, encoding="utf-8", durable=True, binary=False):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if binary:
+            file = open(tmp_path, "wb")
+        else:
+            file = open(tmp_path, "w", newline=newline, encoding=encoding)
+        with file:
+            write(file)
+            if durable:
+                file.flush()
+                os.fsync(file.fileno())
+        metrics.add_bytes("write", path, os.path.getsize(tmp_path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if durable:
+        fsync_dir(os.path.dirname(path))
+
+
+def write_json(path, data, durable=True, **kwargs):
+    write_atomic(path, lambda file: json.dump(data, file, **kwargs), durable=durable)
+
+
+class GroupCommit:
+    def __init__(self, window=SYNC_WINDOW):
+        self.window = window
+        self.commits = 0
+        self.syncs = 0
+        self._dirty = set()
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def append(self, path, data):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, data)
+            metrics.add_bytes("write", path, len(data))
+            if self.window <= 0:
+                os.fsync(fd)
+                self.syncs += 1
+        finally:
+            os.close(fd)
+        self.commits += 1
+        if self.window > 0:
+            with self._lock:
+                self._dirty.add(path)
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            paths, self._dirty = self._dirty, set()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+            except FileNotFoundError:
+                # Compacted into a snapshot, which was fsynced when it was written.
+                continue
+            try:
+                os.fsync(fd)
+                self.syncs += 1
+            finally:
+                os.close(fd)
+
+
+journal_commits = GroupCommit()
+atexit.register(journal_commits.flush)
+
+
+def append_durable(path, data):
+    journal_commits.append(path, data)
+
+
+def flush():
+    journal_commits.flush()
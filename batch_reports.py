@@ -0,0 +1,140 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import ledger
+import money
+import rates
+import reports
+import user_directory
+
+
+def load_budgets(path):
+    try:
+        with open(path, "r") as file:
+            return money.parse_amounts(json.load(file))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_csv(path, report, bills):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Section", "Key", "Amount", "Limit", "Remaining"])
+        for category, total in report["categories"].items():
+            writer.writerow(["category", category, f"{total:.2f}", "", ""])
+        for source, total in report["sources"].items():
+            writer.writerow(["source", source, f"{total:.2f}", "", ""])
+        for month, total in report["monthly_expenses"].items():
+            writer.writerow(["month", month, f"{total:.2f}", "", ""])
+        for budget in report["budgets"]:
+            writer.writerow(["budget", budget["category"], f"{budget['spent']:.2f}",
+                             f"{budget['limit']:.2f}", f"{budget['remaining']:.2f}"])
+        for bill in bills:
+            writer.writerow(["bill", f"{bill['Date']} {bill['Category']}", f"{bill['Amount']:.2f}", "", ""])
+
+
+def load_ledger(data_dir, filename, transaction_type, start=None, end=None):
+    if not filename:
+        return ledger.Ledger(transaction_type)
+    path = os.path.join(data_dir, filename)
+    if start is None:
+        return ledger.load(path, transaction_type)
+    # Partitioned ledgers read only the partitions in range; trim to the exact days.
+    return ledger.between(ledger.load_window(path, transaction_type, start, end), start, end)
+
+
+def run_user(username, record, data_dir, out_dir, today, days, currency=rates.BASE_CURRENCY, month_only=False):
+    started = time.perf_counter()
+    expense_file = user_directory.data_file(record, "expenses")
+    income_file = user_directory.data_file(record, "income")
+    budgets_file = user_directory.data_file(record, "budgets")
+    due = (today + timedelta(days=days)).toordinal()
+    start = end = None
+    if month_only:
+        start, end = ledger.month_range(today)
+
+    expenses = load_ledger(data_dir, expense_file, "expense", start, max(end, due) if month_only else None)
+    income = load_ledger(data_dir, income_file, "income", start, end)
+    budgets = load_budgets(os.path.join(data_dir, budgets_file)) if budgets_file else {}
+
+    bills = ledger.upcoming_bills(expenses, due, start)
+    if month_only:
+        expenses = ledger.between(expenses, start, end)
+    report = reports.build_report(expenses, income, budgets, currency=currency)
+    report["user"] = username
+    report["generated_for"] = today.strftime("%Y-%m-%d")
+    report["upcoming_bills"] = bills
+
+    with open(os.path.join(out_dir, f"{username}_report.json"), "w") as file:
+        json.dump(report, file, indent=4)
+    write_csv(os.path.join(out_dir, f"{username}_report.csv"), report, bills)
+
+    return username, len(expenses) + len(income), time.perf_counter() - started
+
+
+def _run_chunk(chunk, data_dir, out_dir, today, days, currency=rates.BASE_CURRENCY, month_only=False):
+    rates.use_data_dir(data_dir)
+    results = []
+    for username, record in chunk:
+        try:
+            results.append(run_user(username, record, data_dir, out_dir, today, days, currency, month_only))
+        except Exception as e:
+            results.append((username, -1, str(e)))
+    return results
+
+
+def run_all(data_dir, out_dir, workers=None, chunk_size=16, today=None, days=7, currency=rates.BASE_CURRENCY,
+            month_only=False):
+    os.makedirs(out_dir, exist_ok=True)
+    today = today or datetime.now()
+    users = list(user_directory.open_directory(data_dir).all().items())
+    chunks = [users[i:i + chunk_size] for i in range(0, len(users), chunk_size)]
+
+    results = []
+    if workers == 1:
+        for chunk in chunks:
+            results.extend(_run_chunk(chunk, data_dir, out_dir, today, days, currency, month_only))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_chunk, chunk, data_dir, out_dir, today, days, currency, month_only)
+                   for chunk in chunks]
+        for future in futures:
+            results.extend(future.result())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate month-end reports for every registered user")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--out-dir", default="reports")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=16, help="users per task sent to a worker")
+    parser.add_argument("--date", help="report date (YYYY-MM-DD), defaults to today")
+    parser.add_argument("--days", type=int, default=7, help="bill reminder window in days")
+    parser.add_argument("--currency", default=rates.BASE_CURRENCY, help="report totals in this currency")
+    parser.add_argument("--month-only", action="store_true",
+                        help="report only the month of --date (partitioned ledgers read just that month)")
+    args = parser.parse_args()
+
+    today = datetime.strptime(args.date, "%Y-%m-%d") if args.date else None
+    started = time.perf_counter()
+    results = run_all(args.data_dir, args.out_dir, args.workers, args.chunk_size, today, args.days,
+                      args.currency.upper(), args.month_only)
+    elapsed = time.perf_counter() - started
+
+    failed = [(username, error) for username, rows, error in results if rows < 0]
+    rows = sum(result[1] for result in results if result[1] > 0)
+    print(f"Reported {len(results) - len(failed)} users ({rows} transactions) in {elapsed:.2f}s "
+          f"with {args.workers} workers")
+    for username, error in failed:
+        print(f"Failed {username}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from multiprocessing import Pool
+from urllib.parse import urlsplit
+
+import bench_suite
+
+
+# (weight, method, path, body): mostly reads, the way the front-end polls, with a trickle of writes.
+MIX = [
+    (30, "GET", "/api/summary", None),
+    (25, "GET", "/api/expenses?limit=50", None),
+    (15, "GET", "/api/report", None),
+    (15, "GET", "/api/budgets/status", None),
+    (10, "GET", "/api/bills", None),
+    (5, "POST", "/api/expenses", {"category": "Load test", "amount": "12.34", "currency": "KES"}),
+]
+
+
+async def request(reader, writer, method, path, token=None, body=None):
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(payload)}\r\n"
+    if token:
+        head += f"Authorization: Bearer {token}\r\n"
+    writer.write(head.encode("latin-1") + b"\r\n" + payload)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def client(host, port, token, deadline, seed, samples, errors):
+    rng = random.Random(seed)
+    weights = [weight for weight, *_ in MIX]
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            _, method, path, body = rng.choices(MIX, weights)[0]
+            started = time.perf_counter()
+            status, _ = await request(reader, writer, method, path, token, body)
+            samples[f"{method} {path.split('?')[0]}"].append((time.perf_counter() - started) * 1000)
+            if status >= 400:
+                errors[status] += 1
+    finally:
+        writer.close()
+
+
+async def drive(host, port, token, connections, duration, seed):
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client(host, port, token, deadline, seed * 1000 + n, samples, errors)
+                           for n in range(connections)))
+    return dict(samples), dict(errors)
+
+
+def run_process(args):
+    return asyncio.run(drive(*args))
+
+
+async def login(host, port, username, password):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        status, body = await request(reader, writer, "POST", "/api/login",
+                                     body={"username": username, "password": password})
+    finally:
+        writer.close()
+    if status != 200:
+        raise SystemExit(f"Login failed ({status}): {body.decode()}")
+    return json.loads(body)["token"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(data_dir, port, workers):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api_server.py"),
+         "--port", str(port), "--data-dir", data_dir, "--workers", str(workers)],
+        stdout=subprocess.PIPE, text=True)
+    line = server.stdout.readline()
+    if not line.startswith("Serving on"):
+        server.kill()
+        raise SystemExit("API server failed to start")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the HTTP API with keep-alive clients")
+    parser.add_argument("--url", help="test a running server instead of starting one on generated data")
+    parser.add_argument("--username", default=bench_suite.USERNAME)
+    parser.add_argument("--password", default=bench_suite.PASSWORD)
+    parser.add_argument("--rows", type=int, default=10000, help="expense rows to generate for the local server")
+    parser.add_argument("--connections", type=int, default=64, help="connections per client process")
+    parser.add_argument("--processes", type=int, default=2, help="client processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--workers", type=int, default=4, help="server worker threads")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    base = server = None
+    try:
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            base = tempfile.mkdtemp(prefix="expense-api-")
+            data_dir = os.path.join(base, "data")
+            bench_suite.generate(data_dir, args.rows)
+            host, port = "127.0.0.1", free_port()
+            server = start_server(data_dir, port, args.workers)
+
+        token = asyncio.run(login(host, port, args.username, args.password))
+        with Pool(args.processes) as pool:
+            results = pool.map(run_process, [(host, port, token, args.connections, args.duration, seed)
+                                             for seed in range(args.processes)])
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if base is not None:
+            shutil.rmtree(base, ignore_errors=True)
+
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    for process_samples, process_errors in results:
+        for name, values in process_samples.items():
+            samples[name].extend(values)
+        for status, count in process_errors.items():
+            errors[status] += count
+
+    total = sum(len(values) for values in samples.values())
+    connections = args.connections * args.processes
+    print(f"{total:,} requests over {connections} connections in {args.duration:.0f}s: "
+          f"{total / args.duration:,.0f} req/s, {sum(errors.values())} errors {dict(errors) or ''}")
+    print(f"{'Endpoint':<26} {'Requests':>9} {'p50 (ms)':>10} {'p90 (ms)':>10} {'p99 (ms)':>10} {'Max (ms)':>10}")
+    print("-" * 80)
+    summary = {}
+    for name, values in sorted(samples.items()):
+        stats = summary[name] = bench_suite.summarize(values)
+        print(f"{name:<26} {stats['samples']:>9,} {stats['p50_ms']:>10.2f} {stats['p90_ms']:>10.2f} "
+              f"{stats['p99_ms']:>10.2f} {stats['max_ms']:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({
+                "commit": bench_suite.git_commit(),
+                "rows": None if args.url else args.rows,
+                "connections": connections,
+                "duration": args.duration,
+                "requests_per_second": total / args.duration,
+                "errors": errors,
+                "endpoints": summary,
+            }, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
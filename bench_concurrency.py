@@ -0,0 +1,134 @@
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+import expense
+import locking
+import txlog
+import user_directory
+
+
+USERNAME = "bench"
+
+
+def setup(base, seed_rows):
+    data_dir = os.path.join(base, expense.DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    user_directory.UserDirectory(os.path.join(data_dir, expense.USERS_FILE)).put(USERNAME, {
+        "password": "",
+        "data_files": {
+            "expenses": f"{USERNAME}_expenses.csv",
+            "income": f"{USERNAME}_income.csv",
+            "budgets": f"{USERNAME}_budgets.json",
+        },
+    })
+    rows = [{"Date": "2025-01-01", "Category": "Food", "Amount": "1.0", "Original_Amount": "1.00 KES",
+             "Notes": f"seed-{i}"} for i in range(seed_rows)]
+    txlog.write_snapshot(os.path.join(data_dir, f"{USERNAME}_expenses.csv"), rows, expense.EXPENSE_FIELDS)
+
+
+def writer(args):
+    worker, ops, think, seed = args
+    rng = random.Random(seed)
+    counts = Counter()
+    appended, updated = [], []
+    path = expense.user_data_path(USERNAME, "expenses")
+
+    # Conflicts are counted below; keep the CLI's retry message out of the table.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for n in range(ops):
+            counts.update(write_one(worker, n, rng, think, appended, updated))
+            if n % 50 == 49:
+                txlog.compact(path, expense.EXPENSE_FIELDS)
+
+    return counts, appended, updated
+
+
+def write_one(worker, n, rng, think, appended, updated):
+    version = locking.read_version(expense.user_dir(USERNAME), USERNAME)
+    transactions = expense.load_ledger(USERNAME, "expenses")
+    seeds = [i for i in range(len(transactions)) if transactions.notes[i].startswith("seed-")]
+    time.sleep(rng.uniform(0, think))
+
+    roll = rng.random()
+    if roll < 0.6 or not seeds:
+        note = f"add-{worker}-{n}"
+        row = {"Date": "2025-02-01", "Category": "Bench", "Amount": 2.0, "Original_Amount": "2.00 KES",
+               "Notes": note}
+        if expense.append_user_data(USERNAME, row, "expenses", expense.EXPENSE_FIELDS):
+            appended.append(note)
+            return ["add"]
+        return ["error"]
+
+    index = rng.choice(seeds)
+    previous = transactions.row(index)
+    if roll < 0.9:
+        row = dict(previous, Notes=f"upd-{worker}-{n}")
+        if expense.patch_user_data(USERNAME, index, row, "expenses", expense.EXPENSE_FIELDS, previous, version):
+            updated.append(row["Notes"])
+            return ["update"]
+    elif expense.remove_user_data(USERNAME, index, "expenses", expense.EXPENSE_FIELDS, previous, version):
+        return ["delete"]
+    return ["conflict"]
+
+
+def run(writers, ops, seed_rows, think):
+    base = tempfile.mkdtemp(prefix="expense-bench-")
+    cwd = os.getcwd()
+    try:
+        os.chdir(base)
+        setup(base, seed_rows)
+        started = time.perf_counter()
+        with Pool(writers) as pool:
+            results = pool.map(writer, [(worker, ops, think, worker) for worker in range(writers)])
+        elapsed = time.perf_counter() - started
+
+        counts = Counter()
+        appended, updated = [], []
+        for worker_counts, worker_appended, worker_updated in results:
+            counts.update(worker_counts)
+            appended.extend(worker_appended)
+            updated.extend(worker_updated)
+
+        notes = Counter(row["Notes"] for row in txlog.load_rows(expense.user_data_path(USERNAME, "expenses")))
+        expected = seed_rows + counts["add"] - counts["delete"]
+        lost = sum(1 for note in appended + updated if notes[note] != 1)
+        ok = sum(notes.values()) == expected and not lost
+        return counts, elapsed, ok, lost
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent writers against one user's ledger")
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--ops", type=int, default=200, help="operations per writer")
+    parser.add_argument("--seed-rows", type=int, default=1000)
+    parser.add_argument("--think-ms", type=float, default=2.0, help="max delay between reading and writing")
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'Writers':>7} {'Ops':>7} {'Seconds':>8} {'Ops/s':>8} {'Adds':>6} {'Updates':>8} {'Deletes':>8} "
+          f"{'Conflicts':>9}  Integrity")
+    print("-" * 84)
+    for writers in args.writers:
+        counts, elapsed, ok, lost = run(writers, args.ops, args.seed_rows, args.think_ms / 1000)
+        total = writers * args.ops
+        status = "ok" if ok else f"FAILED ({lost} lost writes)"
+        failures += not ok
+        print(f"{writers:>7} {total:>7} {elapsed:>8.2f} {total / elapsed:>8.0f} {counts['add']:>6} "
+              f"{counts['update']:>8} {counts['delete']:>8} {counts['conflict']:>9}  {status}")
+
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
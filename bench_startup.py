@@ -0,0 +1,76 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+# Cumulative import time budgets in milliseconds, as reported by -X importtime.
+BUDGETS = {
+    "expense": 150,
+    "expense_gui": 250,
+    "importer": 200,
+    "batch_reports": 400,
+}
+
+# Interactive entry points must not pull these in until a report or chart is requested.
+DEFERRED_MODULES = ["matplotlib", "numpy"]
+INTERACTIVE = ["expense", "expense_gui", "importer"]
+
+
+def import_profile(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    imported = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            imported[name.strip()] = int(cumulative) / 1000
+    return imported
+
+
+def wall_time(module, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], check=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check module import times against startup budgets")
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS))
+    parser.add_argument("--runs", type=int, default=5, help="interpreter launches per module for wall time")
+    args = parser.parse_args()
+
+    failures = 0
+    print(f"{'Module':<16} {'Import (ms)':>12} {'Budget (ms)':>12} {'Wall (ms)':>10}  Status")
+    print("-" * 64)
+    for module in args.modules:
+        imported = import_profile(module)
+        cumulative = imported.get(module, 0.0)
+        budget = BUDGETS.get(module)
+        leaked = [name for name in DEFERRED_MODULES if name in imported]
+        status = "ok"
+        if budget is not None and cumulative > budget:
+            status = "over budget"
+        if leaked and module in INTERACTIVE:
+            status = f"eagerly imports {', '.join(leaked)}"
+        if status != "ok":
+            failures += 1
+        print(f"{module:<16} {cumulative:>12.1f} {budget or '-':>12} {wall_time(module, args.runs):>10.1f}  {status}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
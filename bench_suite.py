@@ -0,0 +1,290 @@
+import argparse
+import contextlib
+import csv
+import getpass
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from multiprocessing import Pool
+
+import expense
+import locking
+import user_directory
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+USERNAME = "bench"
+PASSWORD = "bench"
+SCALES = [1000, 10000, 100000]
+CATEGORIES = ["Food", "Transport", "Rent", "Electricity Bill", "Water Bill", "Internet Bill", "Entertainment",
+              "Health", "Education", "Shopping"]
+SOURCES = ["Salary", "Freelance", "Dividends", "Rental", "Gifts"]
+CURRENCIES = ["KES"] * 6 + ["USD", "EUR", "GBP"]
+CHUNK = 100000
+
+
+def write_rows(path, fieldnames, count, labels, rng, start, days):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(fieldnames)
+        for offset in range(0, count, CHUNK):
+            chunk = []
+            for n in range(offset, min(offset + CHUNK, count)):
+                currency = rng.choice(CURRENCIES)
+                original = rng.randint(100, 5000000)
+                amount = original if currency == "KES" else original * 130
+                chunk.append((date.fromordinal(start + rng.randrange(days)).isoformat(), rng.choice(labels),
+                              f"{amount // 100}.{amount % 100:02d}", f"{original // 100}.{original % 100:02d}",
+                              currency, f"synthetic {n}"))
+            writer.writerows(chunk)
+
+
+def generate(data_dir, rows, users=1, seed=0):
+    # Same layout the CLI creates: users.json plus per-user expense/income CSVs and a budgets file.
+    # Only the first user gets a ledger; the rest exist to give users.json a realistic size.
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    today = date.today().toordinal()
+    start, days = today - 730, 738
+
+    records = {}
+    for n in range(users):
+        username = USERNAME if n == 0 else f"{USERNAME}{n}"
+        records[username] = {
+            "password": expense.hash_password(PASSWORD),
+            "data_files": {
+                "expenses": f"{username}_expenses.csv",
+                "income": f"{username}_income.csv",
+                "budgets": f"{username}_budgets.json",
+            },
+        }
+    user_directory.UserDirectory(os.path.join(data_dir, expense.USERS_FILE)).replace_all(records)
+
+    write_rows(os.path.join(data_dir, f"{USERNAME}_expenses.csv"), expense.EXPENSE_FIELDS, rows,
+               CATEGORIES, rng, start, days)
+    write_rows(os.path.join(data_dir, f"{USERNAME}_income.csv"), expense.INCOME_FIELDS, max(rows // 4, 1),
+               SOURCES, rng, start, days)
+    with open(os.path.join(data_dir, f"{USERNAME}_budgets.json"), "w") as file:
+        # Roughly what each category spends over the two years, so some budgets end up over.
+        per_category = rows * 30000 // len(CATEGORIES)
+        json.dump({category: rng.randint(per_category * 8, per_category * 12) // 10 for category in CATEGORIES}, file)
+    return USERNAME
+
+
+@contextlib.contextmanager
+def scripted(*answers):
+    # Drive the interactive CLI: input() reads from stdin, and getpass is pointed at the same script.
+    stdin, prompt = sys.stdin, getpass.getpass
+    sys.stdin = io.StringIO("".join(f"{answer}\n" for answer in answers))
+    getpass.getpass = lambda text="": input(text)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        sys.stdin, getpass.getpass = stdin, prompt
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def percentile(ordered, p):
+    position = (len(ordered) - 1) * p / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "samples": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered),
+        "p50_ms": percentile(ordered, 50),
+        "p90_ms": percentile(ordered, 90),
+        "p99_ms": percentile(ordered, 99),
+        "max_ms": ordered[-1],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def measure(func, repeat, budget, warmup):
+    for _ in range(warmup):
+        func()
+    samples = []
+    started = time.perf_counter()
+    # Large ledgers get fewer samples: stop once the time budget is spent, but keep at least three.
+    while len(samples) < repeat and (len(samples) < 3 or time.perf_counter() - started < budget):
+        began = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - began) * 1000)
+    return summarize(samples)
+
+
+def operations(username):
+    state = {}
+
+    def session():
+        state["expenses"] = expense.load_ledger(username, "expenses")
+        state["budgets"] = expense.load_user_data(username, "budgets")
+        state["totals"] = expense.load_aggregates(username)
+
+    def login():
+        with scripted(username, PASSWORD):
+            if expense.login() != username:
+                raise RuntimeError("login failed against the generated users.json")
+
+    def load_user_data():
+        expense.session_cache.invalidate()
+        for data_type in ("expenses", "income", "budgets"):
+            state[data_type + "_rows"] = expense.load_user_data(username, data_type)
+
+    def load_ledger():
+        expense.ledger_cache.invalidate()
+        session()
+
+    def save_user_data():
+        expense.save_user_data(username, state["expenses_rows"], "expenses", expense.EXPENSE_FIELDS)
+
+    def check_budget():
+        with scripted():
+            expense.check_budget(state["expenses"], state["budgets"], username, state["totals"])
+
+    def generate_report():
+        with scripted("n"):
+            expense.generate_report(state["expenses"], username, state["totals"])
+
+    def check_bill_reminders():
+        with scripted():
+            expense.check_bill_reminders(state["expenses"], username)
+
+    def add_transaction():
+        # One pass of main menu option 1: add, append, refresh aggregates, reload for the next menu.
+        version = locking.read_version(expense.user_dir(username), username)
+        with scripted("", 1, "123.45", "bench", "Food"):
+            row = expense.add_transaction("expense", state["totals"])
+            if expense.append_user_data(username, row, "expenses", expense.EXPENSE_FIELDS):
+                expense.save_aggregates(username, state["totals"], version + 1)
+        session()
+
+    return [login, load_user_data, load_ledger, save_user_data, check_budget, generate_report,
+            check_bill_reminders, add_transaction], session
+
+
+def run_scale(rows, users, repeat, budget, warmup, seed):
+    base = tempfile.mkdtemp(prefix="expense-suite-")
+    cwd = os.getcwd()
+    try:
+        os.chdir(base)
+        started = time.perf_counter()
+        username = generate(expense.DATA_DIR, rows, users, seed)
+        generated = time.perf_counter() - started
+
+        ops, session = operations(username)
+        session()
+        results = {}
+        for op in ops:
+            results[op.__name__] = measure(op, repeat, budget, warmup)
+        return {
+            "rows": rows,
+            "users": users,
+            "generate_seconds": generated,
+            "peak_rss_mb": peak_rss_mb(),
+            "operations": results,
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(base, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def compare(results, baseline, threshold):
+    previous = {scale["rows"]: scale["operations"] for scale in baseline.get("scales", [])}
+    regressions = 0
+    print(f"\nAgainst {baseline.get('commit') or 'baseline'} (p50, flagged above {threshold:.2f}x)")
+    for scale in results["scales"]:
+        before = previous.get(scale["rows"])
+        if not before:
+            continue
+        for name, stats in scale["operations"].items():
+            old = before.get(name)
+            if not old or not old["p50_ms"]:
+                continue
+            ratio = stats["p50_ms"] / old["p50_ms"]
+            flag = "REGRESSED" if ratio > threshold else ""
+            regressions += bool(flag)
+            print(f"{scale['rows']:>10,} {name:<22} {old['p50_ms']:>10.2f} -> {stats['p50_ms']:>10.2f} "
+                  f"{ratio:>6.2f}x  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the core CLI paths against synthetic ledgers")
+    parser.add_argument("--rows", type=int, nargs="+", default=SCALES, help="expense rows per scale (1k to 10M)")
+    parser.add_argument("--users", type=int, default=100, help="accounts in users.json")
+    parser.add_argument("--repeat", type=int, default=20, help="max samples per operation")
+    parser.add_argument("--budget", type=float, default=10.0, help="seconds per operation before sampling stops")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.25, help="p50 slowdown counted as a regression")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scales": [],
+    }
+    for rows in args.rows:
+        # A fresh process per scale so peak RSS belongs to that scale alone.
+        with Pool(1) as pool:
+            scale = pool.apply(run_scale, (rows, args.users, args.repeat, args.budget, args.warmup, args.seed))
+        results["scales"].append(scale)
+
+        rss = f"{scale['peak_rss_mb']:.0f} MB" if scale["peak_rss_mb"] is not None else "n/a"
+        print(f"\n{rows:,} rows (generated in {scale['generate_seconds']:.1f}s, peak RSS {rss})")
+        print(f"{'Operation':<22} {'N':>4} {'p50 (ms)':>10} {'p90 (ms)':>10} {'p99 (ms)':>10} {'Max (ms)':>10}")
+        print("-" * 70)
+        for name, stats in scale["operations"].items():
+            print(f"{name:<22} {stats['samples']:>4} {stats['p50_ms']:>10.2f} {stats['p90_ms']:>10.2f} "
+                  f"{stats['p99_ms']:>10.2f} {stats['max_ms']:>10.2f}")
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=4)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)
+        raise SystemExit(1 if compare(results, baseline, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
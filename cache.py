@@ -0,0 +1,65 @@
+import os
+import threading
+
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class FileCache:
+    def __init__(self, watched=None):
+        self.watched = watched or (lambda path: (path,))
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def signature(self, path):
+        return tuple(file_signature(p) for p in self.watched(path))
+
+    def get(self, path, loader):
+        with self._lock:
+            signature = self.signature(path)
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            value = loader(path)
+            self._entries[path] = (signature, value)
+            return value
+
+    def store(self, path, value):
+        with self._lock:
+            self._entries[path] = (self.signature(path), value)
+
+    def record_write(self, path, before, apply):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == before:
+                apply(entry[1])
+                self._entries[path] = (self.signature(path), entry[1])
+            else:
+                self._entries.pop(path, None)
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,156 @@
+import json
+import mmap
+import sys
+from array import array
+
+import atomic
+import metrics
+
+SUFFIX = ".cols"
+MAGIC = b"LEDGCOL1"
+VERSION = 1
+NUMERIC_COLUMNS = [("dates", "i"), ("amounts", "q"), ("labels", "i"), ("original_amounts", "q"), ("currencies", "i")]
+
+
+def snapshot_path(path):
+    return path + SUFFIX
+
+
+class StringColumn:
+    # Notes as dictionary codes into a utf-8 blob; strings are decoded on access and new ones kept aside.
+    def __init__(self, codes, offsets, blob):
+        self.codes = codes
+        self.offsets = offsets
+        self.blob = blob
+        self.extra = []
+
+    def _thaw(self):
+        if isinstance(self.codes, memoryview):
+            codes = array("i")
+            codes.frombytes(self.codes.cast("B"))
+            self.codes = codes
+
+    def _code(self, value):
+        self.extra.append(value)
+        return len(self.offsets) - 2 + len(self.extra)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        code = self.codes[index]
+        if code < len(self.offsets) - 1:
+            return str(self.blob[self.offsets[code]:self.offsets[code + 1]], "utf-8")
+        return self.extra[code - len(self.offsets) + 1]
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def __setitem__(self, index, value):
+        self._thaw()
+        self.codes[index] = self._code(value)
+
+    def append(self, value):
+        self._thaw()
+        self.codes.append(self._code(value))
+
+    def pop(self, index=-1):
+        self._thaw()
+        value = self[index]
+        self.codes.pop(index)
+        return value
+
+
+def _note_dictionary(notes):
+    codes = array("i")
+    lookup = {}
+    for note in notes:
+        code = lookup.get(note)
+        if code is None:
+            code = lookup[note] = len(lookup)
+        codes.append(code)
+    offsets = array("q", [0])
+    encoded = [note.encode("utf-8") for note in lookup]
+    position = 0
+    for value in encoded:
+        position += len(value)
+        offsets.append(position)
+    return codes, offsets, b"".join(encoded)
+
+
+def write(path, ledger, source):
+    codes, offsets, blob = _note_dictionary(ledger.notes)
+    blocks = [(name, getattr(ledger, name)) for name, _ in NUMERIC_COLUMNS]
+    blocks += [("notes", codes), ("note_offsets", offsets), ("note_blob", blob)]
+
+    header = {
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "transaction_type": ledger.transaction_type,
+        "source": list(source),
+        "rows": len(ledger),
+        "label_names": ledger.label_names,
+        "currency_names": ledger.currency_names,
+        "raw_dates": {str(index): raw for index, raw in ledger.raw_dates.items()},
+        "columns": {},
+    }
+    # Block offsets depend on the header length, so the header is padded and laid out again if it outgrows that.
+    sizes = [memoryview(data).nbytes for _, data in blocks]
+    prefix = len(json.dumps(header)) + 64 * len(blocks)
+    while True:
+        position = len(MAGIC) + 8 + prefix
+        for (name, _), size in zip(blocks, sizes):
+            position += -position % 8
+            header["columns"][name] = [position, size]
+            position += size
+        encoded = json.dumps(header).encode("utf-8")
+        if len(encoded) <= prefix:
+            break
+        prefix = len(encoded)
+    encoded = encoded.ljust(prefix)
+
+    def write_blocks(file):
+        file.write(MAGIC)
+        file.write(len(encoded).to_bytes(8, "little"))
+        file.write(encoded)
+        for (name, data), size in zip(blocks, sizes):
+            file.write(b"\0" * (header["columns"][name][0] - file.tell()))
+            file.write(data)
+
+    atomic.write_atomic(snapshot_path(path), write_blocks, durable=False, binary=True)
+
+
+def read(path, transaction_type, source):
+    # Returns zero-copy views over the mapped snapshot, or None when it is missing, stale or unreadable.
+    try:
+        with open(snapshot_path(path), "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        if mapped[:len(MAGIC)] != MAGIC:
+            return None
+        start = len(MAGIC) + 8
+        header = json.loads(mapped[start:start + int.from_bytes(mapped[len(MAGIC):start], "little")])
+        if (header.get("version") != VERSION or header.get("byteorder") != sys.byteorder
+                or header.get("transaction_type") != transaction_type or header.get("source") != list(source)):
+            return None
+
+        view = memoryview(mapped)
+
+        def column(name, typecode):
+            offset, size = header["columns"][name]
+            return view[offset:offset + size].cast(typecode)
+
+        columns = {name: column(name, typecode) for name, typecode in NUMERIC_COLUMNS}
+        if any(len(values) != header["rows"] for values in columns.values()):
+            return None
+        # Mapped rather than read: pages are only faulted in as the columns are touched.
+        metrics.add_bytes("mapped", snapshot_path(path), len(mapped))
+        columns["notes"] = StringColumn(column("notes", "i"), column("note_offsets", "q"), column("note_blob", "B"))
+        columns["label_names"] = header["label_names"]
+        columns["currency_names"] = header["currency_names"]
+        columns["raw_dates"] = {int(index): raw for index, raw in header["raw_dates"].items()}
+        return columns
+    except (ValueError, KeyError, TypeError):
+        return None
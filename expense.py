@@ -1,10 +1,22 @@
 import csv
 import json
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
 import getpass
 import hashlib
 import os
+import aggregates
+import atomic
+import cache
+import ledger
+import locking
+import metrics
+import money
+import partitions
+import plotting
+import rates
+import sqlite_store
+import txlog
+import user_directory
 
 
 DATA_DIR = "data"
@@ -12,37 +24,56 @@ EXPENSES_FILE = "expenses.csv"
 INCOME_FILE = "income.csv"
 BUDGETS_FILE = "budgets.json"
 USERS_FILE = "users.json"
+STORAGE_BACKEND = os.environ.get("EXPENSE_STORAGE", "csv")
 
+EXPENSE_FIELDS = ["Date", "Category", "Amount", "Original_Amount", "Currency", "Notes"]
+INCOME_FIELDS = ["Date", "Source", "Amount", "Original_Amount", "Currency", "Notes"]
 
-EXCHANGE_RATES = {
-    "KES": 1.0,    
-    "USD": 0.0078,   
-    "EUR": 0.0072,   
-    "GBP": 0.0062    
-}
+
+session_cache = cache.FileCache(txlog.watched)
+ledger_cache = ledger.LedgerCache()
+users_dir = user_directory.open_directory(DATA_DIR)
+
+
+def use_data_dir(path):
+    global DATA_DIR, users_dir
+    DATA_DIR = path
+    users_dir = user_directory.open_directory(DATA_DIR)
+    rates.use_data_dir(path)
+
+
+def user_dir(username):
+    return user_directory.user_root(DATA_DIR, username)
 
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 
+def read_json(path):
+    with open(path, "r") as file:
+        data = json.load(file)
+        metrics.add_bytes("read", path, file.tell())
+        return data
+
+
+def read_budgets(path):
+    return money.parse_amounts(read_json(path))
+
+
+@metrics.timed("load_users", metrics.result_rows)
 def load_users():
-    try:
-        with open(os.path.join(DATA_DIR, USERS_FILE), "r") as file:
-            return json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+    return users_dir.all()
 
 
+@metrics.timed("save_users", metrics.arg_rows(0))
 def save_users(users):
-    with open(os.path.join(DATA_DIR, USERS_FILE), "w") as file:
-        json.dump(users, file)
+    users_dir.replace_all(users)
 
 
 def register_user():
-    users = load_users()
     username = input("Enter username: ")
-    if username in users:
+    if username in users_dir:
         print("Username already exists!")
         return False
     
@@ -53,15 +84,14 @@ def register_user():
         print("Passwords don't match!")
         return False
     
-    users[username] = {
+    users_dir.put(username, {
         "password": hash_password(password),
         "data_files": {
-            "expenses": f"{username}_expenses.csv",
-            "income": f"{username}_income.csv",
-            "budgets": f"{username}_budgets.json"
+            "expenses": user_directory.user_file(DATA_DIR, username, f"{username}_expenses.csv"),
+            "income": user_directory.user_file(DATA_DIR, username, f"{username}_income.csv"),
+            "budgets": user_directory.user_file(DATA_DIR, username, f"{username}_budgets.json")
         }
-    }
-    save_users(users)
+    })
     
     
     initialize_user_data(username)
@@ -70,19 +100,19 @@ def register_user():
 
 
 def initialize_user_data(username):
-    users = load_users()
-    user_data = users[username]["data_files"]
+    user_data = users_dir.get(username)["data_files"]
+    os.makedirs(user_dir(username), exist_ok=True)
     
     
     if not os.path.exists(os.path.join(DATA_DIR, user_data["expenses"])):
         with open(os.path.join(DATA_DIR, user_data["expenses"]), "w", newline="") as file:
-            writer = csv.DictWriter(file, fieldnames=["Date", "Category", "Amount", "Original_Amount", "Notes"])
+            writer = csv.DictWriter(file, fieldnames=EXPENSE_FIELDS)
             writer.writeheader()
     
     
     if not os.path.exists(os.path.join(DATA_DIR, user_data["income"])):
         with open(os.path.join(DATA_DIR, user_data["income"]), "w", newline="") as file:
-            writer = csv.DictWriter(file, fieldnames=["Date", "Source", "Amount", "Original_Amount", "Notes"])
+            writer = csv.DictWriter(file, fieldnames=INCOME_FIELDS)
             writer.writeheader()
     
     
@@ -92,11 +122,11 @@ def initialize_user_data(username):
 
 
 def login():
-    users = load_users()
     username = input("Username: ")
     password = getpass.getpass("Password: ")
+    record = users_dir.get(username)
     
-    if username in users and users[username]["password"] == hash_password(password):
+    if record and record["password"] == hash_password(password):
         print("Login successful!")
         return username
     else:
@@ -104,106 +134,314 @@ def login():
         return None
 
 
-def load_user_data(username, data_type):
-    users = load_users()
-    if username not in users:
-        return []
+def user_data_path(username, data_type):
+    record = users_dir.get(username)
+    if not record:
+        return None
     
-    filename = users[username]["data_files"].get(data_type)
+    filename = user_directory.data_file(record, data_type)
     if not filename:
+        return None
+    
+    return os.path.join(DATA_DIR, filename)
+
+
+def ledger_db():
+    return sqlite_store.connect(os.path.join(DATA_DIR, sqlite_store.DB_FILE))
+
+
+def using_sqlite(username):
+    return STORAGE_BACKEND == "sqlite" and username in users_dir
+
+
+@metrics.timed("load_user_data", metrics.result_rows)
+def load_user_data(username, data_type):
+    if STORAGE_BACKEND == "sqlite":
+        if username not in users_dir:
+            return []
+        if data_type == "budgets":
+            return sqlite_store.load_budgets(ledger_db(), username)
+        return sqlite_store.load_rows(ledger_db(), username, data_type)
+    
+    filepath = user_data_path(username, data_type)
+    if not filepath:
         return []
     
     try:
         if data_type == "budgets":
-            with open(os.path.join(DATA_DIR, filename), "r") as file:
-                return json.load(file)
+            return dict(session_cache.get(filepath, read_budgets))
         else:
-            with open(os.path.join(DATA_DIR, filename), "r") as file:
-                reader = csv.DictReader(file)
-                return list(reader)
+            return list(session_cache.get(filepath, txlog.load_rows))
     except (FileNotFoundError, json.JSONDecodeError):
         return []
 
 
+@metrics.timed("save_user_data", metrics.arg_rows(1))
 def save_user_data(username, data, data_type, fieldnames=None):
-    users = load_users()
-    if username not in users:
-        return False
+    if using_sqlite(username):
+        if data_type == "budgets":
+            sqlite_store.save_budgets(ledger_db(), username, data)
+        else:
+            sqlite_store.replace_rows(ledger_db(), username, data_type, data)
+        return True
     
-    filename = users[username]["data_files"].get(data_type)
-    if not filename:
+    filepath = user_data_path(username, data_type)
+    if not filepath:
         return False
     
     try:
         if data_type == "budgets":
-            with open(os.path.join(DATA_DIR, filename), "w") as file:
-                json.dump(data, file)
+            atomic.write_json(filepath, money.format_amounts(data))
+            session_cache.store(filepath, dict(data))
         else:
-            with open(os.path.join(DATA_DIR, filename), "w", newline="") as file:
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(data)
+            txlog.write_snapshot(filepath, data, fieldnames)
+            session_cache.store(filepath, list(data))
         return True
     except Exception as e:
         print(f"Error saving data: {e}")
         return False
 
 
-def convert_currency(amount, from_currency, to_currency="KES"):
-    return amount * EXCHANGE_RATES[to_currency] / EXCHANGE_RATES[from_currency]
+@metrics.timed("load_ledger", metrics.result_rows)
+def load_ledger(username, data_type):
+    transaction_type = "expense" if data_type.startswith("expense") else "income"
+    if STORAGE_BACKEND == "sqlite":
+        return ledger.Ledger.from_rows(load_user_data(username, data_type), transaction_type)
+    
+    filepath = user_data_path(username, data_type)
+    if not filepath:
+        return ledger.Ledger(transaction_type)
+    
+    return ledger_cache.get(filepath, transaction_type)
+
+
+def load_window(username, data_type, start=None, end=None):
+    # Partitioned ledgers read only the months overlapping [start, end]; rows outside it may still be included.
+    filepath = None if STORAGE_BACKEND == "sqlite" else user_data_path(username, data_type)
+    if not filepath or not partitions.is_partitioned(filepath):
+        return load_ledger(username, data_type)
+    transaction_type = "expense" if data_type.startswith("expense") else "income"
+    return ledger.load_window(filepath, transaction_type, start, end)
 
 
-def add_transaction(transaction_type):
-    date = input(f"Date (YYYY-MM-DD) [Today: {datetime.now().strftime('%Y-%m-%d')}]: ") or datetime.now().strftime('%Y-%m-%d')
+def log_user_data(username, data_type, write):
+    filepath = user_data_path(username, data_type)
+    if not filepath:
+        return False
     
+    try:
+        before = session_cache.signature(filepath)
+        record = write(filepath)
+        session_cache.record_write(filepath, before, lambda rows: txlog.replay(rows, [record]))
+        return True
+    except OSError as e:
+        print(f"Error saving data: {e}")
+        return False
+
+
+def rebase_index(username, data_type, index, previous):
+    current = load_ledger(username, data_type)
+    if index < len(current) and current.row(index) == previous:
+        return index
+    for candidate in range(len(current)):
+        if current.row(candidate) == previous:
+            return candidate
+    return None
+
+
+def locked_write(username, write, data_type=None, index=None, previous=None, version=None):
+    with locking.user_lock(user_dir(username), username):
+        # Another session wrote since this one loaded, or a partitioned compaction regrouped rows by month:
+        # find the row again instead of trusting its old index.
+        if previous is not None and version is not None:
+            index = rebase_index(username, data_type, index, previous)
+            if index is None:
+                print("This record was changed by another session. Please try again.")
+                return False
+        if not write(index):
+            return False
+        locking.bump_version(user_dir(username), username)
+        return True
+
+
+@metrics.timed("append_user_data")
+def append_user_data(username, row, data_type, fieldnames):
+    def write(index):
+        if using_sqlite(username):
+            sqlite_store.insert_row(ledger_db(), username, data_type, row)
+            return True
+        return log_user_data(username, data_type, lambda path: txlog.log_add(path, row, fieldnames))
+    
+    return locked_write(username, write)
+
+
+@metrics.timed("patch_user_data")
+def patch_user_data(username, index, row, data_type, fieldnames, previous=None, version=None):
+    def write(index):
+        if using_sqlite(username):
+            sqlite_store.update_row(ledger_db(), username, data_type, index, row)
+            return True
+        return log_user_data(username, data_type, lambda path: txlog.log_update(path, index, row, fieldnames))
+    
+    return locked_write(username, write, data_type, index, previous, version)
+
+
+@metrics.timed("remove_user_data")
+def remove_user_data(username, index, data_type, fieldnames, previous=None, version=None):
+    def write(index):
+        if using_sqlite(username):
+            sqlite_store.delete_row(ledger_db(), username, data_type, index)
+            return True
+        return log_user_data(username, data_type, lambda path: txlog.log_delete(path, index, fieldnames))
+    
+    return locked_write(username, write, data_type, index, previous, version)
+
+
+@metrics.timed("save_budgets")
+def save_budgets(username, budgets, loaded, version=None):
+    with locking.user_lock(user_dir(username), username):
+        if version is not None and locking.read_version(user_dir(username), username) != version:
+            # Keep budgets another session set in the meantime; only this session's edits are applied.
+            current = load_user_data(username, "budgets")
+            for category in set(loaded) | set(budgets):
+                if budgets.get(category) != loaded.get(category):
+                    if category in budgets:
+                        current[category] = budgets[category]
+                    else:
+                        current.pop(category, None)
+            budgets = current
+        if not save_user_data(username, budgets, "budgets"):
+            return False
+        locking.bump_version(user_dir(username), username)
+        return True
+
+
+def aggregates_path(username):
+    return os.path.join(user_dir(username), f"{username}_aggregates.json")
+
+
+def ledger_stamp(username):
+    paths = [user_data_path(username, data_type) for data_type in ("expenses", "income")]
+    return repr([session_cache.signature(path) if path else None for path in paths])
+
+
+def load_aggregates(username):
+    if using_sqlite(username):
+        return None
+    return aggregates.load(
+        aggregates_path(username), ledger_stamp(username),
+        lambda: aggregates.Aggregates.build(load_ledger(username, "expenses"), load_ledger(username, "income")))
+
+
+def save_aggregates(username, totals, version=None):
+    if totals is None:
+        return
+    try:
+        with locking.user_lock(user_dir(username), username):
+            # Totals built before another session's write are stale; leave them to be rebuilt on the next load.
+            if version is None or locking.read_version(user_dir(username), username) == version:
+                aggregates.save(aggregates_path(username), totals, ledger_stamp(username))
+    except OSError as e:
+        print(f"Error saving data: {e}")
+
+
+def convert_currency(cents, from_currency, to_currency="KES", on=None):
+    return rates.convert_cents(cents, from_currency, to_currency, on)
+
+
+def make_transaction(transaction_type, date, label, amount, currency, notes=""):
+    # amount is in integer cents of `currency`; the stored KES amount uses the rate on `date`.
+    return {
+        "Date": date,
+        "Category" if transaction_type == "expense" else "Source": label,
+        "Amount": money.format_cents(convert_currency(amount, currency, "KES", date)),
+        "Original_Amount": money.format_cents(amount),
+        "Currency": currency,
+        "Notes": notes
+    }
+
+
+def read_date(prompt, default):
+    # Amounts are converted at the rate on this date, so it has to parse; ask again until it does.
+    while True:
+        value = input(prompt).strip() or default
+        try:
+            datetime.strptime(value, "%Y-%m-%d")
+            return value
+        except ValueError:
+            print("Invalid date! Use YYYY-MM-DD.")
+
+
+def add_transaction(transaction_type, totals=None):
+    today = datetime.now().strftime('%Y-%m-%d')
+    date = read_date(f"Date (YYYY-MM-DD) [Today: {today}]: ", today)
+    
+    currencies = rates.table().currencies
     print("\nSelect Currency:")
-    for i, currency in enumerate(EXCHANGE_RATES.keys(), 1):
+    for i, currency in enumerate(currencies, 1):
         print(f"{i}. {currency}")
-    currency_choice = int(input("Enter currency number (1-4): ")) - 1
-    currency = list(EXCHANGE_RATES.keys())[currency_choice]
+    currency_choice = int(input(f"Enter currency number (1-{len(currencies)}): ")) - 1
+    currency = currencies[currency_choice]
     
-    amount = float(input(f"Amount in {currency}: "))
-    amount_kes = convert_currency(amount, currency, "KES")
+    amount = money.to_cents(input(f"Amount in {currency}: "))
     notes = input("Notes: ")
 
     if transaction_type == "expense":
-        category = input("Category (Food, Bills, etc.): ")
-        return {
-            "Date": date, 
-            "Category": category, 
-            "Amount": amount_kes, 
-            "Original_Amount": f"{amount:.2f} {currency}",
-            "Notes": notes
-        }
+        label = input("Category (Food, Bills, etc.): ")
     else:
-        source = input("Source (Salary, Freelance, etc.): ")
-        return {
-            "Date": date, 
-            "Source": source, 
-            "Amount": amount_kes, 
-            "Original_Amount": f"{amount:.2f} {currency}",
-            "Notes": notes
-        }
+        label = input("Source (Salary, Freelance, etc.): ")
+    transaction = make_transaction(transaction_type, date, label, amount, currency, notes)
+    
+    if totals is not None:
+        totals.add(transaction_type, transaction)
+    return transaction
+
+
+def query_transactions(transactions, transaction_type):
+    label = "Category" if transaction_type == "expense" else "Source"
+    print("\nFilter (leave blank to show all)")
+    start = input("From date (YYYY-MM-DD): ").strip()
+    end = input("To date (YYYY-MM-DD): ").strip()
+    labels = input(f"{label}(s), comma separated: ").strip()
+    text = input("Notes contain: ").strip()
+    if not (start or end or labels or text):
+        return None
+    
+    try:
+        start = datetime.strptime(start, "%Y-%m-%d").toordinal() if start else None
+        end = datetime.strptime(end, "%Y-%m-%d").toordinal() if end else None
+    except ValueError:
+        print("Invalid date format! Showing all records.")
+        return None
+    
+    labels = [name.strip() for name in labels.split(",") if name.strip()] or None
+    return ledger.as_ledger(transactions, transaction_type).query(start, end, labels, text)
 
 
-def display_transactions(transactions, transaction_type):
+def display_transactions(transactions, transaction_type, indices=None):
     if not transactions:
         print(f"No {transaction_type} records found!")
         return
+    if indices is None:
+        indices = range(len(transactions))
+    elif not indices:
+        print(f"No {transaction_type} records match the filter!")
+        return
     
     print(f"\n{'ID':<5} {'Date':<12} {'Category/Source':<20} {'Amount (KES)':<15} {'Original Amount':<20} {'Notes':<20}")
     print("-" * 90)
-    for idx, trans in enumerate(transactions, 1):
+    for index in indices:
+        idx, trans = index + 1, transactions[index]
         if transaction_type == "expense":
-            print(f"{idx:<5} {trans['Date']:<12} {trans['Category']:<20} {float(trans['Amount']):<15.2f} {trans['Original_Amount']:<20} {trans['Notes']:<20}")
+            print(f"{idx:<5} {trans['Date']:<12} {trans['Category']:<20} {float(trans['Amount']):<15.2f} {ledger.original_text(trans):<20} {trans['Notes']:<20}")
         else:
-            print(f"{idx:<5} {trans['Date']:<12} {trans['Source']:<20} {float(trans['Amount']):<15.2f} {trans['Original_Amount']:<20} {trans['Notes']:<20}")
+            print(f"{idx:<5} {trans['Date']:<12} {trans['Source']:<20} {float(trans['Amount']):<15.2f} {ledger.original_text(trans):<20} {trans['Notes']:<20}")
 
 
-def update_transaction(transactions, transaction_type):
+def update_transaction(transactions, transaction_type, totals=None):
     display_transactions(transactions, transaction_type)
     if not transactions:
-        return False
+        return None
     
     try:
         trans_id = int(input(f"\nEnter ID of {transaction_type} to update (1-{len(transactions)}): ")) - 1
@@ -212,25 +450,27 @@ def update_transaction(transactions, transaction_type):
             print("Leave field blank to keep current value")
             
             transaction = transactions[trans_id]
+            previous = dict(transaction)
             
             
-            new_date = input(f"Date [{transaction['Date']}]: ") or transaction['Date']
+            new_date = read_date(f"Date [{transaction['Date']}]: ", transaction['Date'])
             
-            print("\nCurrent Currency:", transaction['Original_Amount'].split()[1])
+            current_amount, current_currency = txlog.split_original(transaction['Original_Amount'], transaction.get('Currency'))
+            print("\nCurrent Currency:", current_currency)
             print("Select New Currency:")
-            for i, currency in enumerate(EXCHANGE_RATES.keys(), 1):
+            currencies = rates.table().currencies
+            for i, currency in enumerate(currencies, 1):
                 print(f"{i}. {currency}")
-            currency_choice = input("Enter currency number (1-4) [Keep current]: ")
+            currency_choice = input(f"Enter currency number (1-{len(currencies)}) [Keep current]: ")
             if currency_choice:
                 currency_choice = int(currency_choice) - 1
-                currency = list(EXCHANGE_RATES.keys())[currency_choice]
+                currency = currencies[currency_choice]
             else:
-                currency = transaction['Original_Amount'].split()[1]
+                currency = current_currency
             
-            current_amount = float(transaction['Original_Amount'].split()[0])
-            new_amount = input(f"Amount [{current_amount:.2f}]: ")
-            new_amount = float(new_amount) if new_amount else current_amount
-            new_amount_kes = convert_currency(new_amount, currency, "KES")
+            new_amount = input(f"Amount [{money.format_cents(current_amount)}]: ")
+            new_amount = money.to_cents(new_amount) if new_amount else current_amount
+            new_amount_kes = convert_currency(new_amount, currency, "KES", new_date)
             
             if transaction_type == "expense":
                 new_category = input(f"Category [{transaction['Category']}]: ") or transaction['Category']
@@ -241,8 +481,9 @@ def update_transaction(transactions, transaction_type):
             
             
             transaction['Date'] = new_date
-            transaction['Amount'] = new_amount_kes
-            transaction['Original_Amount'] = f"{new_amount:.2f} {currency}"
+            transaction['Amount'] = money.format_cents(new_amount_kes)
+            transaction['Original_Amount'] = money.format_cents(new_amount)
+            transaction['Currency'] = currency
             transaction['Notes'] = new_notes
             
             if transaction_type == "expense":
@@ -250,20 +491,23 @@ def update_transaction(transactions, transaction_type):
             else:
                 transaction['Source'] = new_source
             
+            if totals is not None:
+                totals.replace(transaction_type, previous, transaction)
+            
             print(f"{transaction_type} updated successfully!")
-            return True
+            return trans_id
         else:
             print("Invalid ID!")
     except ValueError:
         print("Please enter a valid number!")
     
-    return False
+    return None
 
 
-def delete_transaction(transactions, transaction_type):
+def delete_transaction(transactions, transaction_type, totals=None):
     display_transactions(transactions, transaction_type)
     if not transactions:
-        return False
+        return None
     
     try:
         trans_id = int(input(f"\nEnter ID of {transaction_type} to delete (1-{len(transactions)}): ")) - 1
@@ -271,14 +515,16 @@ def delete_transaction(transactions, transaction_type):
             confirm = input(f"Are you sure you want to delete this {transaction_type}? (y/n): ").lower()
             if confirm == 'y':
                 deleted = transactions.pop(trans_id)
+                if totals is not None:
+                    totals.remove(transaction_type, deleted)
                 print(f"{transaction_type} deleted successfully!")
-                return True
+                return trans_id
         else:
             print("Invalid ID!")
     except ValueError:
         print("Please enter a valid number!")
     
-    return False
+    return None
 
 
 def display_budgets(budgets):
@@ -290,7 +536,7 @@ def display_budgets(budgets):
     print(f"{'ID':<5} {'Category':<20} {'Amount (KES)':<15}")
     print("-" * 40)
     for idx, (category, amount) in enumerate(budgets.items(), 1):
-        print(f"{idx:<5} {category:<20} {float(amount):<15.2f}")
+        print(f"{idx:<5} {category:<20} {money.from_cents(amount):<15.2f}")
 
 
 def update_budget(budgets):
@@ -302,9 +548,9 @@ def update_budget(budgets):
         budget_id = int(input("\nEnter ID of budget to update (1-{}): ".format(len(budgets)))) - 1
         if 0 <= budget_id < len(budgets):
             category = list(budgets.keys())[budget_id]
-            new_amount = input(f"New amount for {category} (KES) [Current: {budgets[category]}]: ")
+            new_amount = input(f"New amount for {category} (KES) [Current: {money.format_cents(budgets[category])}]: ")
             if new_amount:
-                budgets[category] = float(new_amount)
+                budgets[category] = money.to_cents(new_amount)
                 print("Budget updated successfully!")
                 return True
             else:
@@ -339,52 +585,117 @@ def delete_budget(budgets):
     return False
 
 
-def check_budget(expenses, budgets):
+def choose_currency():
+    currencies = rates.table().currencies
+    currency = input(f"Display currency ({'/'.join(currencies)}) [KES]: ").strip().upper() or "KES"
+    if currency not in currencies:
+        print("Unknown currency, showing KES.")
+        return "KES"
+    return currency
+
+
+def budget_status(expenses, budgets, username=None, totals=None, currency="KES"):
+    if currency != "KES":
+        import reports
+        status = [(budget["category"], budget["limit"], budget["spent"])
+                  for budget in reports.budget_utilisation(ledger.as_ledger(expenses, "expense"), budgets, currency)]
+    elif username and using_sqlite(username):
+        status = sqlite_store.budget_status(ledger_db(), username)
+    elif totals is not None:
+        status = totals.budget_status(budgets)
+    else:
+        import reports
+        spent = reports.label_totals(ledger.as_ledger(expenses, "expense"))
+        status = [(category, money.from_cents(limit), spent.get(category, 0.0)) for category, limit in budgets.items()]
+    return status
+
+
+@metrics.timed("check_budget")
+def check_budget(expenses, budgets, username=None, totals=None, currency="KES"):
     if not budgets:
         print("No budgets set yet!")
         return
 
-    for category, limit in budgets.items():
-        spent = sum(float(e["Amount"]) for e in expenses if e["Category"] == category)
-        print(f"{category}: KES {spent:.2f} / KES {limit:.2f} (KES {limit - spent:.2f} remaining)")
+    for category, limit, spent in budget_status(expenses, budgets, username, totals, currency):
+        print(f"{category}: {currency} {spent:.2f} / {currency} {limit:.2f} ({currency} {limit - spent:.2f} remaining)")
+
+
+def category_totals(expenses, username=None, totals=None, currency="KES"):
+    import reports
 
+    if currency != "KES":
+        return reports.label_totals(ledger.as_ledger(expenses, "expense"), currency)
+    elif username and using_sqlite(username):
+        return sqlite_store.category_totals(ledger_db(), username)
+    elif totals is not None:
+        return totals.category_totals()
+    return reports.label_totals(ledger.as_ledger(expenses, "expense"))
 
-def generate_report(expenses):
-    categories = {}
-    for expense in expenses:
-        category = expense["Category"]
-        amount = float(expense["Amount"])
-        categories[category] = categories.get(category, 0) + amount
 
-    print("\n📊 Monthly Spending Report (KES)")
+@metrics.timed("generate_report")
+def report_totals(expenses, username=None, totals=None, currency="KES", month_only=False):
+    import reports
+
+    if month_only:
+        # The running totals cover every month, so this month's categories come from its rows.
+        start, end = ledger.month_range(datetime.now())
+        window = load_window(username, "expenses", start, end) if username else ledger.as_ledger(expenses, "expense")
+        expenses = ledger.between(window, start, end)
+        categories = reports.label_totals(expenses, currency)
+    else:
+        categories = category_totals(expenses, username, totals, currency)
+    monthly = reports.monthly_totals(ledger.as_ledger(expenses, "expense"), currency=currency)
+    return categories, monthly, reports.rolling_average(monthly) if monthly else {}
+
+
+def generate_report(expenses, username=None, totals=None, currency="KES", month_only=False):
+    categories, monthly, rolling = report_totals(expenses, username, totals, currency, month_only)
+
+    print(f"\n📊 {'This Month' if month_only else 'Monthly'} Spending Report ({currency})")
     for category, total in categories.items():
-        print(f"{category}: KES {total:.2f}")
+        print(f"{category}: {currency} {total:.2f}")
+
+    if monthly:
+        print("\nBy Month (3-month average)")
+        for month, total in monthly.items():
+            print(f"{month}: {currency} {total:.2f} (avg {currency} {rolling[month]:.2f})")
 
     if input("\nShow chart? (y/n): ").lower() == "y":
-        plt.bar(categories.keys(), categories.values())
-        plt.title("Monthly Spending by Category (KES)")
-        plt.show()
+        plotting.show_bar_chart(categories, f"Monthly Spending by Category ({currency})")
 
 
-def check_bill_reminders(expenses):
+@metrics.timed("bills_due", metrics.result_rows)
+def bills_due(expenses, username=None, days=7, upcoming_only=False):
+    # The CLI has always listed overdue bills too; upcoming_only limits it to today onwards.
     today = datetime.now()
-    upcoming_bills = [
-        e for e in expenses
-        if "Bill" in e["Category"] and 
-        datetime.strptime(e["Date"], "%Y-%m-%d") <= today + timedelta(days=7)
-    ]
+    if username and using_sqlite(username):
+        end_date = (today + timedelta(days=days)).strftime("%Y-%m-%d")
+        start_date = today.strftime("%Y-%m-%d") if upcoming_only else None
+        return sqlite_store.upcoming_bills(ledger_db(), username, end_date, start_date)
+    end = (today + timedelta(days=days)).toordinal()
+    start = today.toordinal() if upcoming_only else None
+    if username:
+        expenses = load_window(username, "expenses", start, end)
+    return ledger.upcoming_bills(ledger.as_ledger(expenses, "expense"), end, start)
+
+
+def check_bill_reminders(expenses, username=None):
+    upcoming_bills = bills_due(expenses, username)
 
     if upcoming_bills:
         print("\n⚠️ Upcoming Bills (Next 7 Days)")
         for bill in upcoming_bills:
-            print(f"{bill['Date']} - {bill['Category']}: KES {bill['Amount']:.2f} ({bill['Original_Amount']})")
+            print(f"{bill['Date']} - {bill['Category']}: KES {float(bill['Amount']):.2f} ({ledger.original_text(bill)})")
 
 
 def main_menu(username):
     while True:
-        expenses = load_user_data(username, "expenses")
-        income = load_user_data(username, "income")
+        version = locking.read_version(user_dir(username), username)
+        expenses = load_ledger(username, "expenses")
+        income = load_ledger(username, "income")
         budgets = load_user_data(username, "budgets")
+        loaded_budgets = dict(budgets)
+        totals = load_aggregates(username)
 
         print("\n💵 Expense Tracker (KES) - User:", username)
         print("1. Add Expense")
@@ -407,58 +718,91 @@ def main_menu(username):
         choice = input("Choose an option (1-16): ")
 
         if choice == "1":
-            expenses.append(add_transaction("expense"))
-            save_user_data(username, expenses, "expenses", ["Date", "Category", "Amount", "Original_Amount", "Notes"])
+            if append_user_data(username, add_transaction("expense", totals), "expenses", EXPENSE_FIELDS):
+                save_aggregates(username, totals, version + 1)
         elif choice == "2":
-            income.append(add_transaction("income"))
-            save_user_data(username, income, "income", ["Date", "Source", "Amount", "Original_Amount", "Notes"])
+            if append_user_data(username, add_transaction("income", totals), "income", INCOME_FIELDS):
+                save_aggregates(username, totals, version + 1)
         elif choice == "3":
-            display_transactions(expenses, "expense")
+            display_transactions(expenses, "expense", query_transactions(expenses, "expense"))
         elif choice == "4":
-            display_transactions(income, "income")
+            display_transactions(income, "income", query_transactions(income, "income"))
         elif choice == "5":
-            if update_transaction(expenses, "expense"):
-                save_user_data(username, expenses, "expenses", ["Date", "Category", "Amount", "Original_Amount", "Notes"])
+            rows = expenses.to_rows()
+            trans_id = update_transaction(rows, "expense", totals)
+            if trans_id is not None and patch_user_data(username, trans_id, rows[trans_id], "expenses", EXPENSE_FIELDS,
+                                                        expenses.row(trans_id), version):
+                save_aggregates(username, totals, version + 1)
         elif choice == "6":
-            if update_transaction(income, "income"):
-                save_user_data(username, income, "income", ["Date", "Source", "Amount", "Original_Amount", "Notes"])
+            rows = income.to_rows()
+            trans_id = update_transaction(rows, "income", totals)
+            if trans_id is not None and patch_user_data(username, trans_id, rows[trans_id], "income", INCOME_FIELDS,
+                                                        income.row(trans_id), version):
+                save_aggregates(username, totals, version + 1)
         elif choice == "7":
-            if delete_transaction(expenses, "expense"):
-                save_user_data(username, expenses, "expenses", ["Date", "Category", "Amount", "Original_Amount", "Notes"])
+            trans_id = delete_transaction(expenses.to_rows(), "expense", totals)
+            if trans_id is not None and remove_user_data(username, trans_id, "expenses", EXPENSE_FIELDS,
+                                                         expenses.row(trans_id), version):
+                save_aggregates(username, totals, version + 1)
         elif choice == "8":
-            if delete_transaction(income, "income"):
-                save_user_data(username, income, "income", ["Date", "Source", "Amount", "Original_Amount", "Notes"])
+            trans_id = delete_transaction(income.to_rows(), "income", totals)
+            if trans_id is not None and remove_user_data(username, trans_id, "income", INCOME_FIELDS,
+                                                         income.row(trans_id), version):
+                save_aggregates(username, totals, version + 1)
         elif choice == "9":
             category = input("Category to budget (e.g., Food): ")
-            limit = float(input("Budget limit (KES): "))
+            limit = money.to_cents(input("Budget limit (KES): "))
             budgets[category] = limit
-            save_user_data(username, budgets, "budgets")
+            save_budgets(username, budgets, loaded_budgets, version)
         elif choice == "10":
             display_budgets(budgets)
         elif choice == "11":
             if update_budget(budgets):
-                save_user_data(username, budgets, "budgets")
+                save_budgets(username, budgets, loaded_budgets, version)
         elif choice == "12":
             if delete_budget(budgets):
-                save_user_data(username, budgets, "budgets")
+                save_budgets(username, budgets, loaded_budgets, version)
         elif choice == "13":
-            check_budget(expenses, budgets)
+            check_budget(expenses, budgets, username, totals, choose_currency())
         elif choice == "14":
-            generate_report(expenses)
+            month_only = input("This month only? (y/n): ").lower() == "y"
+            generate_report(expenses, username, totals, choose_currency(), month_only)
         elif choice == "15":
-            check_bill_reminders(expenses)
+            check_bill_reminders(expenses, username)
         elif choice == "16":
             print("Logging out...")
+            txlog.compact_all()
+            if os.environ.get("EXPENSE_DEBUG"):
+                stats = session_cache.stats()
+                print(f"Cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
             return
         else:
             print("Invalid choice!")
 
 
 def main():
-    
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Expense Tracker")
+    parser.add_argument("--profile", metavar="PATH", help="write cProfile and tracemalloc reports to PATH.prof/.txt on exit")
+    parser.add_argument("--metrics", metavar="FILE", default=metrics.METRICS_FILE,
+                        help="keep Prometheus text-format metrics in FILE")
+    args = parser.parse_args()
+
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
     
+    txlog.start_compactor()
+    metrics.start_exporter(args.metrics)
+    profiler = metrics.Profiler(args.profile).start() if args.profile else None
+    try:
+        run()
+    finally:
+        if profiler:
+            profiler.stop()
+
+
+def run():
     while True:
         print("\nWelcome to Expense Tracker!")
         print("1. Login")
@@ -476,6 +820,7 @@ def main():
                 print("Please login with your new account.")
         elif choice == "3":
             print("Goodbye!")
+            users_dir.compact()
             break
         else:
             print("Invalid choice!")
@@ -5,18 +5,27 @@ import json
 from datetime import datetime, timedelta
 import hashlib
 import os
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import threading
+import aggregates
+import atomic
+import cache
+import gui_worker
+import ledger
+import locking
+import metrics
+import money
+import partitions
+import plotting
+import rates
+import sqlite_store
+import txlog
+import user_directory
+import virtual_tree
 
 DATA_DIR = "data"
-USERS_FILE = "users.json"
-
-EXCHANGE_RATES = {
-    "KES": 1.0,
-    "USD": 0.0078,
-    "EUR": 0.0072,
-    "GBP": 0.0062
-}
+STORAGE_BACKEND = os.environ.get("EXPENSE_STORAGE", "csv")
+EXPENSE_FIELDS = ["Date", "Category", "Amount", "Original_Amount", "Currency", "Notes"]
+INCOME_FIELDS = ["Date", "Source", "Amount", "Original_Amount", "Currency", "Notes"]
 
 class ExpenseTrackerApp:
     def __init__(self, root):
@@ -24,12 +33,24 @@ class ExpenseTrackerApp:
         self.root.title("Expense Tracker")
         self.root.geometry("1000x700")
         self.current_user = None
+        self.cache = cache.FileCache(txlog.watched)
+        self.ledger_cache = ledger.LedgerCache()
+        self.ledger_lock = threading.RLock()
+        self.users = user_directory.open_directory(DATA_DIR)
+        self.worker = gui_worker.BackgroundWorker(self.root)
+        self.display_currency = tk.StringVar(master=self.root, value="KES")
+        self.report_month_only = tk.BooleanVar(master=self.root, value=False)
+        self.worker.on_busy = self.set_busy
+        self.status_bar = None
+        self.summary_frame = None
         
         self.configure_theme()
         
         if not os.path.exists(DATA_DIR):
             os.makedirs(DATA_DIR)
         
+        txlog.start_compactor()
+        
         self.setup_ui()
 
     def configure_theme(self):
@@ -55,8 +76,6 @@ class ExpenseTrackerApp:
                   foreground=[('selected', 'white')])
         style.map('TButton', background=[('active', 'black'), ('pressed', 'black')],
                   foreground=[('active', 'white'), ('pressed', 'white')])
-        
-        plt.style.use('grayscale')
 
     def setup_ui(self):
         for widget in self.root.winfo_children():
@@ -111,6 +130,11 @@ class ExpenseTrackerApp:
         report_menu = tk.Menu(menubar, tearoff=0, bg='white', fg='black', activebackground='black', activeforeground='white')
         report_menu.add_command(label="Generate Report", command=self.generate_report)
         report_menu.add_command(label="Check Bill Reminders", command=self.check_bill_reminders)
+        report_menu.add_checkbutton(label="This Month Only", variable=self.report_month_only)
+        currency_menu = tk.Menu(report_menu, tearoff=0, bg='white', fg='black', activebackground='black', activeforeground='white')
+        for currency in rates.table().currencies:
+            currency_menu.add_radiobutton(label=currency, variable=self.display_currency, value=currency)
+        report_menu.add_cascade(label="Display Currency", menu=currency_menu)
         menubar.add_cascade(label="Reports", menu=report_menu)
         
         self.root.config(menu=menubar)
@@ -125,88 +149,186 @@ class ExpenseTrackerApp:
         )
         welcome_label.pack(pady=20)
         
+        self.status_bar = ttk.Frame(self.root)
+        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X, before=self.main_frame)
+        self.status_label = ttk.Label(self.status_bar, text="Ready")
+        self.status_label.pack(side=tk.LEFT, padx=10)
+        self.progress = ttk.Progressbar(self.status_bar, mode="indeterminate", length=150)
+        self.set_busy(self.worker.busy)
+        
         self.show_quick_summary()
 
+    def set_busy(self, busy):
+        if self.status_bar is None or not self.status_bar.winfo_exists():
+            return
+        if busy:
+            self.status_label.config(text="Working...")
+            self.progress.pack(side=tk.RIGHT, padx=10, pady=2)
+            self.progress.start(10)
+        else:
+            self.status_label.config(text="Ready")
+            self.progress.stop()
+            self.progress.pack_forget()
+
+    def show_error(self, error):
+        messagebox.showerror("Error", f"Unexpected error: {str(error)}")
+
     def show_quick_summary(self):
-        summary_frame = ttk.LabelFrame(self.main_frame, text="Quick Summary", padding=10)
+        if self.summary_frame is not None and self.summary_frame.winfo_exists():
+            self.summary_frame.destroy()
+        summary_frame = self.summary_frame = ttk.LabelFrame(self.main_frame, text="Quick Summary", padding=10)
         summary_frame.pack(fill=tk.X, padx=10, pady=10)
+        loading = ttk.Label(summary_frame, text="Loading...")
+        loading.pack(anchor=tk.W)
         
-        expenses = self.load_user_data("expense")
-        income = self.load_user_data("income")
-        budgets = self.load_user_data("budgets")
-        
-        total_expenses = sum(float(e["Amount"]) for e in expenses) if expenses else 0
-        total_income = sum(float(i["Amount"]) for i in income) if income else 0
-        net_balance = total_income - total_expenses
-        
-        ttk.Label(summary_frame, text=f"Total Expenses: KES {total_expenses:.2f}").pack(anchor=tk.W)
-        ttk.Label(summary_frame, text=f"Total Income: KES {total_income:.2f}").pack(anchor=tk.W)
-        ttk.Label(summary_frame, text=f"Net Balance: KES {net_balance:.2f}").pack(anchor=tk.W)
+        def show(totals):
+            if not summary_frame.winfo_exists():
+                return
+            loading.destroy()
+            total_expenses, total_income = totals
+            net_balance = total_income - total_expenses
+            
+            ttk.Label(summary_frame, text=f"Total Expenses: KES {total_expenses:.2f}").pack(anchor=tk.W)
+            ttk.Label(summary_frame, text=f"Total Income: KES {total_income:.2f}").pack(anchor=tk.W)
+            ttk.Label(summary_frame, text=f"Net Balance: KES {net_balance:.2f}").pack(anchor=tk.W)
+            
+            # Check if expenses exceed income
+            if total_expenses > total_income:
+                messagebox.showwarning("Warning", "Your expenses exceed your income! Please review your spending.")
         
-        # Check if expenses exceed income
-        if total_expenses > total_income:
-            messagebox.showwarning("Warning", "Your expenses exceed your income! Please review your spending.")
+        self.worker.submit("summary", self.with_ledgers(self.net_totals), on_done=show, on_error=self.show_error)
+
+    def with_ledgers(self, func):
+        # Worker tasks share the cached ledgers, and reports hold numpy views over their columns that an
+        # append on another thread cannot resize, so tasks that read or change them run one at a time.
+        def run(*args):
+            with self.ledger_lock:
+                return func(*args)
+        return run
+
+    def user_dir(self, username=None):
+        return user_directory.user_root(DATA_DIR, username or self.current_user)
+
+    def aggregates_path(self):
+        return os.path.join(self.user_dir(), f"{self.current_user}_aggregates.json")
+
+    def ledger_stamp(self):
+        record = self.users.get(self.current_user) or {}
+        data_files = record.get("data_files", {})
+        paths = [os.path.join(DATA_DIR, data_files[data_type]) if data_type in data_files else None
+                 for data_type in ("expense", "income")]
+        return repr([self.cache.signature(path) if path else None for path in paths])
+
+    def load_aggregates(self):
+        if self.using_sqlite():
+            return None
+        return aggregates.load(
+            self.aggregates_path(), self.ledger_stamp(),
+            lambda: aggregates.Aggregates.build(self.read_ledger("expense"), self.read_ledger("income")))
+
+    def net_totals(self):
+        if self.using_sqlite():
+            return sqlite_store.net_totals(self.ledger_db(), self.current_user)
+        totals = self.load_aggregates()
+        return totals.total_expenses, totals.total_income
 
     def hash_password(self, password):
         return hashlib.sha256(password.encode()).hexdigest()
 
-    def load_users(self):
-        try:
-            with open(os.path.join(DATA_DIR, USERS_FILE), "r") as file:
-                return json.load(file)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+    def read_json(self, path):
+        with open(path, "r") as file:
+            data = json.load(file)
+            metrics.add_bytes("read", path, file.tell())
+            return data
 
-    def save_users(self, users):
+    def read_budgets(self, path):
+        return money.parse_amounts(self.read_json(path))
+
+    def ledger_db(self):
+        return sqlite_store.connect(os.path.join(DATA_DIR, sqlite_store.DB_FILE))
+
+    def using_sqlite(self):
+        return STORAGE_BACKEND == "sqlite" and self.current_user in self.users
+
+    def load_user_data(self, data_type):
         try:
-            with open(os.path.join(DATA_DIR, USERS_FILE), "w") as file:
-                json.dump(users, file, indent=4)
-            return True
+            return self.read_user_data(data_type)
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save users: {str(e)}")
-            return False
+            messagebox.showerror("Error", f"Error loading {data_type}: {str(e)}")
+            return [] if data_type != "budgets" else {}
 
-    def load_user_data(self, data_type):
-        users = self.load_users()
-        if self.current_user not in users:
+    @metrics.timed("load_user_data", metrics.result_rows)
+    def read_user_data(self, data_type):
+        record = self.users.get(self.current_user)
+        if not record:
             return []
         
-        if data_type not in users[self.current_user]["data_files"]:
+        if STORAGE_BACKEND == "sqlite":
+            if data_type == "budgets":
+                return sqlite_store.load_budgets(self.ledger_db(), self.current_user)
+            return sqlite_store.load_rows(self.ledger_db(), self.current_user, data_type)
+        
+        if data_type not in record["data_files"]:
             self.initialize_user_data(self.current_user)
             
-        filename = users[self.current_user]["data_files"].get(data_type)
+        filename = record["data_files"].get(data_type)
         if not filename:
             return []
         
         filepath = os.path.join(DATA_DIR, filename)
         
+        if data_type == "budgets":
+            if os.path.exists(filepath):
+                return dict(self.cache.get(filepath, self.read_budgets))
+            return {}
+        else:
+            return list(self.cache.get(filepath, txlog.load_rows))
+
+    def load_ledger(self, data_type):
         try:
-            if data_type == "budgets":
-                if os.path.exists(filepath):
-                    with open(filepath, "r") as file:
-                        return json.load(file)
-                return {}
-            else:
-                data = []
-                if os.path.exists(filepath):
-                    with open(filepath, "r") as file:
-                        reader = csv.DictReader(file)
-                        data = list(reader)
-                return data
+            return self.read_ledger(data_type)
         except Exception as e:
             messagebox.showerror("Error", f"Error loading {data_type}: {str(e)}")
-            return [] if data_type != "budgets" else {}
+            return ledger.Ledger(data_type)
+
+    @metrics.timed("load_ledger", metrics.result_rows)
+    def read_ledger(self, data_type):
+        record = self.users.get(self.current_user)
+        if STORAGE_BACKEND == "sqlite" or not record or data_type not in record["data_files"]:
+            return ledger.Ledger.from_rows(self.read_user_data(data_type), data_type)
+        
+        filepath = os.path.join(DATA_DIR, record["data_files"][data_type])
+        return self.ledger_cache.get(filepath, data_type)
 
+    def read_window(self, data_type, start=None, end=None):
+        # Partitioned ledgers read only the months overlapping [start, end]; rows outside it may still be included.
+        record = self.users.get(self.current_user)
+        if STORAGE_BACKEND == "sqlite" or not record or data_type not in record["data_files"]:
+            return self.read_ledger(data_type)
+        
+        filepath = os.path.join(DATA_DIR, record["data_files"][data_type])
+        if not partitions.is_partitioned(filepath):
+            return self.ledger_cache.get(filepath, data_type)
+        return ledger.load_window(filepath, data_type, start, end)
+
+    @metrics.timed("save_user_data", metrics.arg_rows(1))
     def save_user_data(self, data, data_type, fieldnames=None):
-        users = self.load_users()
-        if self.current_user not in users:
+        record = self.users.get(self.current_user)
+        if not record:
             messagebox.showerror("Error", "User not found!")
             return False
         
-        if data_type not in users[self.current_user]["data_files"]:
+        if STORAGE_BACKEND == "sqlite":
+            if data_type == "budgets":
+                sqlite_store.save_budgets(self.ledger_db(), self.current_user, data)
+            else:
+                sqlite_store.replace_rows(self.ledger_db(), self.current_user, data_type, data)
+            return True
+        
+        if data_type not in record["data_files"]:
             self.initialize_user_data(self.current_user)
             
-        filename = users[self.current_user]["data_files"].get(data_type)
+        filename = record["data_files"].get(data_type)
         if not filename:
             messagebox.showerror("Error", f"Filename not configured for {data_type}!")
             return False
@@ -217,18 +339,11 @@ class ExpenseTrackerApp:
             os.makedirs(DATA_DIR, exist_ok=True)
             
             if data_type == "budgets":
-                with open(filepath, "w") as file:
-                    json.dump(data, file, indent=4)
+                atomic.write_json(filepath, money.format_amounts(data), indent=4)
+                self.cache.store(filepath, dict(data))
             else:
-                cleaned_data = []
-                for row in data:
-                    cleaned_row = {field: row.get(field, "") for field in fieldnames}
-                    cleaned_data.append(cleaned_row)
-                
-                with open(filepath, "w", newline="", encoding='utf-8') as file:
-                    writer = csv.DictWriter(file, fieldnames=fieldnames)
-                    writer.writeheader()
-                    writer.writerows(cleaned_data)
+                txlog.write_snapshot(filepath, data, fieldnames)
+                self.cache.store(filepath, list(data))
             
             return True
         except PermissionError:
@@ -238,31 +353,62 @@ class ExpenseTrackerApp:
             messagebox.showerror("Error", f"Failed to save {data_type}: {str(e)}")
             return False
 
+    def append_user_data(self, row, data_type, fieldnames):
+        try:
+            self.write_transaction(row, data_type, fieldnames)
+            return True
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to save {data_type}: {str(e)}")
+            return False
+
+    @metrics.timed("append_user_data")
+    def write_transaction(self, row, data_type, fieldnames):
+        record = self.users.get(self.current_user)
+        if not record:
+            raise ValueError("User not found!")
+        
+        if STORAGE_BACKEND == "sqlite":
+            sqlite_store.insert_row(self.ledger_db(), self.current_user, data_type, row)
+            return
+        
+        if data_type not in record["data_files"]:
+            self.initialize_user_data(self.current_user)
+            
+        filename = record["data_files"].get(data_type)
+        if not filename:
+            raise ValueError(f"Filename not configured for {data_type}!")
+        
+        filepath = os.path.join(DATA_DIR, filename)
+        before = self.cache.signature(filepath)
+        entry = txlog.log_add(filepath, row, fieldnames)
+        self.cache.record_write(filepath, before, lambda rows: txlog.replay(rows, [entry]))
+
     def initialize_user_data(self, username):
-        users = self.load_users()
-        if username not in users:
+        record = self.users.get(username)
+        if not record:
             return
         
-        if "data_files" not in users[username]:
-            users[username]["data_files"] = {
-                "expense": f"{username}_expenses.csv",
-                "income": f"{username}_income.csv",
-                "budgets": f"{username}_budgets.json"
-            }
-            self.save_users(users)
+        if "data_files" not in record:
+            record = dict(record, data_files={
+                "expense": user_directory.user_file(DATA_DIR, username, f"{username}_expenses.csv"),
+                "income": user_directory.user_file(DATA_DIR, username, f"{username}_income.csv"),
+                "budgets": user_directory.user_file(DATA_DIR, username, f"{username}_budgets.json")
+            })
+            self.users.put(username, record)
         
-        user_data = users[username]["data_files"]
+        user_data = record["data_files"]
+        os.makedirs(self.user_dir(username), exist_ok=True)
         
         expense_file = os.path.join(DATA_DIR, user_data["expense"])
         if not os.path.exists(expense_file):
             with open(expense_file, "w", newline="", encoding='utf-8') as file:
-                writer = csv.DictWriter(file, fieldnames=["Date", "Category", "Amount", "Original_Amount", "Notes"])
+                writer = csv.DictWriter(file, fieldnames=EXPENSE_FIELDS)
                 writer.writeheader()
         
         income_file = os.path.join(DATA_DIR, user_data["income"])
         if not os.path.exists(income_file):
             with open(income_file, "w", newline="", encoding='utf-8') as file:
-                writer = csv.DictWriter(file, fieldnames=["Date", "Source", "Amount", "Original_Amount", "Notes"])
+                writer = csv.DictWriter(file, fieldnames=INCOME_FIELDS)
                 writer.writeheader()
         
         budgets_file = os.path.join(DATA_DIR, user_data["budgets"])
@@ -278,15 +424,21 @@ class ExpenseTrackerApp:
             messagebox.showerror("Error", "Please enter both username and password")
             return
         
-        users = self.load_users()
-        
-        if username in users and users[username]["password"] == self.hash_password(password):
-            self.current_user = username
-            
+        def authenticate():
+            record = self.users.get(username)
+            if not record or record["password"] != self.hash_password(password):
+                return False
             self.initialize_user_data(username)
-            self.setup_ui()
-        else:
-            messagebox.showerror("Error", "Invalid username or password")
+            return True
+        
+        def done(valid):
+            if valid:
+                self.current_user = username
+                self.setup_ui()
+            else:
+                messagebox.showerror("Error", "Invalid username or password")
+        
+        self.worker.submit("login", authenticate, on_done=done, on_error=self.show_error)
 
     def register(self):
         username = self.username_entry.get()
@@ -296,32 +448,39 @@ class ExpenseTrackerApp:
             messagebox.showerror("Error", "Please enter both username and password")
             return
         
-        users = self.load_users()
-        
-        if username in users:
+        if username in self.users:
             messagebox.showerror("Error", "Username already exists!")
             return
         
-        users[username] = {
-            "password": self.hash_password(password),
-            "data_files": {
-                "expense": f"{username}_expenses.csv",
-                "income": f"{username}_income.csv",
-                "budgets": f"{username}_budgets.json"
-            }
-        }
+        try:
+            self.users.put(username, {
+                "password": self.hash_password(password),
+                "data_files": {
+                    "expense": user_directory.user_file(DATA_DIR, username, f"{username}_expenses.csv"),
+                    "income": user_directory.user_file(DATA_DIR, username, f"{username}_income.csv"),
+                    "budgets": user_directory.user_file(DATA_DIR, username, f"{username}_budgets.json")
+                }
+            })
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save users: {str(e)}")
+            return
         
-        if self.save_users(users):
-            self.initialize_user_data(username)
-            messagebox.showinfo("Success", "Registration successful! Please login.")
-            self.username_entry.delete(0, tk.END)
-            self.password_entry.delete(0, tk.END)
+        self.initialize_user_data(username)
+        messagebox.showinfo("Success", "Registration successful! Please login.")
+        self.username_entry.delete(0, tk.END)
+        self.password_entry.delete(0, tk.END)
 
     def logout(self):
+        self.worker.cancel()
+        self.worker.drain()
+        txlog.compact_all()
+        self.users.compact()
         self.current_user = None
         self.setup_ui()
 
     def clear_window(self):
+        self.status_bar = None
+        self.summary_frame = None
         for widget in self.root.winfo_children():
             widget.destroy()
 
@@ -344,7 +503,7 @@ class ExpenseTrackerApp:
         
         ttk.Label(dialog, text="Currency:").pack(pady=(10,0))
         currency_var = tk.StringVar(value="KES")
-        currency_menu = ttk.OptionMenu(dialog, currency_var, "KES", *EXCHANGE_RATES.keys())
+        currency_menu = ttk.OptionMenu(dialog, currency_var, "KES", *rates.table().currencies)
         currency_menu.pack()
         
         ttk.Label(dialog, text="Amount:").pack(pady=(10,0))
@@ -370,7 +529,7 @@ class ExpenseTrackerApp:
                 datetime.strptime(date, '%Y-%m-%d')  
                 
                 currency = currency_var.get()
-                amount = float(amount_entry.get())
+                amount = money.to_cents(amount_entry.get())
                 notes = notes_entry.get()
                 
                 if transaction_type == "expense":
@@ -384,59 +543,80 @@ class ExpenseTrackerApp:
                         messagebox.showerror("Error", "Please enter a source")
                         return
                 
-                amount_kes = round(amount * EXCHANGE_RATES[currency] / EXCHANGE_RATES["KES"], 2)
-                
-                # Check for negative balance when adding expense
-                if transaction_type == "expense":
-                    expenses = self.load_user_data("expense")
-                    income = self.load_user_data("income")
-                    total_expenses = sum(float(e["Amount"]) for e in expenses) if expenses else 0
-                    total_income = sum(float(i["Amount"]) for i in income) if income else 0
-                    
-                    if (total_expenses + amount_kes) > total_income:
-                        if not messagebox.askyesno("Warning", 
-                                                  "This expense will make your total expenses exceed your income. Continue?"):
-                            return
+                amount_kes = rates.convert_cents(amount, currency, "KES", date)
                 
                 transaction = {
                     "Date": date,
-                    "Amount": str(amount_kes),
-                    "Original_Amount": f"{amount:.2f} {currency}",
+                    "Amount": money.format_cents(amount_kes),
+                    "Original_Amount": money.format_cents(amount),
+                    "Currency": currency,
                     "Notes": notes
                 }
                 
                 if transaction_type == "expense":
                     transaction["Category"] = category
-                    fieldnames = ["Date", "Category", "Amount", "Original_Amount", "Notes"]
+                    fieldnames = EXPENSE_FIELDS
                 else:
                     transaction["Source"] = source
-                    fieldnames = ["Date", "Source", "Amount", "Original_Amount", "Notes"]
-                
-                existing_data = self.load_user_data(transaction_type)
-                if not isinstance(existing_data, list):
-                    existing_data = []
-                
-                updated_data = existing_data + [transaction]
-                
-                if not self.save_user_data(updated_data, transaction_type, fieldnames):
-                    messagebox.showerror("Error", "Failed to save transaction")
-                    return
-                
-                messagebox.showinfo("Success", f"{transaction_type.capitalize()} saved successfully!")
-                dialog.destroy()
-                self.show_quick_summary()
+                    fieldnames = INCOME_FIELDS
                 
             except ValueError as e:
                 messagebox.showerror("Error", f"Invalid input: {str(e)}")
-            except Exception as e:
-                messagebox.showerror("Error", f"Unexpected error: {str(e)}")
+                return
+            
+            def write():
+                with locking.user_lock(self.user_dir(), self.current_user):
+                    totals = self.load_aggregates()
+                    self.write_transaction(transaction, transaction_type, fieldnames)
+                    if totals is not None:
+                        totals.add(transaction_type, transaction)
+                        aggregates.save(self.aggregates_path(), totals, self.ledger_stamp())
+                    locking.bump_version(self.user_dir(), self.current_user)
+            
+            def enable():
+                if save_button.winfo_exists():
+                    save_button.state(["!disabled"])
+            
+            def saved(result):
+                messagebox.showinfo("Success", f"{transaction_type.capitalize()} saved successfully!")
+                if dialog.winfo_exists():
+                    dialog.destroy()
+                self.show_quick_summary()
+            
+            def failed(error):
+                enable()
+                messagebox.showerror("Error", f"Failed to save transaction: {str(error)}")
+            
+            def confirm(totals):
+                total_expenses, total_income = totals
+                # The totals are in KES and amount_kes is in cents, so compare in cents.
+                if money.to_cents(total_expenses) + amount_kes > money.to_cents(total_income):
+                    if not messagebox.askyesno("Warning", 
+                                              "This expense will make your total expenses exceed your income. Continue?"):
+                        enable()
+                        return
+                self.worker.submit("save", self.with_ledgers(write), on_done=saved, on_error=failed, write=True)
+            
+            save_button.state(["disabled"])
+            # Check for negative balance when adding expense
+            if transaction_type == "expense":
+                self.worker.submit("save", self.with_ledgers(self.net_totals), on_done=confirm, on_error=failed,
+                                   write=True)
+            else:
+                self.worker.submit("save", self.with_ledgers(write), on_done=saved, on_error=failed, write=True)
 
-        ttk.Button(dialog, text="Save", command=save_transaction).pack(pady=20)
+        save_button = ttk.Button(dialog, text="Save", command=save_transaction)
+        save_button.pack(pady=20)
         ttk.Button(dialog, text="Cancel", command=dialog.destroy).pack(pady=5)
 
     def view_transactions(self, transaction_type):
-        data = self.load_user_data(transaction_type)
-        
+        # The list is sorted and filtered on the Tk thread, so it gets its own copy of the ledger.
+        read = self.with_ledgers(lambda: self.read_ledger(transaction_type).copy())
+        self.worker.submit(f"view-{transaction_type}", read,
+                           on_done=lambda data: self.show_transactions(transaction_type, data),
+                           on_error=self.show_error)
+
+    def show_transactions(self, transaction_type, data):
         if not data:
             messagebox.showinfo("Info", f"No {transaction_type} records found")
             return
@@ -445,61 +625,43 @@ class ExpenseTrackerApp:
         dialog.title(f"View {transaction_type.capitalize()}")
         dialog.geometry("900x600")
         
-        # Create main container frame
         container = ttk.Frame(dialog)
         container.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Create a canvas and scrollbar
-        canvas = tk.Canvas(container)
-        scrollbar = ttk.Scrollbar(container, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
-        
-        # Configure the canvas
-        canvas.configure(yscrollcommand=scrollbar.set)
-        canvas.bind('<Configure>', lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        
-        # Pack the scrollbar and canvas
-        scrollbar.pack(side="right", fill="y")
-        canvas.pack(side="left", fill="both", expand=True)
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        
-        # Make mouse wheel scroll
-        def _on_mousewheel(event):
-            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        
-        canvas.bind_all("<MouseWheel>", _on_mousewheel)
-        
-        columns = ["ID", "Date", "Category/Source", "Amount (KES)", "Original Amount", "Notes"]
-        tree = ttk.Treeview(scrollable_frame, columns=columns, show="headings")
-        
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=120, anchor=tk.W)
-        
-        tree.column("ID", width=50)
-        tree.column("Notes", width=200)
+        filter_frame = ttk.Frame(container)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT)
+        filter_entry = ttk.Entry(filter_frame)
+        filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        ttk.Label(filter_frame, text="From:").pack(side=tk.LEFT)
+        start_entry = ttk.Entry(filter_frame, width=11)
+        start_entry.pack(side=tk.LEFT, padx=5)
+        ttk.Label(filter_frame, text="To:").pack(side=tk.LEFT)
+        end_entry = ttk.Entry(filter_frame, width=11)
+        end_entry.pack(side=tk.LEFT, padx=5)
+        count_label = ttk.Label(filter_frame, text=f"{len(data)} records")
+        count_label.pack(side=tk.RIGHT)
+        
+        # Only the visible window of rows is materialised; sorting and filtering run on the ledger columns
+        view = virtual_tree.LedgerView(data)
+        tree = virtual_tree.VirtualTreeview(container, view)
+        tree.pack(fill=tk.BOTH, expand=True)
         
-        for idx, trans in enumerate(data, 1):
-            if transaction_type == "expense":
-                tree.insert("", tk.END, values=(
-                    idx,
-                    trans["Date"],
-                    trans["Category"],
-                    f"{float(trans['Amount']):.2f}",
-                    trans["Original_Amount"],
-                    trans["Notes"]
-                ))
-            else:
-                tree.insert("", tk.END, values=(
-                    idx,
-                    trans["Date"],
-                    trans["Source"],
-                    f"{float(trans['Amount']):.2f}",
-                    trans["Original_Amount"],
-                    trans["Notes"]
-                ))
+        def apply_filter(event=None):
+            try:
+                start = start_entry.get().strip()
+                end = end_entry.get().strip()
+                start = datetime.strptime(start, '%Y-%m-%d').toordinal() if start else None
+                end = datetime.strptime(end, '%Y-%m-%d').toordinal() if end else None
+            except ValueError:
+                messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format")
+                return
+            tree.filter(filter_entry.get(), start, end)
+            count_label.config(text=f"{len(view)} records")
         
-        tree.pack(fill=tk.BOTH, expand=True)
+        for entry in (filter_entry, start_entry, end_entry):
+            entry.bind("<Return>", apply_filter)
+        ttk.Button(filter_frame, text="Apply", command=apply_filter).pack(side=tk.LEFT)
 
     def set_budget(self):
         dialog = tk.Toplevel(self.root)
@@ -518,7 +680,7 @@ class ExpenseTrackerApp:
         def save_budget():
             category = category_entry.get().strip()
             try:
-                amount = float(amount_entry.get())
+                amount = money.to_cents(amount_entry.get())
             except ValueError:
                 messagebox.showerror("Error", "Please enter a valid amount")
                 return
@@ -527,9 +689,14 @@ class ExpenseTrackerApp:
                 messagebox.showerror("Error", "Please enter a category")
                 return
             
-            budgets = self.load_user_data("budgets")
-            budgets[category] = amount
-            if self.save_user_data(budgets, "budgets"):
+            # Read and write under the user lock so a budget set from another session is not overwritten.
+            with locking.user_lock(self.user_dir(), self.current_user):
+                budgets = self.load_user_data("budgets")
+                budgets[category] = amount
+                saved = self.save_user_data(budgets, "budgets")
+                if saved:
+                    locking.bump_version(self.user_dir(), self.current_user)
+            if saved:
                 messagebox.showinfo("Success", "Budget set successfully!")
                 dialog.destroy()
         
@@ -574,41 +741,74 @@ class ExpenseTrackerApp:
             tree.column(col, width=150, anchor=tk.W)
         
         for category, amount in budgets.items():
-            tree.insert("", tk.END, values=(category, f"{float(amount):.2f}"))
+            tree.insert("", tk.END, values=(category, money.format_cents(amount)))
         
         tree.pack(fill=tk.BOTH, expand=True)
 
     def check_budgets(self):
-        expenses = self.load_user_data("expense")
-        budgets = self.load_user_data("budgets")
-        
-        if not budgets:
+        currency = self.display_currency.get()
+        
+        def compute():
+            budgets = self.read_user_data("budgets")
+            if not budgets:
+                return None
+            if currency != "KES":
+                import reports
+                return [(budget["category"], budget["limit"], budget["spent"])
+                        for budget in reports.budget_utilisation(self.read_ledger("expense"), budgets, currency)]
+            if self.using_sqlite():
+                return sqlite_store.budget_status(self.ledger_db(), self.current_user)
+            return self.load_aggregates().budget_status(budgets)
+        
+        self.worker.submit("budgets", self.with_ledgers(compute), on_done=lambda status: self.show_budget_status(status, currency),
+                           on_error=self.show_error)
+
+    def show_budget_status(self, status, currency="KES"):
+        if status is None:
             messagebox.showinfo("Info", "No budgets set yet")
             return
         
         result = ""
-        for category, limit in budgets.items():
-            spent = sum(float(e["Amount"]) for e in expenses if e.get("Category") == category)
+        for category, limit, spent in status:
             remaining = float(limit) - spent
-            result += f"{category}: KES {spent:.2f} / KES {limit:.2f} (KES {remaining:.2f} remaining)\n"
+            result += f"{category}: {currency} {spent:.2f} / {currency} {limit:.2f} ({currency} {remaining:.2f} remaining)\n"
         
         messagebox.showinfo("Budget Status", result)
 
     def generate_report(self):
-        expenses = self.load_user_data("expense")
+        currency = self.display_currency.get()
+        month_only = self.report_month_only.get()
         
-        if not expenses:
+        def compute():
+            import reports
+            
+            if month_only:
+                # The running totals cover every month, so this month's categories come from its rows.
+                start, end = ledger.month_range(datetime.now())
+                expenses = ledger.between(self.read_window("expense", start, end), start, end)
+                categories = reports.label_totals(expenses, currency)
+                monthly = reports.monthly_totals(expenses, currency=currency) if categories else {}
+                return categories, monthly, reports.rolling_average(monthly) if monthly else {}, currency, month_only
+            if currency != "KES":
+                categories = reports.label_totals(self.read_ledger("expense"), currency)
+            elif self.using_sqlite():
+                categories = sqlite_store.category_totals(self.ledger_db(), self.current_user)
+            else:
+                categories = self.load_aggregates().category_totals()
+            monthly = reports.monthly_totals(self.read_ledger("expense"), currency=currency) if categories else {}
+            return categories, monthly, reports.rolling_average(monthly) if monthly else {}, currency, month_only
+        
+        self.worker.submit("report", self.with_ledgers(compute), on_done=lambda result: self.show_report(*result),
+                           on_error=self.show_error)
+
+    def show_report(self, categories, monthly, rolling, currency="KES", month_only=False):
+        if not categories:
             messagebox.showinfo("Info", "No expenses to generate report")
             return
         
-        categories = {}
-        for expense in expenses:
-            category = expense["Category"]
-            amount = float(expense["Amount"])
-            categories[category] = categories.get(category, 0) + amount
-        
         dialog = tk.Toplevel(self.root)
-        dialog.title("Monthly Spending Report")
+        title = "This Month Spending Report" if month_only else "Monthly Spending Report"
+        dialog.title(title)
         dialog.geometry("600x500")
         
         container = ttk.Frame(dialog)
@@ -633,45 +833,57 @@ class ExpenseTrackerApp:
         report_text = tk.Text(scrollable_frame, height=10)
         report_text.pack(fill=tk.X, pady=10)
         
-        report_text.insert(tk.END, "Monthly Spending Report (KES)\n\n")
+        report_text.insert(tk.END, f"{title} ({currency})\n\n")
         for category, total in categories.items():
-            report_text.insert(tk.END, f"{category}: KES {total:.2f}\n")
+            report_text.insert(tk.END, f"{category}: {currency} {total:.2f}\n")
         
-        fig, ax = plt.subplots(figsize=(6, 4))
-        ax.bar(categories.keys(), categories.values())
-        ax.set_title("Monthly Spending by Category (KES)")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
+        if monthly:
+            report_text.insert(tk.END, "\nBy Month (3-month average)\n\n")
+            for month, total in monthly.items():
+                report_text.insert(tk.END, f"{month}: {currency} {total:.2f} (avg {currency} {rolling[month]:.2f})\n")
         
-        canvas_fig = FigureCanvasTkAgg(fig, master=scrollable_frame)
-        canvas_fig.draw()
+        canvas_fig = plotting.embed_bar_chart(scrollable_frame, categories, f"Monthly Spending by Category ({currency})")
         canvas_fig.get_tk_widget().pack(fill=tk.BOTH, expand=True)
 
     def check_bill_reminders(self):
-        expenses = self.load_user_data("expense")
         today = datetime.now()
-        upcoming_bills = []
         
-        for e in expenses:
-            if "Bill" in e.get("Category", ""):
-                try:
-                    bill_date = datetime.strptime(e["Date"], '%Y-%m-%d')
-                    if today <= bill_date <= today + timedelta(days=7):
-                        upcoming_bills.append(e)
-                except ValueError:
-                    continue
+        def compute():
+            if self.using_sqlite():
+                return sqlite_store.upcoming_bills(
+                    self.ledger_db(), self.current_user,
+                    (today + timedelta(days=7)).strftime('%Y-%m-%d'),
+                    today.strftime('%Y-%m-%d'))
+            start = today.toordinal()
+            return ledger.upcoming_bills(self.read_window("expense", start, start + 7), start + 7, start)
         
+        self.worker.submit("bills", self.with_ledgers(compute), on_done=self.show_bill_reminders, on_error=self.show_error)
+
+    def show_bill_reminders(self, upcoming_bills):
         if not upcoming_bills:
             messagebox.showinfo("Info", "No upcoming bills in the next 7 days")
             return
         
         result = "Upcoming Bills (Next 7 Days):\n\n"
         for bill in upcoming_bills:
-            result += f"{bill['Date']} - {bill['Category']}: KES {float(bill['Amount']):.2f} ({bill['Original_Amount']})\n"
+            result += f"{bill['Date']} - {bill['Category']}: KES {float(bill['Amount']):.2f} ({ledger.original_text(bill)})\n"
         
         messagebox.showinfo("Bill Reminders", result)
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Expense Tracker (GUI)")
+    parser.add_argument("--profile", metavar="PATH", help="write cProfile and tracemalloc reports to PATH.prof/.txt on exit")
+    parser.add_argument("--metrics", metavar="FILE", default=metrics.METRICS_FILE,
+                        help="keep Prometheus text-format metrics in FILE")
+    args = parser.parse_args()
+
+    metrics.start_exporter(args.metrics)
+    profiler = metrics.Profiler(args.profile).start() if args.profile else None
     root = tk.Tk()
     app = ExpenseTrackerApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.worker.shutdown()
+    if profiler:
+        profiler.stop()
\ No newline at end of file
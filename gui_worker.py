@@ -0,0 +1,95 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import metrics
+
+
+class BackgroundWorker:
+    def __init__(self, root, max_workers=2, poll_ms=30):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_busy = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gui-io")
+        self._generations = {}
+        self._futures = {}
+        self._writes = set()
+        self._write_generation = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def _set_pending(self, delta):
+        self._pending += delta
+        if self.on_busy and (self._pending == 0 or (delta > 0 and self._pending == 1)):
+            self.on_busy(self._pending > 0)
+
+    def submit(self, key, func, *args, on_done=None, on_error=None, write=False):
+        # A read replaces the previous task under its key; a write is never superseded or cancelled,
+        # so a change the user asked for always reaches disk.
+        task = metrics.timed("gui_" + key.replace("-", "_"))(func)
+        with self._lock:
+            if write:
+                generation = self._write_generation
+                future = self._executor.submit(task, *args)
+                self._writes.add(future)
+                future.add_done_callback(self._writes.discard)
+            else:
+                generation = self._generations.get(key, 0) + 1
+                self._generations[key] = generation
+                previous = self._futures.get(key)
+                if previous is not None:
+                    previous.cancel()
+                future = self._executor.submit(task, *args)
+                self._futures[key] = future
+        self._set_pending(1)
+
+        # Tk is not thread-safe, so results are collected by polling from the event loop.
+        def poll():
+            if not future.done():
+                self.root.after(self.poll_ms, poll)
+                return
+            self._set_pending(-1)
+            with self._lock:
+                if write:
+                    if self._write_generation != generation:
+                        return
+                else:
+                    if self._generations.get(key) != generation:
+                        return
+                    self._futures.pop(key, None)
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                if on_error:
+                    on_error(error)
+            elif on_done:
+                on_done(future.result())
+
+        self.root.after(self.poll_ms, poll)
+        return future
+
+    def cancel(self, key=None):
+        # Pending writes keep running; only their callbacks are dropped, as the screen they report to is gone.
+        with self._lock:
+            keys = [key] if key is not None else list(self._futures)
+            if key is None:
+                self._write_generation += 1
+            for name in keys:
+                self._generations[name] = self._generations.get(name, 0) + 1
+                future = self._futures.pop(name, None)
+                if future is not None:
+                    future.cancel()
+
+    def drain(self):
+        with self._lock:
+            writes = list(self._writes)
+        wait(writes)
+
+    def shutdown(self):
+        self.cancel()
+        self.drain()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,190 @@
+import argparse
+import csv
+import os
+import re
+import time
+from datetime import datetime
+
+import locking
+import money
+import rates
+import sqlite_store
+import txlog
+import user_directory
+from expense import EXPENSE_FIELDS, INCOME_FIELDS, convert_currency
+
+
+OFX_TAG = re.compile(r"<(/?)(\w+)>([^<\r\n]*)")
+
+
+def read_csv(path, columns):
+    with open(path, "r", newline="", encoding="utf-8-sig") as file:
+        for row in csv.DictReader(file):
+            yield {
+                "date": row.get(columns["date"], ""),
+                "amount": row.get(columns["amount"], ""),
+                "label": row.get(columns["label"], ""),
+                "notes": row.get(columns["notes"], ""),
+                "currency": row.get(columns["currency"], ""),
+            }
+
+
+def read_ofx(path, columns=None):
+    currency = ""
+    transaction = None
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        for line in file:
+            for closing, tag, value in OFX_TAG.findall(line):
+                tag = tag.upper()
+                value = value.strip()
+                if tag == "CURDEF" and not closing:
+                    currency = value
+                elif tag == "STMTTRN":
+                    if closing and transaction is not None:
+                        transaction.setdefault("currency", currency)
+                        yield transaction
+                        transaction = None
+                    elif not closing:
+                        transaction = {"label": "", "notes": ""}
+                elif transaction is not None and not closing:
+                    if tag == "DTPOSTED":
+                        transaction["date"] = value[:8]
+                    elif tag == "TRNAMT":
+                        transaction["amount"] = value
+                    elif tag == "NAME":
+                        transaction["label"] = value
+                    elif tag == "MEMO":
+                        transaction["notes"] = value
+
+
+def convert_rows(records, transaction_type, currency, date_format, default_label):
+    for record in records:
+        # csv.DictReader fills the columns a short row is missing with None.
+        try:
+            parsed = datetime.strptime((record.get("date") or "").strip(), date_format)
+            amount = money.to_cents(record.get("amount") or "")
+        except ValueError:
+            yield None, None
+            continue
+
+        row_currency = (record.get("currency") or currency).upper()
+        if row_currency not in rates.table():
+            yield None, None
+            continue
+
+        kind = transaction_type
+        if kind == "auto":
+            kind = "expense" if amount < 0 else "income"
+        amount = abs(amount)
+
+        row = {
+            "Date": parsed.strftime("%Y-%m-%d"),
+            "Amount": money.format_cents(convert_currency(amount, row_currency, "KES", parsed)),
+            "Original_Amount": money.format_cents(amount),
+            "Currency": row_currency,
+            "Notes": record.get("notes") or "",
+        }
+        row["Category" if kind == "expense" else "Source"] = record.get("label") or default_label
+        yield kind, row
+
+
+def user_files(data_dir, username):
+    record = user_directory.open_directory(data_dir).get(username)
+    if not record:
+        raise SystemExit(f"Unknown user: {username}")
+    paths = {}
+    for kind, data_type in (("expense", "expenses"), ("income", "income")):
+        filename = user_directory.data_file(record, data_type)
+        paths[kind] = os.path.join(data_dir, filename) if filename else None
+    return paths
+
+
+def write_batch(username, kind, rows, paths, storage, data_dir):
+    with locking.user_lock(user_directory.user_root(data_dir, username), username):
+        if storage == "sqlite":
+            conn = sqlite_store.connect(os.path.join(data_dir, sqlite_store.DB_FILE))
+            sqlite_store.insert_rows(conn, username, kind, rows)
+        else:
+            if not paths[kind]:
+                raise SystemExit(f"No {kind} file configured for {username}")
+            txlog.append_rows(paths[kind], rows, EXPENSE_FIELDS if kind == "expense" else INCOME_FIELDS)
+        locking.bump_version(user_directory.user_root(data_dir, username), username)
+
+
+def import_file(username, path, file_format="csv", transaction_type="auto", currency="KES",
+                date_format="%Y-%m-%d", batch_size=5000, columns=None, default_label="Imported",
+                data_dir="data", storage="csv", progress=None):
+    paths = user_files(data_dir, username)
+    reader = read_ofx if file_format == "ofx" else read_csv
+    if file_format == "ofx" and date_format == "%Y-%m-%d":
+        date_format = "%Y%m%d"
+
+    batches = {"expense": [], "income": []}
+    counts = {"expense": 0, "income": 0, "rejected": 0}
+    started = time.perf_counter()
+
+    for kind, row in convert_rows(reader(path, columns), transaction_type, currency, date_format, default_label):
+        if kind is None:
+            counts["rejected"] += 1
+            continue
+        batches[kind].append(row)
+        if len(batches[kind]) >= batch_size:
+            write_batch(username, kind, batches[kind], paths, storage, data_dir)
+            counts[kind] += len(batches[kind])
+            batches[kind] = []
+            if progress:
+                progress(counts, time.perf_counter() - started)
+
+    for kind, rows in batches.items():
+        if rows:
+            write_batch(username, kind, rows, paths, storage, data_dir)
+            counts[kind] += len(rows)
+
+    counts["seconds"] = time.perf_counter() - started
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import a CSV or OFX bank statement into a user's ledger")
+    parser.add_argument("username")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ofx"], default="csv")
+    parser.add_argument("--type", choices=["expense", "income", "auto"], default="auto",
+                        help="auto treats negative amounts as expenses and positive ones as income")
+    parser.add_argument("--currency", default="KES", help="currency when the file has no currency column")
+    parser.add_argument("--date-format", default="%Y-%m-%d")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--date-col", default="Date")
+    parser.add_argument("--amount-col", default="Amount")
+    parser.add_argument("--label-col", default="Category", help="category (expenses) or source (income) column")
+    parser.add_argument("--notes-col", default="Notes")
+    parser.add_argument("--currency-col", default="Currency")
+    parser.add_argument("--default-label", default="Imported")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--storage", choices=["csv", "sqlite"], default=os.environ.get("EXPENSE_STORAGE", "csv"))
+    args = parser.parse_args()
+
+    columns = {
+        "date": args.date_col,
+        "amount": args.amount_col,
+        "label": args.label_col,
+        "notes": args.notes_col,
+        "currency": args.currency_col,
+    }
+
+    def progress(counts, elapsed):
+        done = counts["expense"] + counts["income"]
+        print(f"  {done} rows written ({done / elapsed:,.0f} rows/s)")
+
+    rates.use_data_dir(args.data_dir)
+    counts = import_file(args.username, args.path, args.format, args.type, args.currency.upper(),
+                         args.date_format, args.batch_size, columns, args.default_label,
+                         args.data_dir, args.storage, progress)
+    imported = counts["expense"] + counts["income"]
+    rate = imported / counts["seconds"] if counts["seconds"] else 0
+    print(f"Imported {counts['expense']} expenses and {counts['income']} income records "
+          f"({counts['rejected']} rejected) in {counts['seconds']:.2f}s ({rate:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
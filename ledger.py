@@ -0,0 +1,493 @@
+import bisect
+import csv
+import heapq
+import threading
+from array import array
+from collections import Counter
+from datetime import date, datetime
+
+import cache
+import colstore
+import locking
+import metrics
+import money
+import partitions
+import txlog
+
+# Ledgers at least this long also get a memory-mapped column snapshot next to the CSV.
+SNAPSHOT_ROWS = 10000
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+
+def format_date(ordinal):
+    return date.fromordinal(ordinal).isoformat() if ordinal > 0 else ""
+
+
+class Ledger:
+    def __init__(self, transaction_type):
+        self.transaction_type = transaction_type
+        self.label_field = "Category" if transaction_type.startswith("expense") else "Source"
+        self.dates = array("i")
+        # Amounts are held in integer cents so totals are exact.
+        self.amounts = array("q")
+        self.labels = array("i")
+        self.label_names = []
+        self.original_amounts = array("q")
+        self.currencies = array("i")
+        self.currency_names = []
+        self.notes = []
+        self.raw_dates = {}
+        self._label_codes = {}
+        self._currency_codes = {}
+        self._index = None
+        self._bills = None
+        self._frozen = False
+
+    @classmethod
+    def from_rows(cls, rows, transaction_type):
+        ledger = cls(transaction_type)
+        for row in rows:
+            ledger.append(row)
+        return ledger
+
+    @classmethod
+    def from_columns(cls, columns, transaction_type):
+        # Columns may be read-only views over a snapshot; they are copied on the first change.
+        ledger = cls(transaction_type)
+        for name, values in columns.items():
+            setattr(ledger, name, values)
+        ledger._label_codes = {name: code for code, name in enumerate(ledger.label_names)}
+        ledger._currency_codes = {name: code for code, name in enumerate(ledger.currency_names)}
+        ledger._frozen = True
+        return ledger
+
+    def _copy_columns(self, source):
+        for name, typecode in colstore.NUMERIC_COLUMNS:
+            values = array(typecode)
+            values.frombytes(memoryview(getattr(source, name)).cast("B"))
+            setattr(self, name, values)
+
+    def _thaw(self):
+        self._copy_columns(self)
+        self._frozen = False
+
+    def copy(self):
+        # Shares nothing with this ledger, so it can be read on one thread while this one changes on another.
+        ledger = Ledger(self.transaction_type)
+        ledger._copy_columns(self)
+        ledger.notes = list(self.notes)
+        ledger.label_names = list(self.label_names)
+        ledger.currency_names = list(self.currency_names)
+        ledger.raw_dates = dict(self.raw_dates)
+        ledger._label_codes = dict(self._label_codes)
+        ledger._currency_codes = dict(self._currency_codes)
+        return ledger
+
+    def intern(self, name):
+        code = self._label_codes.get(name)
+        if code is None:
+            code = self._label_codes[name] = len(self.label_names)
+            self.label_names.append(name)
+        return code
+
+    def currency_code(self, name):
+        code = self._currency_codes.get(name)
+        if code is None:
+            code = self._currency_codes[name] = len(self.currency_names)
+            self.currency_names.append(name)
+        return code
+
+    def label_code(self, name):
+        return self._label_codes.get(name, -1)
+
+    def _fields(self, row):
+        raw_date = row.get("Date") or ""
+        ordinal = parse_date(raw_date)
+        original, currency = txlog.split_original(row.get("Original_Amount"), row.get("Currency"))
+        return (ordinal, money.to_cents(row.get("Amount") or 0), self.intern(row.get(self.label_field) or ""),
+                original, self.currency_code(currency), str(row.get("Notes") or ""), raw_date)
+
+    def append(self, row):
+        if self._frozen:
+            self._thaw()
+        ordinal, amount, code, original, currency, notes, raw_date = self._fields(row)
+        if not ordinal and raw_date:
+            self.raw_dates[len(self.dates)] = raw_date
+        self.dates.append(ordinal)
+        self.amounts.append(amount)
+        self.labels.append(code)
+        self.original_amounts.append(original)
+        self.currencies.append(currency)
+        self.notes.append(notes)
+        if self._index is not None:
+            self._index.add(len(self.dates) - 1, ordinal, code)
+        if self._bills is not None:
+            self._bills.add(self.bill_entry(len(self.dates) - 1))
+
+    def update(self, index, row):
+        if self._frozen:
+            self._thaw()
+        ordinal, amount, code, original, currency, notes, raw_date = self._fields(row)
+        if self._bills is not None:
+            self._bills.remove(self.bill_entry(index))
+        self.raw_dates.pop(index, None)
+        if not ordinal and raw_date:
+            self.raw_dates[index] = raw_date
+        self.dates[index] = ordinal
+        self.amounts[index] = amount
+        self.labels[index] = code
+        self.original_amounts[index] = original
+        self.currencies[index] = currency
+        self.notes[index] = notes
+        self._index = None
+        if self._bills is not None:
+            self._bills.add(self.bill_entry(index))
+
+    def delete(self, index):
+        if self._frozen:
+            self._thaw()
+        if self._bills is not None:
+            self._bills.remove(self.bill_entry(index))
+        self.dates.pop(index)
+        self.amounts.pop(index)
+        self.labels.pop(index)
+        self.original_amounts.pop(index)
+        self.currencies.pop(index)
+        self.notes.pop(index)
+        self._index = None
+        if self.raw_dates:
+            self.raw_dates = {i - (i > index): raw for i, raw in self.raw_dates.items() if i != index}
+
+    def apply(self, record):
+        op = record.get("op")
+        index = record.get("index")
+        if op == "add":
+            self.append(record["row"])
+        elif op == "update" and 0 <= index < len(self):
+            self.update(index, record["row"])
+        elif op == "delete" and 0 <= index < len(self):
+            self.delete(index)
+        return self
+
+    def __len__(self):
+        return len(self.dates)
+
+    def row(self, index):
+        return {
+            "Date": self.raw_dates.get(index) or format_date(self.dates[index]),
+            self.label_field: self.label_names[self.labels[index]],
+            "Amount": money.from_cents(self.amounts[index]),
+            "Original_Amount": money.from_cents(self.original_amounts[index]),
+            "Currency": self.currency_names[self.currencies[index]],
+            "Notes": self.notes[index],
+        }
+
+    def __getitem__(self, index):
+        return self.row(index)
+
+    def __iter__(self):
+        return (self.row(index) for index in range(len(self)))
+
+    def to_rows(self):
+        return list(self)
+
+    def total(self):
+        return money.from_cents(sum(self.amounts))
+
+    def index(self):
+        if self._index is None:
+            self._index = LedgerIndex(self)
+        return self._index
+
+    def bill_entry(self, index):
+        name = self.label_names[self.labels[index]]
+        if "Bill" not in name or self.dates[index] <= 0:
+            return None
+        return (self.dates[index], name, self.amounts[index], self.original_amounts[index],
+                self.currency_names[self.currencies[index]])
+
+    def bill_schedule(self):
+        if self._bills is None:
+            self._bills = BillSchedule(self.bill_entry(index) for index in range(len(self)))
+        return self._bills
+
+    def indices_between(self, start=None, end=None, labels=None):
+        return self.index().select(start, end, labels)
+
+    def query(self, start=None, end=None, labels=None, text=None):
+        if labels is not None:
+            labels = {self.label_code(name) for name in labels} - {-1}
+        indices = self.indices_between(start, end, labels)
+        if text:
+            text = text.lower()
+            notes = self.notes
+            indices = [index for index in indices if text in notes[index].lower()]
+        return indices
+
+
+class LedgerIndex:
+    # Row numbers sorted by date, overall and per label, so range queries bisect instead of scanning.
+    def __init__(self, transactions):
+        dates = transactions.dates
+        self.order = array("i", sorted(range(len(dates)), key=dates.__getitem__))
+        self.dates = array("i", (dates[index] for index in self.order))
+        self.by_label = {}
+        for index in self.order:
+            label_dates, label_rows = self._postings(transactions.labels[index])
+            label_dates.append(dates[index])
+            label_rows.append(index)
+
+    def _postings(self, code):
+        postings = self.by_label.get(code)
+        if postings is None:
+            postings = self.by_label[code] = (array("i"), array("i"))
+        return postings
+
+    @staticmethod
+    def _insert(dates, rows, ordinal, index):
+        position = bisect.bisect_right(dates, ordinal)
+        dates.insert(position, ordinal)
+        rows.insert(position, index)
+
+    def add(self, index, ordinal, code):
+        self._insert(self.dates, self.order, ordinal, index)
+        self._insert(*self._postings(code), ordinal, index)
+
+    @staticmethod
+    def _slice(dates, rows, start, end):
+        low = bisect.bisect_left(dates, start) if start is not None else 0
+        high = bisect.bisect_right(dates, end) if end is not None else len(dates)
+        return rows[low:high], dates[low:high]
+
+    def select(self, start=None, end=None, labels=None):
+        if labels is None:
+            return list(self._slice(self.dates, self.order, start, end)[0])
+        ranges = [self._slice(*self.by_label[code], start, end) for code in labels if code in self.by_label]
+        if len(ranges) == 1:
+            return list(ranges[0][0])
+        merged = heapq.merge(*(zip(dates, rows) for rows, dates in ranges))
+        return [index for _, index in merged]
+
+
+class BillSchedule:
+    # Min-heap of (date, category, amount, original, currency) for bill rows; removals are lazy.
+    def __init__(self, entries=()):
+        self.heap = [entry for entry in entries if entry is not None]
+        heapq.heapify(self.heap)
+        self._removed = Counter()
+        # Entries still scheduled; expire() and pop() take them off the heap for good.
+        self._live = Counter(self.heap)
+
+    def __len__(self):
+        return len(self.heap) - sum(self._removed.values())
+
+    def add(self, entry):
+        if entry is None:
+            return
+        self._live[entry] += 1
+        if self._removed[entry]:
+            self._removed[entry] -= 1
+        else:
+            heapq.heappush(self.heap, entry)
+
+    def remove(self, entry):
+        # A bill that has already expired has nothing left to remove.
+        if entry is not None and self._live[entry]:
+            self._live[entry] -= 1
+            self._removed[entry] += 1
+
+    def _prune(self):
+        while self.heap and self._removed[self.heap[0]]:
+            self._removed[heapq.heappop(self.heap)] -= 1
+
+    def peek(self):
+        self._prune()
+        return self.heap[0] if self.heap else None
+
+    def pop(self):
+        self._prune()
+        if not self.heap:
+            return None
+        entry = heapq.heappop(self.heap)
+        self._live[entry] -= 1
+        return entry
+
+    def expire(self, before):
+        expired = []
+        while self.peek() is not None and self.heap[0][0] < before:
+            expired.append(self.pop())
+        return expired
+
+    def upcoming(self, end, start=None):
+        # Walk only the part of the heap that is due by `end` instead of sorting everything.
+        self._prune()
+        found = []
+        removed = Counter({entry: count for entry, count in self._removed.items() if count})
+        frontier = [(self.heap[0], 0)] if self.heap and self.heap[0][0] <= end else []
+        while frontier:
+            entry, position = heapq.heappop(frontier)
+            if removed[entry]:
+                removed[entry] -= 1
+            elif start is None or entry[0] >= start:
+                found.append(entry)
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(self.heap) and self.heap[child][0] <= end:
+                    heapq.heappush(frontier, (self.heap[child], child))
+        return found
+
+
+def bill_row(entry):
+    ordinal, category, amount, original, currency = entry
+    return {"Date": format_date(ordinal), "Category": category, "Amount": money.from_cents(amount),
+            "Original_Amount": money.from_cents(original), "Currency": currency}
+
+
+def original_text(row):
+    cents, currency = txlog.split_original(row.get("Original_Amount"), row.get("Currency"))
+    return f"{money.format_cents(cents)} {currency}" if currency else ""
+
+
+
+def upcoming_bills(transactions, end, start=None):
+    if start is not None:
+        # A bounded window is a date-range lookup; the heap walk would still visit every overdue bill.
+        labels = {code for code, name in enumerate(transactions.label_names) if "Bill" in name}
+        indices = transactions.indices_between(start, end, labels)
+        return [bill_row(entry) for entry in sorted(transactions.bill_entry(index) for index in indices)]
+    return [bill_row(entry) for entry in transactions.bill_schedule().upcoming(end, start)]
+
+
+def as_ledger(transactions, transaction_type):
+    if isinstance(transactions, Ledger):
+        return transactions
+    return Ledger.from_rows(transactions or [], transaction_type)
+
+
+def between(transactions, start=None, end=None):
+    return Ledger.from_rows((transactions.row(index) for index in transactions.indices_between(start, end)),
+                            transactions.transaction_type)
+
+
+def month_range(day):
+    # First and last day of day's month, as ordinals.
+    following = date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return date(day.year, day.month, 1).toordinal(), following.toordinal() - 1
+
+
+def load(path, transaction_type):
+    return _load(path, transaction_type)[0]
+
+
+def _load(path, transaction_type):
+    # Also returns the snapshot signature and the journal offset the ledger is current to.
+    with locking.file_lock(path, shared=True):
+        source = txlog.snapshot_signature(path)
+        columns = colstore.read(path, transaction_type, source) if source else None
+        if columns is not None:
+            ledger = Ledger.from_columns(columns, transaction_type)
+        else:
+            ledger = parse(path, transaction_type)
+            if source and len(ledger) >= SNAPSHOT_ROWS:
+                try:
+                    colstore.write(path, ledger, source)
+                except OSError:
+                    pass
+
+        records, offset = txlog.tail_journal(path)
+        for record in records:
+            ledger.apply(record)
+        return ledger, source, offset
+
+
+class LedgerCache:
+    # Ledgers by path, kept current by applying only the journal records appended since the last lookup.
+    # A file is parsed again only when its snapshot changes, i.e. after a compaction or a full rewrite.
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def get(self, path, transaction_type):
+        with self._lock, locking.file_lock(path, shared=True):
+            entry = self._entries.get(path)
+            journal = cache.file_signature(txlog.journal_path(path))
+            size = journal[1] if journal else 0
+            if (entry is None or entry["type"] != transaction_type or size < entry["offset"]
+                    or txlog.snapshot_signature(path) != entry["snapshot"]):
+                self.misses += 1
+                transactions, snapshot, offset = _load(path, transaction_type)
+                self._entries[path] = {"type": transaction_type, "ledger": transactions,
+                                       "snapshot": snapshot, "offset": offset}
+                return transactions
+
+            self.hits += 1
+            if size > entry["offset"]:
+                records, entry["offset"] = txlog.tail_journal(path, entry["offset"])
+                for record in records:
+                    entry["ledger"].apply(record)
+            return entry["ledger"]
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+
+def load_window(path, transaction_type, start=None, end=None):
+    # Only the partitions overlapping [start, end] are read; rows outside the range may still be included.
+    with locking.file_lock(path, shared=True):
+        manifest = partitions.read_manifest(path)
+        if not manifest:
+            return load(path, transaction_type)
+        rows = partitions.window(path, start, end, txlog.read_journal(path), manifest)
+        return Ledger.from_rows(rows, transaction_type)
+
+
+def parse(path, transaction_type):
+    ledger = Ledger(transaction_type)
+    manifest = partitions.read_manifest(path)
+    if manifest:
+        for entry in manifest["partitions"]:
+            with partitions.open_partition(path, entry) as file:
+                _read_csv(ledger, file)
+        return ledger
+    try:
+        with open(path, "r", newline="", encoding="utf-8") as file:
+            _read_csv(ledger, file)
+        metrics.add_file("read", path)
+    except FileNotFoundError:
+        pass
+    return ledger
+
+
+def _read_csv(ledger, file):
+    reader = csv.reader(file)
+    header = next(reader, None) or []
+    columns = {name: position for position, name in enumerate(header)}
+    date_col = columns.get("Date")
+    label_col = columns.get(ledger.label_field)
+    amount_col = columns.get("Amount")
+    original_col = columns.get("Original_Amount")
+    currency_col = columns.get("Currency")
+    notes_col = columns.get("Notes")
+    width = len(header)
+    for fields in reader:
+        if len(fields) < width:
+            fields = fields + [""] * (width - len(fields))
+        ledger.append({
+            "Date": fields[date_col] if date_col is not None else "",
+            ledger.label_field: fields[label_col] if label_col is not None else "",
+            "Amount": fields[amount_col] if amount_col is not None else "",
+            "Original_Amount": fields[original_col] if original_col is not None else "",
+            "Currency": fields[currency_col] if currency_col is not None else "",
+            "Notes": fields[notes_col] if notes_col is not None else "",
+        })
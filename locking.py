@@ -0,0 +1,82 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import atomic
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+LOCK_SUFFIX = ".lock"
+VERSION_SUFFIX = ".version"
+
+_held = threading.local()
+_fallback = threading.RLock()
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    # Advisory lock on path + ".lock", re-entrant per thread; an exclusive request upgrades a shared hold.
+    locks = getattr(_held, "locks", None)
+    if locks is None:
+        locks = _held.locks = {}
+
+    held = locks.get(path)
+    if held is not None:
+        upgrade = held["shared"] and not shared
+        if upgrade and fcntl is not None:
+            fcntl.flock(held["fd"], fcntl.LOCK_EX)
+            held["shared"] = False
+        held["count"] += 1
+        try:
+            yield
+        finally:
+            held["count"] -= 1
+            if upgrade and fcntl is not None:
+                fcntl.flock(held["fd"], fcntl.LOCK_SH)
+                held["shared"] = True
+        return
+
+    if fcntl is None:
+        with _fallback:
+            locks[path] = {"fd": None, "count": 1, "shared": shared}
+            try:
+                yield
+            finally:
+                del locks[path]
+        return
+
+    fd = os.open(path + LOCK_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        locks[path] = {"fd": fd, "count": 1, "shared": shared}
+        try:
+            yield
+        finally:
+            del locks[path]
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def user_lock(data_dir, username):
+    return file_lock(os.path.join(data_dir, username))
+
+
+def read_version(data_dir, username):
+    try:
+        with open(os.path.join(data_dir, username + VERSION_SUFFIX), "r") as file:
+            return int(file.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def bump_version(data_dir, username):
+    # Callers hold user_lock, so the read-increment-write cannot interleave with another writer.
+    version = read_version(data_dir, username) + 1
+    atomic.write_atomic(os.path.join(data_dir, username + VERSION_SUFFIX),
+                        lambda file: file.write(str(version)), durable=False)
+    return version
@@ -0,0 +1,235 @@
+import atexit
+import bisect
+import functools
+import os
+import threading
+import time
+
+# Latency buckets in seconds, Prometheus style: each bucket counts observations at or below its bound.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_FILE = os.environ.get("EXPENSE_METRICS_FILE")
+EXPORT_INTERVAL = 15
+
+_lock = threading.Lock()
+_histograms = {}
+_rows = {}
+_errors = {}
+_bytes = {}
+_exporter = None
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation; enough to spot where time goes.
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+def observe(operation, seconds, rows=None, error=False):
+    with _lock:
+        histogram = _histograms.get(operation)
+        if histogram is None:
+            histogram = _histograms[operation] = Histogram()
+        histogram.observe(seconds)
+        if rows:
+            _rows[operation] = _rows.get(operation, 0) + rows
+        if error:
+            _errors[operation] = _errors.get(operation, 0) + 1
+
+
+def add_bytes(direction, path, count):
+    if not count:
+        return
+    kind = os.path.splitext(path)[1].lstrip(".") or "other"
+    with _lock:
+        _bytes[direction, kind] = _bytes.get((direction, kind), 0) + count
+
+
+def add_file(direction, path):
+    try:
+        add_bytes(direction, path, os.path.getsize(path))
+    except OSError:
+        pass
+
+
+def result_rows(result, *args, **kwargs):
+    return len(result) if hasattr(result, "__len__") else None
+
+
+def arg_rows(position):
+    def rows(result, *args, **kwargs):
+        value = args[position] if position < len(args) else None
+        return len(value) if hasattr(value, "__len__") else None
+    return rows
+
+
+def timed(operation, rows=None):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                observe(operation, time.perf_counter() - started, error=True)
+                raise
+            observe(operation, time.perf_counter() - started, rows(result, *args, **kwargs) if rows else None)
+            return result
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    with _lock:
+        return {
+            "operations": {name: {"count": histogram.count, "sum": histogram.sum, "counts": list(histogram.counts),
+                                  "p50": histogram.quantile(0.5), "p99": histogram.quantile(0.99),
+                                  "rows": _rows.get(name, 0), "errors": _errors.get(name, 0)}
+                           for name, histogram in _histograms.items()},
+            "bytes": dict(_bytes),
+        }
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _rows.clear()
+        _errors.clear()
+        _bytes.clear()
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render():
+    data = snapshot()
+    operations = sorted(data["operations"].items())
+    lines = [
+        "# HELP expense_operation_duration_seconds Time spent in instrumented load/save/report operations.",
+        "# TYPE expense_operation_duration_seconds histogram",
+    ]
+    for name, stats in operations:
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), stats["counts"]):
+            cumulative += count
+            lines.append(f'expense_operation_duration_seconds_bucket{{operation="{_label(name)}",le="{bound}"}} '
+                         f"{cumulative}")
+        lines.append(f'expense_operation_duration_seconds_sum{{operation="{_label(name)}"}} {stats["sum"]:.6f}')
+        lines.append(f'expense_operation_duration_seconds_count{{operation="{_label(name)}"}} {stats["count"]}')
+
+    lines += ["# HELP expense_operation_rows_total Rows loaded, saved or scanned by each operation.",
+              "# TYPE expense_operation_rows_total counter"]
+    lines += [f'expense_operation_rows_total{{operation="{_label(name)}"}} {stats["rows"]}'
+              for name, stats in operations if stats["rows"]]
+
+    lines += ["# HELP expense_operation_errors_total Operations that raised.",
+              "# TYPE expense_operation_errors_total counter"]
+    lines += [f'expense_operation_errors_total{{operation="{_label(name)}"}} {stats["errors"]}'
+              for name, stats in operations if stats["errors"]]
+
+    lines += ["# HELP expense_io_bytes_total Bytes read from and written to the data directory, by file type.",
+              "# TYPE expense_io_bytes_total counter"]
+    lines += [f'expense_io_bytes_total{{direction="{direction}",file="{_label(kind)}"}} {count}'
+              for (direction, kind), count in sorted(data["bytes"].items())]
+    return "\n".join(lines) + "\n"
+
+
+def write_file(path):
+    # Same rename-into-place as the data files, so a scraper never reads half a file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(render())
+    os.replace(tmp_path, path)
+
+
+def _export_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_file(path)
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+
+def start_exporter(path=METRICS_FILE, interval=EXPORT_INTERVAL):
+    # For a node_exporter textfile collector: rewrite the file periodically and once more at exit.
+    global _exporter
+    if path and _exporter is None:
+        _exporter = threading.Thread(target=_export_loop, args=(path, interval), daemon=True)
+        _exporter.start()
+        atexit.register(write_file, path)
+    return _exporter
+
+
+class Profiler:
+    # cProfile and tracemalloc over a whole session; reports land next to `path` when it stops.
+    # cProfile only follows the thread that enabled it, so threads started meanwhile get a profile of their own.
+    def __init__(self, path):
+        self.path = path
+        self.profiles = []
+
+    def _thread_started(self, *args):
+        import cProfile
+
+        profile = cProfile.Profile()
+        self.profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        import tracemalloc
+
+        tracemalloc.start(25)
+        threading.setprofile(self._thread_started)
+        self._thread_started()
+        return self
+
+    def stop(self):
+        import io
+        import pstats
+        import tracemalloc
+
+        if not self.profiles:
+            return
+        threading.setprofile(None)
+        self.profiles[0].disable()
+        allocations = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stats = pstats.Stats(*self.profiles)
+        stats.dump_stats(self.path + ".prof")
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats("cumulative").print_stats(40)
+        text.write(f"\nTraced memory: {current / 1024 / 1024:.1f} MB current, {peak / 1024 / 1024:.1f} MB peak\n")
+        text.write("Top allocations by line:\n")
+        for stat in allocations.statistics("lineno")[:25]:
+            text.write(f"{stat}\n")
+        text.write("\n" + render())
+        with open(self.path + ".txt", "w", encoding="utf-8") as file:
+            file.write(text.getvalue())
+        self.profiles = []
+        print(f"Profile written to {self.path}.prof and {self.path}.txt")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
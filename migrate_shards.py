@@ -0,0 +1,105 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import atomic
+import locking
+import partitions
+import user_directory
+
+# Dropped in a shard once all of its users are moved, so a rerun skips it.
+MARKER = ".migrated"
+
+
+def companions(filename):
+    # Everything that sits next to a ledger or budgets file: journal, column cache, lock and partitions.
+    return [filename, filename + ".journal", filename + ".cols", filename + ".lock", partitions.directory(filename)]
+
+
+def user_names(username, record):
+    names = [f"{username}_aggregates.json", f"{username}_aggregates.json.lock",
+             username + locking.VERSION_SUFFIX, username + locking.VERSION_SUFFIX + ".lock", username + ".lock"]
+    for filename in record.get("data_files", {}).values():
+        names.extend(companions(os.path.basename(filename)))
+    return names
+
+
+def migrate_shard(data_dir, top, users):
+    marker = os.path.join(data_dir, top, MARKER)
+    if os.path.exists(marker):
+        return top, len(users), 0, True
+
+    moved = 0
+    records = {}
+    for username, record in users.items():
+        target = os.path.join(data_dir, *user_directory.shard(username))
+        os.makedirs(target, exist_ok=True)
+        # Moves are renames within one filesystem; a source that is gone was moved by an earlier run.
+        for name in user_names(username, record):
+            source = os.path.join(data_dir, name)
+            if os.path.lexists(source):
+                os.replace(source, os.path.join(target, name))
+                moved += 1
+        data_files = {data_type: os.path.join(*user_directory.shard(username), os.path.basename(filename))
+                      for data_type, filename in record.get("data_files", {}).items()}
+        records[username] = dict(record, data_files=data_files)
+
+    user_directory.UserDirectory(os.path.join(data_dir, top, user_directory.USERS_FILE)).replace_all(records)
+    with open(marker, "w"):
+        pass
+    return top, len(users), moved, False
+
+
+def finish(data_dir, tops):
+    # Writing the layout file is the switch-over; the flat registry is kept as a backup.
+    atomic.write_json(os.path.join(data_dir, user_directory.LAYOUT_FILE), {"layout": "sharded", "levels": 2})
+    for name in (user_directory.USERS_FILE, user_directory.USERS_FILE + ".journal"):
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            os.replace(path, path + ".flat")
+    for top in tops:
+        try:
+            os.remove(os.path.join(data_dir, top, MARKER))
+        except FileNotFoundError:
+            pass
+
+
+def migrate(data_dir, workers=None):
+    if user_directory.is_sharded(data_dir):
+        return []
+    users = user_directory.UserDirectory(os.path.join(data_dir, user_directory.USERS_FILE)).all()
+    grouped = {}
+    for username, record in users.items():
+        grouped.setdefault(user_directory.shard(username)[0], {})[username] = record
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(migrate_shard, data_dir, top, shard_users) for top, shard_users in grouped.items()]
+        for future in as_completed(futures):
+            results.append(future.result())
+    finish(data_dir, grouped)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move a flat data directory into the hashed two-level shard layout (run with the apps stopped)")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if user_directory.is_sharded(args.data_dir):
+        print(f"{args.data_dir} is already sharded")
+        return
+
+    started = time.perf_counter()
+    results = migrate(args.data_dir, args.workers)
+    skipped = sum(1 for *_, done in results if done)
+    print(f"Migrated {sum(result[1] for result in results)} users into {len(results)} shards "
+          f"({sum(result[2] for result in results)} files moved, {skipped} shards already done) "
+          f"in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
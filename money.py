@@ -0,0 +1,37 @@
+def to_cents(value):
+    if isinstance(value, int):
+        return value * 100
+    text = repr(value) if isinstance(value, float) else str(value).strip().replace(",", "")
+    whole, _, fraction = text.partition(".")
+    digits = whole.lstrip("+-")
+    # Plain "1234.5" style text is by far the common case; avoid Decimal for it.
+    if len(whole) - len(digits) <= 1 and (digits or fraction) and (not digits or digits.isdecimal()) \
+            and len(fraction) <= 2 and (not fraction or fraction.isdecimal()):
+        cents = int(digits or 0) * 100 + int(fraction.ljust(2, "0"))
+        return -cents if whole.startswith("-") else cents
+    from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+    try:
+        return int((Decimal(text) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"Invalid amount: {value!r}") from None
+
+
+def from_cents(cents):
+    return cents / 100
+
+
+def parse_amounts(amounts):
+    # Budget limits: numbers from older files and decimal text both come back as cents.
+    return {key: to_cents(value) for key, value in amounts.items()}
+
+
+def format_amounts(amounts):
+    return {key: format_cents(value) for key, value in amounts.items()}
+
+
+def format_cents(cents):
+    cents = int(cents)
+    sign = "-" if cents < 0 else ""
+    units, cents = divmod(abs(cents), 100)
+    return f"{sign}{units}.{cents:02d}"
@@ -0,0 +1,294 @@
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import date, datetime
+from functools import lru_cache
+
+import atomic
+import metrics
+
+MANIFEST_FILE = "manifest.json"
+UNDATED = "undated"
+# Set EXPENSE_PARTITIONS to "month" or "year" to split ledgers on their next compaction.
+PARTITION_BY = os.environ.get("EXPENSE_PARTITIONS", "")
+# Partitions older than this many months are written gzip-compressed; 0 keeps everything plain.
+COMPRESS_AFTER = int(os.environ.get("EXPENSE_COMPRESS_AFTER", "0"))
+
+
+def directory(path):
+    return os.path.splitext(path)[0]
+
+
+def manifest_path(path):
+    return os.path.join(directory(path), MANIFEST_FILE)
+
+
+def read_manifest(path):
+    try:
+        with open(manifest_path(path), "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def is_partitioned(path):
+    return os.path.exists(manifest_path(path))
+
+
+@lru_cache(maxsize=4096)
+def partition_key(value, by="month"):
+    try:
+        day = datetime.strptime(value, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return UNDATED
+    return f"{day.year:04d}-{day.month:02d}" if by == "month" else f"{day.year:04d}"
+
+
+def _order(key):
+    return (key != UNDATED, key)
+
+
+def is_cold(key, by, months=None, today=None):
+    months = COMPRESS_AFTER if months is None else months
+    if not months or key == UNDATED:
+        return False
+    today = today or date.today()
+    year, month = (int(key[:4]), int(key[5:7])) if by == "month" else (int(key), 12)
+    return (today.year - year) * 12 + today.month - month >= months
+
+
+def open_partition(path, entry):
+    filepath = os.path.join(directory(path), entry["file"])
+    metrics.add_file("read", filepath)
+    if entry["file"].endswith(".gz"):
+        return gzip.open(filepath, "rt", newline="", encoding="utf-8")
+    return open(filepath, "r", newline="", encoding="utf-8")
+
+
+def read_partition(path, entry):
+    with open_partition(path, entry) as file:
+        return list(csv.DictReader(file))
+
+
+def load_rows(path, manifest=None):
+    manifest = manifest or read_manifest(path)
+    rows = []
+    for entry in manifest["partitions"] if manifest else []:
+        rows.extend(read_partition(path, entry))
+    return rows
+
+
+def write_partition(path, key, rows, fieldnames, by, generation, compress_after=None):
+    # Files carry the manifest generation, so nothing the current manifest points at is overwritten.
+    compressed = is_cold(key, by, compress_after)
+    filename = f"{key}.{generation}.csv" + (".gz" if compressed else "")
+
+    def write(file):
+        # mtime=0 keeps the gzip bytes a function of the rows alone.
+        stream = gzip.GzipFile(fileobj=file, mode="wb", mtime=0) if compressed else file
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        writer = csv.DictWriter(text, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+        text.flush()
+        text.detach()
+        if compressed:
+            stream.close()
+
+    atomic.write_atomic(os.path.join(directory(path), filename), write, binary=True)
+    return {"key": key, "file": filename, "rows": len(rows)}
+
+
+def write_manifest(path, by, fieldnames, entries, generation, compress_after=None):
+    # Replacing the manifest is the commit point; files it no longer names are removed afterwards.
+    entries = sorted((entry for entry in entries if entry["rows"]), key=lambda entry: _order(entry["key"]))
+    atomic.write_json(manifest_path(path), {"by": by, "fieldnames": fieldnames, "generation": generation,
+                                            "compress_after": compress_after, "partitions": entries}, indent=1)
+    keep = {entry["file"] for entry in entries}
+    for filename in os.listdir(directory(path)):
+        if filename != MANIFEST_FILE and filename not in keep:
+            try:
+                os.remove(os.path.join(directory(path), filename))
+            except OSError:
+                pass
+
+
+def write_all(path, rows, fieldnames, by=None, compress_after=None):
+    # Rows must already be cleaned to fieldnames; they are grouped per partition in their current order.
+    manifest = read_manifest(path) or {}
+    by = by or manifest.get("by") or PARTITION_BY or "month"
+    compress_after = manifest.get("compress_after") if compress_after is None else compress_after
+    generation = manifest.get("generation", 0) + 1
+    os.makedirs(directory(path), exist_ok=True)
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(partition_key(row.get("Date"), by), []).append(row)
+    entries = [write_partition(path, key, group, fieldnames, by, generation, compress_after)
+               for key, group in grouped.items()]
+    write_manifest(path, by, fieldnames, entries, generation, compress_after)
+
+
+class Segments:
+    # The ledger as its partitions in manifest order followed by journalled additions, as replay sees it.
+    # Partitions are read only when a record touches them or a caller asks for them.
+    def __init__(self, path, manifest):
+        self.path = path
+        self.by = manifest["by"]
+        self.generation = manifest.get("generation", 0)
+        self.compress_after = manifest.get("compress_after")
+        self.fieldnames = manifest["fieldnames"]
+        self.entries = {entry["key"]: entry for entry in manifest["partitions"]}
+        self.segments = [{"key": entry["key"], "count": entry["rows"], "rows": None} for entry in manifest["partitions"]]
+        self.tail = {"key": None, "count": 0, "rows": []}
+        self.dirty = set()
+
+    def key(self, row):
+        return partition_key(row.get("Date"), self.by)
+
+    def load(self, segment):
+        if segment["rows"] is None:
+            segment["rows"] = read_partition(self.path, self.entries[segment["key"]])
+            segment["count"] = len(segment["rows"])
+        return segment["rows"]
+
+    def locate(self, index):
+        for segment in self.segments + [self.tail]:
+            if index < segment["count"]:
+                return segment, index
+            index -= segment["count"]
+        return None, None
+
+    def apply(self, record):
+        op = record.get("op")
+        if op == "add":
+            self.tail["rows"].append(record["row"])
+            self.tail["count"] += 1
+            self.dirty.add(self.key(record["row"]))
+            return
+        if op not in ("update", "delete") or not isinstance(record.get("index"), int) or record["index"] < 0:
+            return
+        segment, offset = self.locate(record["index"])
+        if segment is None:
+            return
+        rows = self.load(segment)
+        if segment["key"] is not None:
+            self.dirty.add(segment["key"])
+        self.dirty.add(self.key(rows[offset]))
+        if op == "update":
+            rows[offset] = record["row"]
+            self.dirty.add(self.key(record["row"]))
+        else:
+            rows.pop(offset)
+            segment["count"] -= 1
+
+    def loaded(self, keys):
+        for segment in self.segments:
+            if segment["key"] in keys:
+                self.load(segment)
+        return [segment for segment in self.segments + [self.tail] if segment["rows"] is not None]
+
+    def rows(self, keys):
+        return [row for segment in self.loaded(keys) for row in segment["rows"] if self.key(row) in keys]
+
+
+def apply(path, records, fieldnames, compress_after=None):
+    # Fold journal records into the partitions they touch; every other partition is left as it is.
+    segments = Segments(path, read_manifest(path))
+    compress_after = segments.compress_after if compress_after is None else compress_after
+    for record in records:
+        segments.apply(record)
+    if not segments.dirty:
+        return []
+    grouped = {key: [] for key in segments.dirty}
+    for segment in segments.loaded(segments.dirty):
+        for row in segment["rows"]:
+            key = segments.key(row)
+            if key in grouped:
+                grouped[key].append(row)
+
+    entries = dict(segments.entries)
+    generation = segments.generation + 1
+    for key, rows in grouped.items():
+        if rows:
+            entries[key] = write_partition(path, key, rows, fieldnames, segments.by, generation, compress_after)
+        else:
+            entries.pop(key, None)
+    write_manifest(path, segments.by, fieldnames, entries.values(), generation, compress_after)
+    return sorted(segments.dirty, key=_order)
+
+
+def window(path, start=None, end=None, records=(), manifest=None):
+    # Rows in partitions overlapping the ordinal range [start, end], with journal records applied, in ledger order.
+    manifest = manifest or read_manifest(path)
+    segments = Segments(path, manifest)
+    start_key, end_key = window_keys(start, end, segments.by)
+    keys = {key for key in segments.entries if key != UNDATED and start_key <= key <= end_key}
+    segments.loaded(keys)
+    for record in records:
+        segments.apply(record)
+    keys |= {key for key in segments.dirty if key != UNDATED and start_key <= key <= end_key}
+    return segments.rows(keys)
+
+
+def window_keys(start, end, by):
+    return (partition_key(date.fromordinal(start).isoformat(), by) if start else "0000",
+            partition_key(date.fromordinal(end).isoformat(), by) if end else "9999")
+
+
+def compress_cold(path, compress_after=None):
+    # Rewrite plain partitions that have gone cold as gzip; returns the keys that were compressed.
+    manifest = read_manifest(path)
+    if not manifest:
+        return []
+    entries = {entry["key"]: entry for entry in manifest["partitions"]}
+    compress_after = manifest.get("compress_after") if compress_after is None else compress_after
+    generation = manifest.get("generation", 0) + 1
+    changed = []
+    for key, entry in entries.items():
+        if not entry["file"].endswith(".gz") and is_cold(key, manifest["by"], compress_after):
+            entries[key] = write_partition(path, key, read_partition(path, entry), manifest["fieldnames"],
+                                           manifest["by"], generation, compress_after)
+            changed.append(key)
+    if changed:
+        write_manifest(path, manifest["by"], manifest["fieldnames"], entries.values(), generation, compress_after)
+    return changed
+
+
+def migrate(path, by, compress_after):
+    import txlog
+
+    txlog.partition(path, txlog.read_header(path), by, compress_after)
+    return path, len(read_manifest(path)["partitions"])
+
+
+def main():
+    import argparse
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    import user_directory
+
+    parser = argparse.ArgumentParser(description="Split every user's ledger CSVs into time partitions")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--by", choices=["month", "year"], default=PARTITION_BY or "month")
+    parser.add_argument("--compress-after", type=int, default=COMPRESS_AFTER,
+                        help="gzip partitions older than this many months (0 = never)")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    paths = []
+    for record in user_directory.open_directory(args.data_dir).all().values():
+        for data_type, filename in record.get("data_files", {}).items():
+            path = os.path.join(args.data_dir, filename)
+            if data_type != "budgets" and (os.path.exists(path) or is_partitioned(path)):
+                paths.append(path)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for path, count in executor.map(partial(migrate, by=args.by, compress_after=args.compress_after), paths):
+            print(f"{path}: {count} partitions")
+
+
+if __name__ == "__main__":
+    main()
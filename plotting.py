@@ -0,0 +1,33 @@
+_pyplot = None
+
+
+def pyplot(style=None):
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib.pyplot as plt
+        _pyplot = plt
+    if style:
+        _pyplot.style.use(style)
+    return _pyplot
+
+
+def show_bar_chart(values, title):
+    plt = pyplot()
+    plt.bar(values.keys(), values.values())
+    plt.title(title)
+    plt.show()
+
+
+def embed_bar_chart(master, values, title, style="grayscale"):
+    plt = pyplot(style)
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+    fig, ax = plt.subplots(figsize=(6, 4))
+    ax.bar(values.keys(), values.values())
+    ax.set_title(title)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+
+    canvas = FigureCanvasTkAgg(fig, master=master)
+    canvas.draw()
+    return canvas
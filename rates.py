@@ -0,0 +1,156 @@
+import bisect
+import json
+import os
+from datetime import date, datetime
+from functools import lru_cache
+
+from cache import file_signature
+
+
+BASE_CURRENCY = "KES"
+RATES_FILENAME = "exchange_rates.json"
+RATES_FILE = os.environ.get("EXPENSE_RATES", os.path.join("data", RATES_FILENAME))
+
+# Units of each currency per 1 KES, used when no dated snapshot covers a transaction.
+DEFAULT_RATES = {
+    "KES": 1.0,
+    "USD": 0.0078,
+    "EUR": 0.0072,
+    "GBP": 0.0062
+}
+
+
+def to_ordinal(on):
+    if on is None or isinstance(on, int):
+        return on
+    if isinstance(on, date):
+        return on.toordinal()
+    return datetime.strptime(on, "%Y-%m-%d").toordinal()
+
+
+class StaticRateProvider:
+    def __init__(self, rates=None):
+        self.rates = dict(rates or DEFAULT_RATES)
+
+    def snapshots(self):
+        return [(1, self.rates)]
+
+
+class FileRateProvider:
+    # {"2024-01-01": {"USD": 0.0077, ...}, ...}; each snapshot applies from its date until the next one.
+    def __init__(self, path=RATES_FILE, fallback=None):
+        self.path = path
+        self.fallback = fallback or StaticRateProvider()
+
+    def signature(self):
+        return file_signature(self.path)
+
+    def snapshots(self):
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return self.fallback.snapshots()
+        snapshots = [(to_ordinal(day), rates) for day, rates in data.items()]
+        return self.fallback.snapshots() + snapshots
+
+
+class RateTable:
+    def __init__(self, snapshots):
+        snapshots = sorted(snapshots, key=lambda snapshot: snapshot[0])
+        self.dates = []
+        self.tables = []
+        self.currencies = list(DEFAULT_RATES)
+        current = {BASE_CURRENCY: 1.0}
+        for ordinal, rates in snapshots:
+            # A snapshot only has to list the rates that changed.
+            current = dict(current, **{currency.upper(): float(rate) for currency, rate in rates.items()})
+            current[BASE_CURRENCY] = 1.0
+            if self.dates and self.dates[-1] == ordinal:
+                self.tables[-1] = current
+            else:
+                self.dates.append(ordinal)
+                self.tables.append(current)
+            self.currencies.extend(currency for currency in current if currency not in self.currencies)
+        # A currency first listed in a later snapshot uses that first rate for earlier dates too.
+        for index in range(len(self.tables) - 2, -1, -1):
+            for currency, rate in self.tables[index + 1].items():
+                self.tables[index].setdefault(currency, rate)
+        self.factor = lru_cache(maxsize=4096)(self._factor)
+        self._matrix = None
+
+    def __contains__(self, currency):
+        return currency in self.currencies
+
+    def snapshot_index(self, on=None):
+        if on is None:
+            return len(self.dates) - 1
+        return max(bisect.bisect_right(self.dates, to_ordinal(on)) - 1, 0)
+
+    def rate(self, currency, on=None):
+        return self.tables[self.snapshot_index(on)][currency]
+
+    def _factor(self, from_currency, to_currency, index):
+        table = self.tables[index]
+        for currency in (from_currency, to_currency):
+            if currency not in table:
+                raise ValueError(f"No exchange rate for {currency}")
+        return table[to_currency] / table[from_currency]
+
+    def convert(self, amount, from_currency, to_currency=BASE_CURRENCY, on=None):
+        if from_currency == to_currency:
+            return amount
+        return amount * self.factor(from_currency, to_currency, self.snapshot_index(on))
+
+    def convert_cents(self, cents, from_currency, to_currency=BASE_CURRENCY, on=None):
+        return int(round(self.convert(cents, from_currency, to_currency, on)))
+
+    def convert_array(self, amounts, dates, from_currency, to_currency=BASE_CURRENCY):
+        # dates are ordinals; from_currency is a currency name or an array of indexes into self.currencies.
+        import numpy as np
+
+        if self._matrix is None:
+            self._matrix = np.array([[table.get(currency, np.nan) for currency in self.currencies]
+                                     for table in self.tables])
+            self._date_index = np.array(self.dates, dtype=np.int64)
+        snapshots = np.maximum(np.searchsorted(self._date_index, dates, side="right") - 1, 0)
+        rows = self._matrix[snapshots]
+        target = rows[:, self.currencies.index(to_currency)]
+        if isinstance(from_currency, str):
+            source = rows[:, self.currencies.index(from_currency)]
+        else:
+            source = rows[np.arange(len(rows)), np.asarray(from_currency)]
+        return np.asarray(amounts, dtype=np.float64) * (target / source)
+
+
+_provider = FileRateProvider()
+_table = None
+_signature = None
+
+
+def set_provider(provider):
+    global _provider, _table
+    _provider = provider
+    _table = None
+
+
+def use_data_dir(data_dir):
+    if "EXPENSE_RATES" not in os.environ:
+        set_provider(FileRateProvider(os.path.join(data_dir, RATES_FILENAME)))
+
+
+def table():
+    global _table, _signature
+    signature = _provider.signature() if hasattr(_provider, "signature") else None
+    if _table is None or signature != _signature:
+        _table = RateTable(_provider.snapshots())
+        _signature = signature
+    return _table
+
+
+def convert(amount, from_currency, to_currency=BASE_CURRENCY, on=None):
+    return table().convert(amount, from_currency, to_currency, on)
+
+
+def convert_cents(cents, from_currency, to_currency=BASE_CURRENCY, on=None):
+    return table().convert_cents(cents, from_currency, to_currency, on)
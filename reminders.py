@@ -0,0 +1,69 @@
+import argparse
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import ledger
+import user_directory
+
+
+def expense_file(data_dir, record):
+    filename = user_directory.data_file(record, "expenses")
+    return os.path.join(data_dir, filename) if filename else None
+
+
+def notify(username, bill):
+    print(f"[{datetime.now():%Y-%m-%d %H:%M}] {username}: {bill['Date']} - {bill['Category']}: "
+          f"KES {float(bill['Amount']):.2f} ({ledger.original_text(bill)})", flush=True)
+
+
+def seconds_until_tomorrow():
+    tomorrow = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+    return max((tomorrow - datetime.now()).total_seconds(), 1)
+
+
+def run(data_dir="data", days=7, interval=60, usernames=None, once=False, notify=notify):
+    directory = user_directory.open_directory(data_dir)
+    # Reloads a ledger after a compaction, otherwise applies only new journal records.
+    ledgers = ledger.LedgerCache()
+    fired = set()
+
+    while True:
+        today = date.today().toordinal()
+        for username, record in directory.all().items():
+            if usernames and username not in usernames:
+                continue
+            path = expense_file(data_dir, record)
+            if not path:
+                continue
+            schedule = ledgers.get(path, "expense").bill_schedule()
+            for entry in schedule.expire(today):
+                fired.discard((username,) + entry)
+            for entry in schedule.upcoming(today + days, today):
+                if (username,) + entry not in fired:
+                    fired.add((username,) + entry)
+                    notify(username, ledger.bill_row(entry))
+
+        if once:
+            return
+        # The reminder window only moves at midnight; in between, wake just to pick up new journal records.
+        time.sleep(min(interval, seconds_until_tomorrow()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print bill reminders as they come due")
+    parser.add_argument("users", nargs="*", help="only watch these users (default: everyone)")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--days", type=int, default=7, help="remind this many days before a bill is due")
+    parser.add_argument("--interval", type=float, default=60, help="seconds between checks for new transactions")
+    parser.add_argument("--once", action="store_true", help="print what is due now and exit")
+    args = parser.parse_args()
+
+    try:
+        run(args.data_dir, args.days, args.interval, set(args.users), args.once)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
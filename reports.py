@@ -0,0 +1,132 @@
+from datetime import date
+
+import numpy as np
+
+import money
+import rates
+
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+# Views share memory with the ledger's arrays; keep them local so the
+# ledger can still grow once the report has been computed. Amounts are
+# integer cents throughout and only divided down when a total is returned.
+def _columns(transactions, currency=rates.BASE_CURRENCY):
+    dates = np.frombuffer(transactions.dates, dtype=np.intc)
+    amounts = np.frombuffer(transactions.amounts, dtype=np.int64)
+    labels = np.frombuffer(transactions.labels, dtype=np.intc)
+    if currency != rates.BASE_CURRENCY:
+        amounts = display_amounts(transactions, dates, amounts, currency)
+    return dates, amounts, labels
+
+
+def display_amounts(transactions, dates, amounts, currency):
+    # Re-convert from the original amount and currency at each row's date in one pass;
+    # rows without a usable original fall back to their KES amount.
+    table = rates.table()
+    base = table.currencies.index(rates.BASE_CURRENCY)
+    lookup = np.array([table.currencies.index(name) if name in table else -1
+                       for name in transactions.currency_names] or [-1], dtype=np.int64)
+    codes = lookup[np.frombuffer(transactions.currencies, dtype=np.intc)]
+    originals = np.frombuffer(transactions.original_amounts, dtype=np.int64)
+    known = codes >= 0
+    source = np.where(known, originals, amounts)
+    converted = table.convert_array(source, dates, np.where(known, codes, base), currency)
+    return np.rint(converted).astype(np.int64)
+
+
+def _units(cents):
+    return float(cents) / 100
+
+
+def label_totals(transactions, currency=rates.BASE_CURRENCY):
+    if not len(transactions):
+        return {}
+    _, amounts, labels = _columns(transactions, currency)
+    size = len(transactions.label_names)
+    # bincount accumulates in float64, which stays exact for whole cents up to 2**53.
+    sums = np.bincount(labels, weights=amounts, minlength=size)
+    counts = np.bincount(labels, minlength=size)
+    return {name: _units(sums[code]) for code, name in enumerate(transactions.label_names) if counts[code]}
+
+
+def _month_index(dates):
+    days = (dates - EPOCH_ORDINAL).astype("datetime64[D]")
+    return days.astype("datetime64[M]").astype(np.int64)
+
+
+def _month_name(index):
+    return str(np.datetime64(int(index), "M"))
+
+
+def monthly_totals(transactions, label=None, currency=rates.BASE_CURRENCY):
+    if not len(transactions):
+        return {}
+    dates, amounts, labels = _columns(transactions, currency)
+    mask = dates > 0
+    if label is not None:
+        mask &= labels == transactions.label_code(label)
+    months = _month_index(dates[mask])
+    if not months.size:
+        return {}
+    first = months.min()
+    sums = np.bincount(months - first, weights=amounts[mask])
+    counts = np.bincount(months - first)
+    return {_month_name(first + offset): _units(sums[offset]) for offset in np.flatnonzero(counts)}
+
+
+def rolling_average(monthly, window=3):
+    if not monthly:
+        return {}
+    indices = np.array([np.datetime64(month, "M").astype(np.int64) for month in monthly])
+    first = indices.min()
+    series = np.zeros(int(indices.max() - first) + 1)
+    series[indices - first] = list(monthly.values())
+    window = max(1, min(window, series.size))
+    cumulative = np.cumsum(np.concatenate(([0.0], series)))
+    offsets = np.arange(series.size)
+    starts = np.maximum(offsets - window + 1, 0)
+    averages = (cumulative[offsets + 1] - cumulative[starts]) / (offsets - starts + 1)
+    return {_month_name(first + offset): float(averages[offset]) for offset in range(series.size)}
+
+
+def budget_utilisation(transactions, budgets, currency=rates.BASE_CURRENCY):
+    spent = label_totals(transactions, currency)
+    # Budgets are set in KES; show the limits at the current rate.
+    factor = rates.table().convert(1.0, rates.BASE_CURRENCY, currency)
+    status = []
+    for category, limit in budgets.items():
+        used = spent.get(category, 0.0)
+        limit = money.from_cents(limit) * factor
+        status.append({
+            "category": category,
+            "limit": limit,
+            "spent": used,
+            "remaining": limit - used,
+            "utilisation": used / limit if limit else None,
+        })
+    return status
+
+
+def total(transactions, currency=rates.BASE_CURRENCY):
+    if not len(transactions):
+        return 0.0
+    return _units(_columns(transactions, currency)[1].sum())
+
+
+def build_report(expenses, income, budgets, window=3, currency=rates.BASE_CURRENCY):
+    categories = label_totals(expenses, currency)
+    sources = label_totals(income, currency)
+    monthly_expenses = monthly_totals(expenses, currency=currency)
+    return {
+        "currency": currency,
+        "categories": categories,
+        "sources": sources,
+        "monthly_expenses": monthly_expenses,
+        "monthly_income": monthly_totals(income, currency=currency),
+        "rolling_expenses": rolling_average(monthly_expenses, window),
+        "budgets": budget_utilisation(expenses, budgets or {}, currency),
+        "total_expenses": total(expenses, currency),
+        "total_income": total(income, currency),
+    }
@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import money
+import txlog
+import user_directory
+
+
+DB_FILE = "ledger.db"
+# PRAGMA user_version; 1 stores amount and original_amount as integer cents, 2 budget limits too.
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    date TEXT NOT NULL,
+    category TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    original_amount INTEGER,
+    currency TEXT,
+    notes TEXT
+);
+CREATE TABLE IF NOT EXISTS income (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    date TEXT NOT NULL,
+    source TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    original_amount INTEGER,
+    currency TEXT,
+    notes TEXT
+);
+CREATE TABLE IF NOT EXISTS budgets (
+    user TEXT NOT NULL,
+    category TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    PRIMARY KEY (user, category)
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (user, date);
+CREATE INDEX IF NOT EXISTS idx_expenses_user_category ON expenses (user, category);
+CREATE INDEX IF NOT EXISTS idx_income_user_date ON income (user, date);
+CREATE INDEX IF NOT EXISTS idx_income_user_source ON income (user, source);
+"""
+
+TABLES = {
+    "expense": "expenses",
+    "expenses": "expenses",
+    "income": "income",
+}
+
+COLUMNS = {
+    "expenses": [("Date", "date"), ("Category", "category"), ("Amount", "amount"),
+                 ("Original_Amount", "original_amount"), ("Currency", "currency"), ("Notes", "notes")],
+    "income": [("Date", "date"), ("Source", "source"), ("Amount", "amount"),
+               ("Original_Amount", "original_amount"), ("Currency", "currency"), ("Notes", "notes")],
+}
+
+_local = threading.local()
+
+
+def connect(path):
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    if path not in connections:
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _split_original_amounts(conn)
+        _amounts_to_cents(conn)
+        connections[path] = conn
+    return connections[path]
+
+
+def _split_original_amounts(conn):
+    # Databases created before the currency column stored "12.00 USD" in original_amount.
+    for table in ("expenses", "income"):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if "currency" in columns:
+            continue
+        with conn:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN currency TEXT")
+            conn.execute(
+                f"""UPDATE {table}
+                   SET currency = upper(trim(substr(original_amount, instr(original_amount, ' ') + 1))),
+                       original_amount = CAST(substr(original_amount, 1, instr(original_amount, ' ') - 1) AS REAL)
+                   WHERE instr(original_amount, ' ') > 0""")
+
+
+def _amounts_to_cents(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    with conn:
+        if version < 1:
+            for table in ("expenses", "income"):
+                conn.execute(f"""UPDATE {table}
+                                SET amount = CAST(round(amount * 100) AS INTEGER),
+                                    original_amount = CASE WHEN original_amount = '' THEN NULL
+                                                      ELSE CAST(round(original_amount * 100) AS INTEGER) END""")
+        if version < 2:
+            # The column was declared REAL, which would turn stored cents back into floats, so rebuild it.
+            conn.execute("ALTER TABLE budgets RENAME TO budgets_real")
+            conn.execute("""CREATE TABLE budgets (
+                                user TEXT NOT NULL,
+                                category TEXT NOT NULL,
+                                amount INTEGER NOT NULL,
+                                PRIMARY KEY (user, category))""")
+            conn.execute("""INSERT INTO budgets (user, category, amount)
+                            SELECT user, category, CAST(round(amount * 100) AS INTEGER) FROM budgets_real""")
+            conn.execute("DROP TABLE budgets_real")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _row(fields, values):
+    row = dict(zip(fields, values))
+    row["Amount"] = money.format_cents(row["Amount"])
+    if row.get("Original_Amount") is not None:
+        row["Original_Amount"] = money.format_cents(row["Original_Amount"])
+    return row
+
+
+def normalize_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return value
+
+
+def _values(table, row):
+    values = []
+    for field, column in COLUMNS[table]:
+        value = row.get(field, "")
+        if column == "amount":
+            value = money.to_cents(value or 0)
+        elif column == "original_amount":
+            value, currency = txlog.split_original(value, row.get("Currency"))
+        elif column == "currency":
+            value = currency
+        elif column == "date":
+            value = normalize_date(value)
+        values.append(value)
+    return values
+
+
+def _nth_id(table):
+    return f"(SELECT id FROM {table} WHERE user = ? ORDER BY id LIMIT 1 OFFSET ?)"
+
+
+def load_rows(conn, user, data_type):
+    table = TABLES[data_type]
+    fields = [field for field, _ in COLUMNS[table]]
+    columns = ", ".join(column for _, column in COLUMNS[table])
+    cursor = conn.execute(f"SELECT {columns} FROM {table} WHERE user = ? ORDER BY id", (user,))
+    return [_row(fields, row) for row in cursor]
+
+
+def load_budgets(conn, user):
+    cursor = conn.execute("SELECT category, amount FROM budgets WHERE user = ?", (user,))
+    return dict(cursor.fetchall())
+
+
+def replace_rows(conn, user, data_type, rows):
+    table = TABLES[data_type]
+    placeholders = ", ".join("?" for _ in range(len(COLUMNS[table]) + 1))
+    columns = ", ".join(column for _, column in COLUMNS[table])
+    with conn:
+        conn.execute(f"DELETE FROM {table} WHERE user = ?", (user,))
+        conn.executemany(f"INSERT INTO {table} (user, {columns}) VALUES ({placeholders})",
+                         ([user] + _values(table, row) for row in rows))
+
+
+def save_budgets(conn, user, budgets):
+    with conn:
+        conn.execute("DELETE FROM budgets WHERE user = ?", (user,))
+        conn.executemany("INSERT INTO budgets (user, category, amount) VALUES (?, ?, ?)",
+                         ((user, category, int(amount)) for category, amount in budgets.items()))
+
+
+def insert_row(conn, user, data_type, row):
+    insert_rows(conn, user, data_type, [row])
+
+
+def insert_rows(conn, user, data_type, rows):
+    table = TABLES[data_type]
+    placeholders = ", ".join("?" for _ in range(len(COLUMNS[table]) + 1))
+    columns = ", ".join(column for _, column in COLUMNS[table])
+    with conn:
+        conn.executemany(f"INSERT INTO {table} (user, {columns}) VALUES ({placeholders})",
+                         ([user] + _values(table, row) for row in rows))
+
+
+def update_row(conn, user, data_type, index, row):
+    table = TABLES[data_type]
+    assignments = ", ".join(f"{column} = ?" for _, column in COLUMNS[table])
+    with conn:
+        conn.execute(f"UPDATE {table} SET {assignments} WHERE id = {_nth_id(table)}",
+                     _values(table, row) + [user, index])
+
+
+def delete_row(conn, user, data_type, index):
+    table = TABLES[data_type]
+    with conn:
+        conn.execute(f"DELETE FROM {table} WHERE id = {_nth_id(table)}", (user, index))
+
+
+def category_totals(conn, user):
+    cursor = conn.execute(
+        "SELECT category, SUM(amount) FROM expenses WHERE user = ? GROUP BY category ORDER BY MIN(id)",
+        (user,))
+    return {category: money.from_cents(cents) for category, cents in cursor}
+
+
+def net_totals(conn, user):
+    expenses = conn.execute("SELECT COALESCE(SUM(amount), 0) FROM expenses WHERE user = ?", (user,)).fetchone()[0]
+    income = conn.execute("SELECT COALESCE(SUM(amount), 0) FROM income WHERE user = ?", (user,)).fetchone()[0]
+    return money.from_cents(expenses), money.from_cents(income)
+
+
+def budget_status(conn, user):
+    cursor = conn.execute(
+        """SELECT b.category, b.amount, COALESCE(SUM(e.amount), 0)
+           FROM budgets b
+           LEFT JOIN expenses e ON e.user = b.user AND e.category = b.category
+           WHERE b.user = ?
+           GROUP BY b.category, b.amount""",
+        (user,))
+    return [(category, money.from_cents(limit), money.from_cents(spent)) for category, limit, spent in cursor]
+
+
+def upcoming_bills(conn, user, end_date, start_date=None):
+    query = ("SELECT date, category, amount, original_amount, currency, notes FROM expenses "
+             "WHERE user = ? AND date <= ? AND instr(category, 'Bill') > 0")
+    params = [user, end_date]
+    if start_date:
+        query += " AND date >= ?"
+        params.append(start_date)
+    cursor = conn.execute(query + " ORDER BY date", params)
+    fields = [field for field, _ in COLUMNS["expenses"]]
+    return [_row(fields, row) for row in cursor]
+
+
+def migrate(data_dir, db_path=None):
+    conn = connect(db_path or os.path.join(data_dir, DB_FILE))
+    users = user_directory.open_directory(data_dir).all()
+
+    imported = 0
+    for username, record in users.items():
+        for data_type, filename in record.get("data_files", {}).items():
+            filepath = os.path.join(data_dir, filename)
+            if data_type == "budgets":
+                try:
+                    with open(filepath, "r") as file:
+                        save_budgets(conn, username, money.parse_amounts(json.load(file)))
+                except (FileNotFoundError, json.JSONDecodeError):
+                    continue
+            elif data_type in TABLES:
+                rows = txlog.load_rows(filepath)
+                replace_rows(conn, username, data_type, rows)
+                imported += len(rows)
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import per-user CSV/JSON files into the SQLite ledger")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--db", default=None)
+    args = parser.parse_args()
+    count = migrate(args.data_dir, args.db)
+    print(f"Imported {count} transactions into {args.db or os.path.join(args.data_dir, DB_FILE)}")
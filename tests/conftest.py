@@ -0,0 +1,11 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIELDS = ["Date", "Category", "Amount", "Original_Amount", "Currency", "Notes"]
+
+
+def row(day, category="Food", amount="1.00", notes=""):
+    return {"Date": day, "Category": category, "Amount": amount, "Original_Amount": "", "Currency": "",
+            "Notes": notes}
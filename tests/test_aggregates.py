@@ -0,0 +1,70 @@
+import json
+
+import aggregates
+
+
+EXPENSES = [
+    {"Date": "2026-01-05", "Category": "Food", "Amount": "10.25"},
+    {"Date": "2026-02-01", "Category": "Food", "Amount": "5.50"},
+    {"Date": "2026-02-03", "Category": "Rent", "Amount": "100.00"},
+]
+INCOME = [{"Date": "2026-01-31", "Source": "Salary", "Amount": "500.00"}]
+
+
+def test_build_totals():
+    totals = aggregates.Aggregates.build(EXPENSES, INCOME)
+    assert totals.category_totals() == {"Food": 15.75, "Rent": 100.0}
+    assert totals.total_expenses == 115.75
+    assert totals.total_income == 500.0
+    assert totals.net_balance == 384.25
+    assert {month: count for month, (_, count) in totals.expenses_by_month.items()} == {"2026-01": 1, "2026-02": 2}
+
+
+def test_add_replace_remove():
+    totals = aggregates.Aggregates.build(EXPENSES, INCOME)
+    totals.add("expense", {"Date": "2026-03-01", "Category": "Food", "Amount": "0.25"})
+    assert totals.spent("Food") == 16.0
+    assert totals.expenses_by_month["2026-03"][1] == 1
+
+    totals.replace("expense", EXPENSES[1], {"Date": "2026-02-01", "Category": "Transport", "Amount": "4.00"})
+    assert totals.category_totals() == {"Food": 10.5, "Rent": 100.0, "Transport": 4.0}
+    assert totals.expenses_by_month["2026-02"][1] == 2
+
+    totals.remove("expense", EXPENSES[2])
+    totals.remove("income", INCOME[0])
+    assert "Rent" not in totals.category_totals()
+    assert totals.income_by_source == {}
+    assert totals.income_by_month == {}
+    assert totals.net_balance == -14.5
+
+
+def test_load_rebuilds_when_the_stamp_changes(tmp_path):
+    path = str(tmp_path / "alice_aggregates.json")
+    builds = []
+
+    def rebuild():
+        builds.append(1)
+        return aggregates.Aggregates.build(EXPENSES, INCOME)
+
+    first = aggregates.load(path, "[(1, 2)]", rebuild)
+    again = aggregates.load(path, "[(1, 2)]", rebuild)
+    assert len(builds) == 1
+    assert again.category_totals() == first.category_totals()
+
+    aggregates.load(path, "[(1, 3)]", rebuild)
+    assert len(builds) == 2
+
+
+def test_load_rebuilds_files_from_an_older_format(tmp_path):
+    path = tmp_path / "alice_aggregates.json"
+    path.write_text(json.dumps({"stamp": "[(1, 2)]", "expenses_by_category": {"Food": [15.75, 2]}}))
+    builds = []
+
+    def rebuild():
+        builds.append(1)
+        return aggregates.Aggregates.build(EXPENSES, INCOME)
+
+    totals = aggregates.load(str(path), "[(1, 2)]", rebuild)
+    assert builds == [1]
+    assert totals.expenses_by_category["Food"] == (1575, 2)
+    assert json.loads(path.read_text())["format"] == aggregates.FORMAT
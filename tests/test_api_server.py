@@ -0,0 +1,127 @@
+import asyncio
+import json
+
+import pytest
+
+import api_server
+import expense
+import user_directory
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(expense, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(expense, "users_dir", user_directory.UserDirectory(str(tmp_path / expense.USERS_FILE)))
+    monkeypatch.setattr(expense, "STORAGE_BACKEND", "csv")
+    expense.users_dir.put("alice", {"password": expense.hash_password("secret"), "data_files": {
+        "expenses": "alice_expenses.csv", "income": "alice_income.csv", "budgets": "alice_budgets.json"}})
+    expense.initialize_user_data("alice")
+    server = api_server.ApiServer(workers=2)
+    yield server
+    server.executor.shutdown()
+
+
+def call(server, method, target, payload=None, token=None, body=None):
+    headers = {"authorization": f"Bearer {token}"} if token else {}
+    if body is None:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    status, content_type, content = asyncio.run(server.respond(method, target, headers, body))
+    return status, json.loads(content) if content_type == "application/json" else content
+
+
+def login(server):
+    status, payload = call(server, "POST", "/api/login", {"username": "alice", "password": "secret"})
+    assert status == 200
+    return payload["token"]
+
+
+def test_login_and_session(server):
+    assert call(server, "POST", "/api/login", {"username": "alice", "password": "wrong"})[0] == 401
+    assert call(server, "GET", "/api/summary")[0] == 401
+    token = login(server)
+    assert call(server, "GET", "/api/summary", token=token) == \
+        (200, {"total_expenses": 0.0, "total_income": 0.0, "net_balance": 0.0})
+    assert call(server, "POST", "/api/logout", token=token)[0] == 200
+    assert call(server, "GET", "/api/summary", token=token)[0] == 401
+
+
+def test_transaction_lifecycle(server):
+    token = login(server)
+    status, created = call(server, "POST", "/api/expenses",
+                           {"date": "2026-01-05", "category": "Food", "amount": "12.50"}, token)
+    assert status == 201
+    assert (created["id"], created["label"], created["amount"]) == (1, "Food", 12.5)
+
+    status, updated = call(server, "PUT", "/api/expenses/1", {"amount": "20"}, token)
+    assert (status, updated["amount"], updated["date"]) == (200, 20.0, "2026-01-05")
+    status, listing = call(server, "GET", "/api/expenses?limit=10", token=token)
+    assert status == 200
+    assert listing["total"] == 1
+    assert call(server, "GET", "/api/summary", token=token)[1]["total_expenses"] == 20.0
+
+    assert call(server, "DELETE", "/api/expenses/1", token=token) == (200, {"deleted": 1})
+    assert call(server, "GET", "/api/expenses", token=token)[1]["total"] == 0
+
+
+@pytest.mark.parametrize("payload", [
+    {"date": "2026/01/05", "category": "Food", "amount": "1"},
+    {"date": "2026-01-05", "category": "Food", "amount": "abc"},
+    {"date": "2026-01-05", "category": "", "amount": "1"},
+    {"date": "2026-01-05", "category": "Food", "amount": "1", "currency": "XYZ"},
+])
+def test_invalid_transactions_are_rejected(server, payload):
+    token = login(server)
+    status, error = call(server, "POST", "/api/expenses", payload, token)
+    assert status == 400
+    assert "error" in error
+    assert call(server, "GET", "/api/expenses", token=token)[1]["total"] == 0
+
+
+def test_errors(server):
+    token = login(server)
+    assert call(server, "PUT", "/api/expenses/99", {"amount": "1"}, token)[0] == 404
+    assert call(server, "DELETE", "/api/budgets/Food", token=token)[0] == 404
+    assert call(server, "GET", "/api/nothing", token=token)[0] == 404
+    assert call(server, "DELETE", "/api/summary", token=token)[0] == 405
+    assert call(server, "POST", "/api/expenses", token=token, body=b"{not json")[0] == 400
+    assert call(server, "POST", "/api/expenses", token=token, body=b"[1, 2]")[0] == 400
+    assert call(server, "GET", "/api/expenses?limit=x", token=token)[0] == 400
+    assert call(server, "GET", "/api/report?currency=XYZ", token=token)[0] == 400
+
+
+def raw_request(server, request):
+    async def exchange():
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return response
+
+    return asyncio.run(exchange())
+
+
+def test_oversized_body_is_refused(server):
+    response = raw_request(server, b"POST /api/login HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % (api_server.MAX_BODY + 1))
+    assert response.startswith(b"HTTP/1.1 413 ")
+    assert b"Connection: close" in response
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5", b"1.5"])
+def test_invalid_content_length_gets_a_response(server, length):
+    response = raw_request(server, b"POST /api/login HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 400 ")
+    assert b"Connection: close" in response
+
+
+def test_expired_sessions_are_pruned(server, monkeypatch):
+    first = login(server)
+    now = api_server.time.time()
+    monkeypatch.setattr(api_server.time, "time", lambda: now + api_server.SESSION_TTL + 1)
+    second = login(server)
+    assert set(server.sessions) == {second}
+    assert call(server, "GET", "/api/summary", token=first)[0] == 401
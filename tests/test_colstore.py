@@ -0,0 +1,74 @@
+import os
+
+import cache
+import colstore
+import ledger
+import txlog
+from conftest import FIELDS
+
+
+def sample_rows(count=50):
+    rows = []
+    for index in range(count):
+        rows.append({
+            "Date": f"2026-{index % 12 + 1:02d}-{index % 28 + 1:02d}" if index % 17 else "someday",
+            "Category": ["Food", "Rent", "Transport", "Café"][index % 4],
+            "Amount": f"{index * 3}.{index % 100:02d}",
+            "Original_Amount": f"{index}.50" if index % 3 == 0 else "",
+            "Currency": "USD" if index % 3 == 0 else "",
+            "Notes": ["", "weekly shop", "naïve note, with comma", "weekly shop"][index % 4],
+        })
+    return rows
+
+
+def write_ledger(tmp_path, rows):
+    path = str(tmp_path / "expenses.csv")
+    txlog.write_snapshot(path, rows, FIELDS)
+    return path
+
+
+def test_snapshot_round_trips_a_parsed_ledger(tmp_path):
+    path = write_ledger(tmp_path, sample_rows())
+    parsed = ledger.parse(path, "expense")
+    source = cache.file_signature(path)
+    colstore.write(path, parsed, source)
+
+    columns = colstore.read(path, "expense", source)
+    assert columns is not None
+    restored = ledger.Ledger.from_columns(columns, "expense")
+    assert len(restored) == len(parsed)
+    assert restored.to_rows() == parsed.to_rows()
+    assert restored.total() == parsed.total()
+    for name, _ in colstore.NUMERIC_COLUMNS:
+        assert list(getattr(restored, name)) == list(getattr(parsed, name))
+
+
+def test_snapshot_rejects_stale_or_mismatched_source(tmp_path):
+    path = write_ledger(tmp_path, sample_rows())
+    source = cache.file_signature(path)
+    colstore.write(path, ledger.parse(path, "expense"), source)
+
+    assert colstore.read(path, "income", source) is None
+    assert colstore.read(path, "expense", (source[0] + 1, source[1])) is None
+    with open(colstore.snapshot_path(path), "r+b") as file:
+        file.write(b"NOTMAGIC")
+    assert colstore.read(path, "expense", source) is None
+
+
+def test_load_uses_snapshot_and_applies_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(ledger, "SNAPSHOT_ROWS", 10)
+    rows = sample_rows()
+    path = write_ledger(tmp_path, rows)
+    parsed = ledger.load(path, "expense")
+    assert os.path.exists(colstore.snapshot_path(path))
+    mapped = ledger.load(path, "expense")
+    assert mapped._frozen
+    assert mapped.to_rows() == parsed.to_rows()
+
+    txlog.log_update(path, 0, dict(rows[0], Amount="99.99"), FIELDS)
+    txlog.log_delete(path, 1, FIELDS)
+    txlog.log_add(path, rows[2], FIELDS)
+    loaded = ledger.load(path, "expense")
+
+    txlog.compact(path, FIELDS)
+    assert loaded.to_rows() == ledger.parse(path, "expense").to_rows()
@@ -0,0 +1,100 @@
+import json
+
+import importer
+import money
+import txlog
+from conftest import FIELDS
+
+
+COLUMNS = {"date": "Date", "amount": "Amount", "label": "Category", "notes": "Notes", "currency": "Currency"}
+
+OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<CURDEF>USD
+<BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20260105120000
+<TRNAMT>-12.50
+<NAME>Grocer
+<MEMO>weekly shop
+</STMTTRN>
+<STMTTRN>
+<TRNTYPE>CREDIT
+<DTPOSTED>20260131
+<TRNAMT>1500.00
+<NAME>Employer
+</STMTTRN>
+</BANKTRANLIST>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def convert(records, transaction_type="auto", currency="KES", date_format="%Y-%m-%d"):
+    return list(importer.convert_rows(records, transaction_type, currency, date_format, "Imported"))
+
+
+def test_read_csv_maps_columns(tmp_path):
+    path = tmp_path / "statement.csv"
+    path.write_text("﻿When,Value,What\n2026-01-05,-12.50,Food\n", encoding="utf-8")
+    columns = {"date": "When", "amount": "Value", "label": "What", "notes": "Notes", "currency": "Currency"}
+    assert list(importer.read_csv(str(path), columns)) == [
+        {"date": "2026-01-05", "amount": "-12.50", "label": "Food", "notes": "", "currency": ""}]
+
+
+def test_read_ofx_transactions(tmp_path):
+    path = tmp_path / "statement.ofx"
+    path.write_text(OFX)
+    assert list(importer.read_ofx(str(path))) == [
+        {"date": "20260105", "amount": "-12.50", "label": "Grocer", "notes": "weekly shop", "currency": "USD"},
+        {"date": "20260131", "amount": "1500.00", "label": "Employer", "notes": "", "currency": "USD"},
+    ]
+
+
+def test_convert_rows_splits_by_sign_and_rejects_bad_rows():
+    records = [
+        {"date": "2026-01-05", "amount": "-1,200.50", "label": "Rent", "notes": "", "currency": ""},
+        {"date": "2026-01-06", "amount": "300", "label": "", "notes": "", "currency": ""},
+        {"date": "05/01/2026", "amount": "-1.00", "label": "Food", "notes": "", "currency": ""},
+        {"date": "2026-01-07", "amount": "abc", "label": "Food", "notes": "", "currency": ""},
+        {"date": "2026-01-08", "amount": "-1.00", "label": "Food", "notes": "", "currency": "XYZ"},
+    ]
+    converted = convert(records)
+    assert [kind for kind, _ in converted] == ["expense", "income", None, None, None]
+    assert converted[0][1]["Category"] == "Rent"
+    assert float(converted[0][1]["Amount"]) == 1200.5
+    assert converted[1][1]["Source"] == "Imported"
+    assert float(converted[1][1]["Amount"]) == 300.0
+
+
+def test_convert_rows_converts_foreign_currency():
+    (kind, row), = convert([{"date": "2026-01-05", "amount": "10.00", "label": "Tip", "notes": "", "currency": "usd"}],
+                           transaction_type="expense")
+    assert kind == "expense"
+    assert row["Amount"] == money.format_cents(importer.convert_currency(1000, "USD", "KES", "2026-01-05"))
+    assert (row["Original_Amount"], row["Currency"]) == ("10.00", "USD")
+
+
+def test_import_file_appends_to_the_users_ledgers(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    (data_dir / "users.json").write_text(json.dumps({"alice": {"password": "x", "data_files": {
+        "expenses": "alice_expenses.csv", "income": "alice_income.csv"}}}))
+    (data_dir / "alice_expenses.csv").write_text(",".join(FIELDS) + "\n2026-01-01,Food,5.00,,\n")
+    statement = tmp_path / "statement.csv"
+    statement.write_text("Date,Amount,Category\n2026-01-05,-12.50,Food\n2026-01-06,300,Salary\nbad,1,x\n")
+
+    counts = importer.import_file("alice", str(statement), columns=COLUMNS, data_dir=str(data_dir), batch_size=1)
+    assert (counts["expense"], counts["income"], counts["rejected"]) == (1, 1, 1)
+    expenses = txlog.load_rows(str(data_dir / "alice_expenses.csv"))
+    assert [(item["Date"], item["Category"], float(item["Amount"])) for item in expenses] == \
+        [("2026-01-01", "Food", 5.0), ("2026-01-05", "Food", 12.5)]
+    income = txlog.load_rows(str(data_dir / "alice_income.csv"))
+    assert [(item["Source"], float(item["Amount"])) for item in income] == [("Salary", 300.0)]
+
+
+def test_short_csv_rows_are_rejected_not_fatal(tmp_path):
+    path = tmp_path / "statement.csv"
+    path.write_text("Amount,Category,Date\n-5.00,Food,2026-01-05\n-7.00\n-9.00,Food\n")
+    converted = convert(importer.read_csv(str(path), COLUMNS))
+    assert [kind for kind, _ in converted] == ["expense", None, None]
@@ -0,0 +1,132 @@
+import json
+from datetime import date, timedelta
+
+import expense
+import ledger
+import partitions
+import txlog
+import user_directory
+from conftest import FIELDS, row
+
+
+def write_ledger(tmp_path, rows):
+    path = str(tmp_path / "expenses.csv")
+    txlog.write_snapshot(path, rows, FIELDS)
+    return path
+
+
+def amounts(transactions):
+    return [item["Amount"] for item in transactions]
+
+
+def test_cache_follows_journal_appends_without_reparsing(tmp_path):
+    path = write_ledger(tmp_path, [row("2026-01-01", amount="1.00"), row("2026-01-02", amount="2.00")])
+    ledgers = ledger.LedgerCache()
+    first = ledgers.get(path, "expense")
+
+    txlog.log_add(path, row("2026-01-03", amount="3.00"), FIELDS)
+    txlog.log_update(path, 0, row("2026-01-01", amount="10.00"), FIELDS)
+    txlog.log_delete(path, 1, FIELDS)
+    current = ledgers.get(path, "expense")
+
+    assert current is first
+    assert (ledgers.misses, ledgers.hits) == (1, 1)
+    assert amounts(current) == [10.0, 3.0]
+    assert current.to_rows() == ledger.load(path, "expense").to_rows()
+
+
+def test_cache_reloads_after_compaction_or_a_rewrite(tmp_path):
+    path = write_ledger(tmp_path, [row("2026-01-01", amount="1.00")])
+    ledgers = ledger.LedgerCache()
+    ledgers.get(path, "expense")
+
+    txlog.log_add(path, row("2026-01-02", amount="2.00"), FIELDS)
+    txlog.compact(path, FIELDS)
+    txlog.log_add(path, row("2026-01-03", amount="3.00"), FIELDS)
+    assert amounts(ledgers.get(path, "expense")) == [1.0, 2.0, 3.0]
+    assert ledgers.misses == 2
+
+    txlog.write_snapshot(path, [row("2026-02-01", amount="5.00")], FIELDS)
+    assert amounts(ledgers.get(path, "expense")) == [5.0]
+    assert ledgers.misses == 3
+
+
+def test_cache_invalidate(tmp_path):
+    path = write_ledger(tmp_path, [row("2026-01-01", amount="1.00")])
+    ledgers = ledger.LedgerCache()
+    first = ledgers.get(path, "expense")
+    ledgers.invalidate(path)
+    assert ledgers.get(path, "expense") is not first
+    assert ledgers.get(path, "income") is not first
+    assert ledgers.misses == 3
+
+
+def test_month_range():
+    assert ledger.month_range(date(2024, 2, 10)) == (date(2024, 2, 1).toordinal(), date(2024, 2, 29).toordinal())
+    assert ledger.month_range(date(2026, 12, 31)) == (date(2026, 12, 1).toordinal(), date(2026, 12, 31).toordinal())
+
+
+def test_between_trims_a_window_to_its_days(tmp_path):
+    path = str(tmp_path / "expenses.csv")
+    partitions.write_all(path, [row("2026-01-31", amount="1.00"), row("2026-02-01", amount="2.00"),
+                                row("2026-02-20", amount="3.00"), row("2026-03-01", amount="4.00")], FIELDS, "month")
+    start, end = date(2026, 2, 10).toordinal(), date(2026, 3, 5).toordinal()
+    window = ledger.load_window(path, "expense", start, end)
+
+    assert amounts(window) == [2.0, 3.0, 4.0]
+    assert amounts(ledger.between(window, start, end)) == [3.0, 4.0]
+
+
+def partitioned_user(tmp_path, monkeypatch, rows):
+    (tmp_path / "users.json").write_text(json.dumps({"alice": {"password": "x", "data_files": {
+        "expenses": "alice_expenses.csv", "income": "alice_income.csv", "budgets": "alice_budgets.json"}}}))
+    monkeypatch.setattr(expense, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(expense, "users_dir", user_directory.UserDirectory(str(tmp_path / "users.json")))
+    monkeypatch.setattr(expense, "STORAGE_BACKEND", "csv")
+    partitions.write_all(str(tmp_path / "alice_expenses.csv"), rows, FIELDS, "month")
+    opened = []
+    open_partition = partitions.open_partition
+    monkeypatch.setattr(partitions, "open_partition",
+                        lambda path, entry: opened.append(entry["key"]) or open_partition(path, entry))
+    return opened
+
+
+def test_bills_due_reads_only_the_upcoming_partitions(tmp_path, monkeypatch):
+    today = date.today()
+    soon = today + timedelta(days=3)
+    opened = partitioned_user(tmp_path, monkeypatch, [row(date(today.year - 1, 1, 15).isoformat(), "Bills", "5.00"),
+                                                      row(soon.isoformat(), "Bills", "7.00")])
+
+    bills = expense.bills_due(None, "alice", upcoming_only=True)
+    assert [(bill["Date"], bill["Amount"]) for bill in bills] == [(soon.isoformat(), 7.0)]
+    assert set(opened) == {today.strftime("%Y-%m"), soon.strftime("%Y-%m")}
+
+
+def test_month_only_report_reads_one_partition(tmp_path, monkeypatch):
+    today = date.today()
+    opened = partitioned_user(tmp_path, monkeypatch, [row(date(today.year - 1, 1, 15).isoformat(), "Rent", "50.00"),
+                                                      row(today.isoformat(), "Food", "7.00")])
+
+    categories, monthly, rolling = expense.report_totals(None, "alice", month_only=True)
+    assert categories == {"Food": 7.0}
+    assert list(monthly) == [today.strftime("%Y-%m")]
+    assert opened == [today.strftime("%Y-%m")]
+
+
+def test_removing_an_expired_bill_leaves_the_schedule_intact():
+    transactions = ledger.Ledger.from_rows([row("2026-01-05", "Bills", "5.00"), row("2026-01-20", "Bills", "6.00")],
+                                           "expense")
+    schedule = transactions.bill_schedule()
+    assert [entry[0] for entry in schedule.expire(date(2026, 1, 10).toordinal())] == \
+        [date(2026, 1, 5).toordinal()]
+    assert len(schedule) == 1
+
+    transactions.update(0, row("2026-01-05", "Bills", "5.00", notes="paid"))
+    assert len(schedule) == 2
+    transactions.delete(0)
+    assert len(schedule) == 1
+
+    transactions.append(row("2026-01-05", "Bills", "5.00"))
+    assert len(schedule) == 2
+    assert [bill["Amount"] for bill in ledger.upcoming_bills(transactions, date(2026, 1, 31).toordinal())] == \
+        [5.0, 6.0]
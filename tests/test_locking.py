@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+
+import expense
+import locking
+import user_directory
+from conftest import FIELDS, row
+
+
+def test_exclusive_lock_waits_for_the_holder(tmp_path):
+    path = str(tmp_path / "alice")
+    acquired = threading.Event()
+    events = []
+
+    def contender():
+        with locking.file_lock(path):
+            events.append("contender")
+        acquired.set()
+
+    with locking.file_lock(path):
+        thread = threading.Thread(target=contender)
+        thread.start()
+        assert not acquired.wait(0.2)
+        events.append("holder")
+    thread.join(5)
+    assert events == ["holder", "contender"]
+
+
+def test_shared_locks_coexist(tmp_path):
+    path = str(tmp_path / "alice")
+    entered = threading.Event()
+
+    def reader():
+        with locking.file_lock(path, shared=True):
+            entered.set()
+
+    with locking.file_lock(path, shared=True):
+        thread = threading.Thread(target=reader)
+        thread.start()
+        assert entered.wait(5)
+    thread.join(5)
+
+
+def test_lock_is_reentrant_and_upgrades(tmp_path):
+    path = str(tmp_path / "alice")
+    blocked = threading.Event()
+    released = threading.Event()
+
+    def reader():
+        with locking.file_lock(path, shared=True):
+            blocked.set()
+        released.set()
+
+    with locking.file_lock(path, shared=True):
+        with locking.file_lock(path):
+            thread = threading.Thread(target=reader)
+            thread.start()
+            # The nested exclusive request upgraded this thread's hold, so a shared reader has to wait.
+            time.sleep(0.2)
+            assert not blocked.is_set()
+        assert blocked.wait(5)
+    thread.join(5)
+    assert released.is_set()
+
+
+def test_version_counter(tmp_path):
+    data_dir = str(tmp_path)
+    assert locking.read_version(data_dir, "alice") == 0
+    with locking.user_lock(data_dir, "alice"):
+        assert locking.bump_version(data_dir, "alice") == 1
+        assert locking.bump_version(data_dir, "alice") == 2
+    assert locking.read_version(data_dir, "alice") == 2
+
+
+def use_user(tmp_path, monkeypatch, rows):
+    data_dir = str(tmp_path)
+    (tmp_path / "users.json").write_text(json.dumps({"alice": {"password": "x", "data_files": {
+        "expenses": "alice_expenses.csv", "income": "alice_income.csv", "budgets": "alice_budgets.json"}}}))
+    monkeypatch.setattr(expense, "DATA_DIR", data_dir)
+    monkeypatch.setattr(expense, "users_dir", user_directory.UserDirectory(str(tmp_path / "users.json")))
+    monkeypatch.setattr(expense, "STORAGE_BACKEND", "csv")
+    expense.save_user_data("alice", rows, "expenses", FIELDS)
+    return data_dir
+
+
+def test_edit_follows_a_row_moved_by_another_session(tmp_path, monkeypatch):
+    rows = [row("2026-01-01", amount="1.00"), row("2026-01-02", amount="2.00"), row("2026-01-03", amount="3.00")]
+    data_dir = use_user(tmp_path, monkeypatch, rows)
+    version = locking.read_version(data_dir, "alice")
+    previous = expense.load_ledger("alice", "expenses").row(2)
+
+    assert expense.remove_user_data("alice", 0, "expenses", FIELDS)
+    assert expense.rebase_index("alice", "expenses", 2, previous) == 1
+    assert expense.patch_user_data("alice", 2, row("2026-01-03", amount="30.00"), "expenses", FIELDS,
+                                   previous, version)
+    assert [float(item["Amount"]) for item in expense.load_user_data("alice", "expenses")] == [2.0, 30.0]
+
+
+def test_edit_of_a_row_deleted_by_another_session_is_refused(tmp_path, monkeypatch):
+    rows = [row("2026-01-01", amount="1.00"), row("2026-01-02", amount="2.00")]
+    data_dir = use_user(tmp_path, monkeypatch, rows)
+    version = locking.read_version(data_dir, "alice")
+    previous = expense.load_ledger("alice", "expenses").row(1)
+
+    assert expense.remove_user_data("alice", 1, "expenses", FIELDS)
+    assert expense.rebase_index("alice", "expenses", 1, previous) is None
+    assert not expense.remove_user_data("alice", 1, "expenses", FIELDS, previous, version)
+    assert [float(item["Amount"]) for item in expense.load_user_data("alice", "expenses")] == [1.0]
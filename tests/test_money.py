@@ -0,0 +1,70 @@
+import pytest
+
+import aggregates
+import ledger
+import money
+import txlog
+from conftest import FIELDS, row
+
+
+@pytest.mark.parametrize("value, cents", [
+    (12, 1200),
+    (0.1, 10),
+    (0.1 + 0.2, 30),
+    (19.99, 1999),
+    ("1,234.5", 123450),
+    (" 7 ", 700),
+    (".5", 50),
+    ("-0.05", -5),
+    ("+3", 300),
+    ("12.345", 1235),
+    ("12.344", 1234),
+    ("-12.345", -1235),
+    ("1e3", 100000),
+])
+def test_to_cents(value, cents):
+    assert money.to_cents(value) == cents
+
+
+@pytest.mark.parametrize("value", ["", "abc", "1.2.3", "--1", None])
+def test_to_cents_rejects_non_amounts(value):
+    with pytest.raises(ValueError):
+        money.to_cents(value)
+
+
+@pytest.mark.parametrize("cents, text", [(0, "0.00"), (5, "0.05"), (-5, "-0.05"), (123450, "1234.50"), (-100, "-1.00")])
+def test_format_cents(cents, text):
+    assert money.format_cents(cents) == text
+    assert money.to_cents(text) == cents
+    assert money.from_cents(cents) == float(text)
+
+
+def test_cents_survive_a_ledger_round_trip(tmp_path):
+    path = str(tmp_path / "expenses.csv")
+    amounts = ["0.10", "0.20", "1234567.89", "0.05"]
+    txlog.write_snapshot(path, [row("2026-01-01", amount=amount) for amount in amounts], FIELDS)
+    txlog.log_add(path, row("2026-01-02", amount=0.1), FIELDS)
+
+    transactions = ledger.load(path, "expense")
+    assert list(transactions.amounts) == [10, 20, 123456789, 5, 10]
+    assert transactions.total() == 1234568.34
+    assert [item["Amount"] for item in transactions] == [0.1, 0.2, 1234567.89, 0.05, 0.1]
+    assert [item["Amount"] for item in txlog.load_rows(path)] == amounts + ["0.10"]
+
+
+def test_aggregates_total_in_cents():
+    expenses = [row("2026-01-01", amount="0.10") for _ in range(3)]
+    totals = aggregates.Aggregates.build(expenses, [{"Date": "2026-01-01", "Source": "Salary", "Amount": "0.30"}])
+    assert totals.expenses_by_category["Food"] == (30, 3)
+    assert totals.total_expenses == 0.3
+    assert totals.net_balance == 0.0
+
+    totals.remove("expense", expenses[0])
+    assert totals.category_totals() == {"Food": 0.2}
+
+
+def test_budget_limits_round_trip_as_text():
+    limits = money.parse_amounts({"Food": 200, "Rent": 1500.5, "Fun": "19.99"})
+    assert limits == {"Food": 20000, "Rent": 150050, "Fun": 1999}
+    assert money.format_amounts(limits) == {"Food": "200.00", "Rent": "1500.50", "Fun": "19.99"}
+    assert money.parse_amounts(money.format_amounts(limits)) == limits
@@ -0,0 +1,120 @@
+import os
+from datetime import date
+
+import partitions
+import txlog
+from conftest import FIELDS, row
+
+
+ROWS = [
+    row("2026-01-05", amount="1.00"),
+    row("2026-01-31", amount="2.00"),
+    row("2026-02-01", amount="3.00"),
+    row("2026-02-28", amount="4.00"),
+    row("2026-03-01", amount="5.00"),
+    row("not a date", amount="6.00"),
+]
+
+
+def partitioned(tmp_path, rows=ROWS):
+    path = str(tmp_path / "expenses.csv")
+    partitions.write_all(path, rows, FIELDS, "month")
+    return path
+
+
+def by_partition(rows):
+    grouped = {}
+    for item in rows:
+        grouped.setdefault(partitions.partition_key(item["Date"]), []).append(item)
+    return grouped
+
+
+def files(path):
+    return {entry["key"]: entry["file"] for entry in partitions.read_manifest(path)["partitions"]}
+
+
+def test_write_all_splits_on_month_boundaries(tmp_path):
+    path = partitioned(tmp_path)
+    manifest = partitions.read_manifest(path)
+    assert [entry["key"] for entry in manifest["partitions"]] == ["undated", "2026-01", "2026-02", "2026-03"]
+    assert [entry["rows"] for entry in manifest["partitions"]] == [1, 2, 2, 1]
+    assert by_partition(partitions.load_rows(path)) == by_partition(ROWS)
+
+
+def test_apply_rewrites_only_touched_partitions(tmp_path):
+    path = partitioned(tmp_path)
+    before = files(path)
+    # Manifest order is undated, 2026-01, 2026-02, 2026-03, so index 3 is the first February row.
+    records = [{"op": "update", "index": 3, "row": row("2026-02-01", amount="30.00")}]
+
+    assert partitions.apply(path, records, FIELDS) == ["2026-02"]
+    after = files(path)
+    assert after["2026-02"] != before["2026-02"]
+    assert {key: after[key] for key in after if key != "2026-02"} == \
+        {key: before[key] for key in before if key != "2026-02"}
+    assert [item["Amount"] for item in partitions.load_rows(path) if item["Date"].startswith("2026-02")] == \
+        ["30.00", "4.00"]
+    assert partitions.read_manifest(path)["generation"] == 2
+    assert sorted(os.listdir(partitions.directory(path))) == sorted(list(after.values()) + ["manifest.json"])
+
+
+def test_update_moves_row_to_another_partition(tmp_path):
+    path = partitioned(tmp_path)
+    rows = partitions.load_rows(path)
+    records = [
+        {"op": "update", "index": 1, "row": row("2026-03-15", amount="1.00")},
+        {"op": "add", "row": row("2026-04-01", amount="7.00")},
+        {"op": "delete", "index": 5},
+    ]
+
+    assert partitions.apply(path, records, FIELDS) == ["2026-01", "2026-03", "2026-04"]
+    expected = by_partition(txlog.replay(list(rows), records))
+    assert by_partition(partitions.load_rows(path)) == expected
+    assert expected["2026-01"] == [row("2026-01-31", amount="2.00")]
+    assert "2026-03-01" not in [item["Date"] for item in expected["2026-03"]]
+
+
+def test_emptied_partition_is_dropped(tmp_path):
+    path = partitioned(tmp_path)
+    records = [{"op": "update", "index": 5, "row": row("2026-02-10", amount="5.00")}]
+
+    partitions.apply(path, records, FIELDS)
+    assert "2026-03" not in files(path)
+    assert [item["Date"] for item in partitions.load_rows(path)][-3:] == ["2026-02-01", "2026-02-28", "2026-02-10"]
+
+
+def test_deletes_shift_later_indexes_across_partitions(tmp_path):
+    path = partitioned(tmp_path)
+    rows = partitions.load_rows(path)
+    # After the first delete, index 2 names what was the first February row.
+    records = [{"op": "delete", "index": 1}, {"op": "delete", "index": 2},
+               {"op": "update", "index": 2, "row": row("2026-01-20", amount="40.00")}]
+
+    partitions.apply(path, records, FIELDS)
+    assert by_partition(partitions.load_rows(path)) == by_partition(txlog.replay(list(rows), records))
+
+
+def test_journal_compaction_into_partitions(tmp_path):
+    path = str(tmp_path / "expenses.csv")
+    txlog.write_snapshot(path, ROWS, FIELDS)
+    txlog.partition(path, FIELDS, "month")
+    assert partitions.is_partitioned(path)
+    assert not os.path.exists(path)
+
+    rows = txlog.load_rows(path)
+    txlog.log_update(path, 2, row("2026-03-31", amount="2.00"), FIELDS)
+    txlog.log_add(path, row("2025-12-31", amount="8.00"), FIELDS)
+    expected = txlog.load_rows(path)
+    assert expected == txlog.replay(list(rows), txlog.read_journal(path))
+
+    txlog.compact(path, FIELDS)
+    assert not os.path.exists(txlog.journal_path(path))
+    assert by_partition(txlog.load_rows(path)) == by_partition(expected)
+    assert "2025-12" in files(path)
+
+
+def test_window_reads_overlapping_partitions_with_journal(tmp_path):
+    path = partitioned(tmp_path)
+    records = [{"op": "update", "index": 1, "row": row("2026-02-15", amount="9.00")}]
+    rows = partitions.window(path, date(2026, 2, 1).toordinal(), date(2026, 2, 28).toordinal(), records)
+    assert sorted(item["Amount"] for item in rows) == ["3.00", "4.00", "9.00"]
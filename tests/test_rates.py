@@ -0,0 +1,88 @@
+import json
+from datetime import date
+
+import pytest
+
+import expense
+import rates
+
+
+JAN = date(2026, 1, 1).toordinal()
+FEB = date(2026, 2, 1).toordinal()
+
+
+def table():
+    return rates.RateTable(rates.StaticRateProvider().snapshots() + [
+        (JAN, {"USD": 0.008}),
+        (FEB, {"usd": 0.0075, "EUR": 0.007}),
+    ])
+
+
+def test_rate_uses_the_latest_snapshot_on_or_before_the_date():
+    rates_table = table()
+    assert rates_table.rate("USD", "2025-12-31") == rates.DEFAULT_RATES["USD"]
+    assert rates_table.rate("USD", "2026-01-01") == 0.008
+    assert rates_table.rate("USD", date(2026, 1, 31)) == 0.008
+    assert rates_table.rate("USD", FEB) == 0.0075
+    assert rates_table.rate("USD") == 0.0075
+    # A snapshot only lists the rates that changed; the rest carry forward.
+    assert rates_table.rate("GBP", "2026-03-01") == rates.DEFAULT_RATES["GBP"]
+    assert rates_table.rate("EUR", "2026-01-15") == rates.DEFAULT_RATES["EUR"]
+
+
+def test_convert_between_currencies_on_a_date():
+    rates_table = table()
+    assert rates_table.convert(8.0, "USD", on="2026-01-10") == pytest.approx(1000.0)
+    assert rates_table.convert(1000.0, "KES", "USD", on="2026-01-10") == pytest.approx(8.0)
+    assert rates_table.convert(7.5, "USD", "EUR", on="2026-02-10") == pytest.approx(7.0)
+    assert rates_table.convert(5.0, "EUR", "EUR") == 5.0
+
+
+def test_convert_array_matches_scalar_conversion():
+    rates_table = table()
+    days = [date(2025, 6, 1).toordinal(), JAN + 5, FEB, FEB + 40]
+    amounts = [10.0, 20.0, 30.0, 40.0]
+    converted = rates_table.convert_array(amounts, days, "USD")
+    assert list(converted) == pytest.approx([rates_table.convert(amount, "USD", on=day)
+                                             for amount, day in zip(amounts, days)])
+
+    currencies = ["KES", "USD", "EUR", "GBP"]
+    codes = [rates_table.currencies.index(currency) for currency in currencies]
+    converted = rates_table.convert_array(amounts, days, codes, "USD")
+    assert list(converted) == pytest.approx([rates_table.convert(amount, currency, "USD", on=day)
+                                             for amount, currency, day in zip(amounts, currencies, days)])
+
+
+def test_file_provider_reads_dated_snapshots(tmp_path):
+    path = tmp_path / "exchange_rates.json"
+    path.write_text(json.dumps({"2026-01-01": {"USD": 0.008}}))
+    provider = rates.FileRateProvider(str(path))
+    rates_table = rates.RateTable(provider.snapshots())
+    assert rates_table.rate("USD", "2026-01-02") == 0.008
+    assert rates_table.rate("USD", "2025-01-02") == rates.DEFAULT_RATES["USD"]
+
+    path.write_text("not json")
+    assert provider.snapshots() == rates.StaticRateProvider().snapshots()
+
+
+def test_currency_first_listed_later_applies_to_earlier_dates():
+    rates_table = rates.RateTable(rates.StaticRateProvider().snapshots() + [(FEB, {"JPY": 1.2})])
+    assert rates_table.rate("JPY", "2025-06-01") == 1.2
+    assert rates_table.convert(1200.0, "JPY", on="2025-06-01") == pytest.approx(1000.0)
+    assert list(rates_table.convert_array([1200.0], [date(2025, 6, 1).toordinal()], "JPY")) == \
+        pytest.approx([1000.0])
+
+
+def test_unknown_currency_is_a_clear_error():
+    with pytest.raises(ValueError, match="XYZ"):
+        table().convert(1.0, "XYZ", on="2026-01-01")
+
+
+def test_transaction_dates_are_validated_before_conversion(monkeypatch, capsys):
+    answers = iter(["2026/10/20", "20-10-2026", "2026-10-20"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    assert expense.read_date("Date: ", "2026-01-01") == "2026-10-20"
+    assert capsys.readouterr().out.count("Invalid date!") == 2
+
+    monkeypatch.setattr("builtins.input", lambda prompt: "")
+    assert expense.read_date("Date: ", "2026-01-01") == "2026-01-01"
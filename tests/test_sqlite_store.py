@@ -0,0 +1,70 @@
+import csv
+import json
+import sqlite3
+
+import sqlite_store
+from conftest import FIELDS, row
+
+
+def amounts(rows):
+    return [float(item["Amount"]) for item in rows]
+
+
+def test_update_and_delete_address_the_nth_row_among_duplicates(tmp_path):
+    conn = sqlite_store.connect(str(tmp_path / "ledger.db"))
+    duplicate = row("2026-01-01", amount="5.00")
+    sqlite_store.insert_rows(conn, "alice", "expenses", [duplicate, duplicate, duplicate])
+    sqlite_store.insert_row(conn, "bob", "expenses", duplicate)
+
+    sqlite_store.update_row(conn, "alice", "expenses", 1, row("2026-01-01", amount="7.00"))
+    assert amounts(sqlite_store.load_rows(conn, "alice", "expenses")) == [5.0, 7.0, 5.0]
+
+    sqlite_store.delete_row(conn, "alice", "expenses", 0)
+    assert amounts(sqlite_store.load_rows(conn, "alice", "expenses")) == [7.0, 5.0]
+    sqlite_store.delete_row(conn, "alice", "expenses", 5)
+    assert amounts(sqlite_store.load_rows(conn, "alice", "expenses")) == [7.0, 5.0]
+    assert amounts(sqlite_store.load_rows(conn, "bob", "expenses")) == [5.0]
+
+
+def test_migrate_imports_csv_ledgers_and_budgets(tmp_path):
+    rows = [row("2026-01-01", "Food", "12.50", "lunch"), row("2026-01-02", "Rent", "1000.00")]
+    with open(tmp_path / "alice_expenses.csv", "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(tmp_path / "alice_income.csv", "w", newline="") as file:
+        file.write("Date,Source,Amount,Original_Amount,Notes\n2026-01-01,Salary,3000.00,,\n")
+    with open(tmp_path / "alice_budgets.json", "w") as file:
+        json.dump({"Food": 200.0}, file)
+    with open(tmp_path / "users.json", "w") as file:
+        json.dump({"alice": {"password": "x", "data_files": {
+            "expenses": "alice_expenses.csv", "income": "alice_income.csv", "budgets": "alice_budgets.json"}}}, file)
+
+    db_path = str(tmp_path / "ledger.db")
+    assert sqlite_store.migrate(str(tmp_path), db_path) == 3
+    conn = sqlite_store.connect(db_path)
+    expenses = sqlite_store.load_rows(conn, "alice", "expenses")
+    assert [(item["Date"], item["Category"], item["Notes"]) for item in expenses] == \
+        [("2026-01-01", "Food", "lunch"), ("2026-01-02", "Rent", "")]
+    assert amounts(expenses) == [12.5, 1000.0]
+    assert amounts(sqlite_store.load_rows(conn, "alice", "income")) == [3000.0]
+    assert sqlite_store.load_budgets(conn, "alice") == {"Food": 20000}
+    assert sqlite_store.budget_status(conn, "alice") == [("Food", 200.0, 12.5)]
+    assert sqlite_store.category_totals(conn, "alice") == {"Food": 12.5, "Rent": 1000.0}
+
+
+def test_real_budget_limits_are_migrated_to_cents(tmp_path):
+    path = str(tmp_path / "ledger.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(sqlite_store.SCHEMA.replace("amount INTEGER NOT NULL,\n    PRIMARY KEY", "amount REAL NOT NULL,\n    PRIMARY KEY"))
+    conn.execute("INSERT INTO budgets (user, category, amount) VALUES ('alice', 'Food', 199.99)")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    conn = sqlite_store.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == sqlite_store.SCHEMA_VERSION
+    assert conn.execute("SELECT typeof(amount) FROM budgets").fetchone()[0] == "integer"
+    assert sqlite_store.load_budgets(conn, "alice") == {"Food": 19999}
+    sqlite_store.save_budgets(conn, "alice", {"Food": 25050})
+    assert sqlite_store.budget_status(conn, "alice") == [("Food", 250.5, 0.0)]
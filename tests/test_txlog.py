@@ -0,0 +1,93 @@
+import os
+
+import txlog
+from conftest import FIELDS, row
+
+
+def write_ledger(tmp_path, rows):
+    path = str(tmp_path / "expenses.csv")
+    txlog.write_snapshot(path, rows, FIELDS)
+    return path
+
+
+def test_replay_applies_records_by_index():
+    rows = [row("2026-01-01", amount="1.00"), row("2026-01-02", amount="2.00"), row("2026-01-03", amount="3.00")]
+    records = [
+        {"op": "add", "row": row("2026-01-04", amount="4.00")},
+        {"op": "delete", "index": 0},
+        {"op": "update", "index": 1, "row": row("2026-01-03", amount="30.00")},
+        {"op": "update", "index": 9, "row": row("2026-01-05")},
+        {"op": "delete", "index": -1},
+    ]
+    result = txlog.replay(rows, records)
+    assert [item["Amount"] for item in result] == ["2.00", "30.00", "4.00"]
+
+
+def test_journal_add_update_delete(tmp_path):
+    path = write_ledger(tmp_path, [row("2026-01-01", amount="1.00"), row("2026-01-02", amount="2.00")])
+    txlog.log_add(path, row("2026-01-03", amount="3.50"), FIELDS)
+    txlog.log_update(path, 0, row("2026-01-01", "Rent", "10.00"), FIELDS)
+    txlog.log_delete(path, 1, FIELDS)
+
+    rows = txlog.load_rows(path)
+    assert [(item["Category"], item["Amount"]) for item in rows] == [("Rent", "10.00"), ("Food", "3.50")]
+    assert len(txlog.read_journal(path)) == 3
+
+
+def test_compact_folds_journal_into_snapshot(tmp_path):
+    path = write_ledger(tmp_path, [row("2026-01-01", amount="1.00"), row("2026-01-02", amount="2.00")])
+    txlog.log_add(path, row("2026-01-03", amount="3.00"), FIELDS)
+    txlog.log_delete(path, 0, FIELDS)
+    expected = txlog.load_rows(path)
+
+    assert txlog.compact(path, FIELDS)
+    assert not os.path.exists(txlog.journal_path(path))
+    assert txlog.load_rows(path) == expected
+    assert not txlog.compact(path, FIELDS)
+
+
+def test_torn_last_journal_line_is_ignored(tmp_path):
+    path = write_ledger(tmp_path, [row("2026-01-01", amount="1.00")])
+    txlog.log_add(path, row("2026-01-02", amount="2.00"), FIELDS)
+    intact = os.path.getsize(txlog.journal_path(path))
+    with open(txlog.journal_path(path), "ab") as file:
+        file.write(b'{"op": "add", "row": {"Date": "2026-01-03", "Amo')
+
+    records, offset = txlog.tail_journal(path)
+    assert len(records) == 1
+    assert offset == intact
+    assert [item["Amount"] for item in txlog.load_rows(path)] == ["1.00", "2.00"]
+
+    txlog.compact(path, FIELDS)
+    assert [item["Amount"] for item in txlog.load_rows(path)] == ["1.00", "2.00"]
+
+
+def test_tail_journal_resumes_from_offset(tmp_path):
+    path = write_ledger(tmp_path, [])
+    txlog.log_add(path, row("2026-01-01"), FIELDS)
+    first, offset = txlog.tail_journal(path)
+    txlog.log_delete(path, 0, FIELDS)
+    records, end = txlog.tail_journal(path, offset)
+    assert first == [{"op": "add", "row": row("2026-01-01")}]
+    assert records == [{"op": "delete", "index": 0}]
+    assert end == os.path.getsize(txlog.journal_path(path))
+
+
+def test_append_rows_goes_through_the_journal(tmp_path):
+    path = write_ledger(tmp_path, [row("2026-01-01", amount="1.00")])
+    snapshot = os.path.getsize(path)
+    txlog.log_add(path, row("2026-01-02", amount="2.00"), FIELDS)
+    txlog.append_rows(path, [row("2026-01-03", amount="3.00"), row("2026-01-04", amount="4.00")], FIELDS)
+
+    assert os.path.getsize(path) == snapshot
+    assert len(txlog.read_journal(path)) == 3
+    assert [item["Amount"] for item in txlog.load_rows(path)] == ["1.00", "2.00", "3.00", "4.00"]
+
+
+def test_append_rows_compacts_once_the_journal_outgrows_the_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(txlog, "COMPACT_THRESHOLD", 0)
+    path = write_ledger(tmp_path, [row("2026-01-01", amount="1.00")])
+    txlog.append_rows(path, [row("2026-01-02", amount=f"{day}.00") for day in range(2, 40)], FIELDS)
+
+    assert not os.path.exists(txlog.journal_path(path))
+    assert len(txlog.load_rows(path)) == 39
@@ -0,0 +1,243 @@
+import csv
+import json
+import os
+import threading
+import time
+
+import atomic
+import cache
+import locking
+import metrics
+import money
+import partitions
+
+JOURNAL_SUFFIX = ".journal"
+COMPACT_THRESHOLD = 64 * 1024
+COMPACT_INTERVAL = 30
+
+_lock = threading.RLock()
+_journals = {}
+_compactor = None
+
+
+def journal_path(path):
+    return path + JOURNAL_SUFFIX
+
+
+def watched(path):
+    return (path, partitions.manifest_path(path), journal_path(path))
+
+
+def snapshot_signature(path):
+    manifest = cache.file_signature(partitions.manifest_path(path))
+    return manifest if manifest else cache.file_signature(path)
+
+
+def split_original(value, currency=None):
+    # Older files pack the original amount and currency into one "12.00 USD" string.
+    if isinstance(value, str) and " " in value.strip():
+        value, currency = value.split(None, 1)
+    try:
+        cents = money.to_cents(value)
+    except (TypeError, ValueError):
+        cents = 0
+    return cents, (currency or "").strip().upper()
+
+
+def _amount_text(value):
+    try:
+        return money.format_cents(money.to_cents(value or 0))
+    except (TypeError, ValueError):
+        return value
+
+
+def _clean_row(row, fieldnames):
+    if "Amount" in fieldnames:
+        row = dict(row, Amount=_amount_text(row.get("Amount")))
+    if "Currency" in fieldnames:
+        cents, currency = split_original(row.get("Original_Amount"), row.get("Currency"))
+        row = dict(row, Original_Amount=money.format_cents(cents) if cents or currency else "", Currency=currency)
+    return {field: "" if row.get(field) is None else str(row.get(field)) for field in fieldnames}
+
+
+def read_header(path):
+    manifest = partitions.read_manifest(path)
+    if manifest:
+        return manifest["fieldnames"]
+    try:
+        with open(path, "r", newline="", encoding="utf-8") as file:
+            return next(csv.reader(file), None)
+    except FileNotFoundError:
+        return None
+
+
+def append_record(path, record, fieldnames):
+    line = (json.dumps(record) + "\n").encode("utf-8")
+    with _lock, locking.file_lock(path, shared=True):
+        atomic.append_durable(journal_path(path), line)
+        _journals[path] = fieldnames
+    return record
+
+
+def log_add(path, row, fieldnames):
+    return append_record(path, {"op": "add", "row": _clean_row(row, fieldnames)}, fieldnames)
+
+
+def log_update(path, index, row, fieldnames):
+    return append_record(path, {"op": "update", "index": index, "row": _clean_row(row, fieldnames)}, fieldnames)
+
+
+def log_delete(path, index, fieldnames):
+    return append_record(path, {"op": "delete", "index": index}, fieldnames)
+
+
+def read_journal(path):
+    return tail_journal(path)[0]
+
+
+def tail_journal(path, offset=0):
+    records = []
+    start = offset
+    try:
+        with open(journal_path(path), "rb") as file:
+            file.seek(offset)
+            for line in file:
+                # A crash mid-append can leave a torn last line; everything before it is intact.
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                offset += len(line)
+    except FileNotFoundError:
+        pass
+    metrics.add_bytes("read", journal_path(path), offset - start)
+    return records, offset
+
+
+def replay(rows, records):
+    for record in records:
+        op = record.get("op")
+        index = record.get("index")
+        if op == "add":
+            rows.append(record["row"])
+        elif op == "update" and 0 <= index < len(rows):
+            rows[index] = record["row"]
+        elif op == "delete" and 0 <= index < len(rows):
+            rows.pop(index)
+    return rows
+
+
+def load_rows(path):
+    with _lock, locking.file_lock(path, shared=True):
+        rows = []
+        manifest = partitions.read_manifest(path)
+        if manifest:
+            rows = partitions.load_rows(path, manifest)
+        elif os.path.exists(path):
+            with open(path, "r", newline="", encoding="utf-8") as file:
+                rows = list(csv.DictReader(file))
+            metrics.add_file("read", path)
+        return replay(rows, read_journal(path))
+
+
+def _drop_journal(path):
+    try:
+        os.remove(journal_path(path))
+    except FileNotFoundError:
+        pass
+    _journals.pop(path, None)
+
+
+def _remove_flat(path):
+    # Once the partitions are committed the single-file snapshot and its column cache are stale.
+    for stale in (path, path + ".cols"):
+        try:
+            os.remove(stale)
+        except FileNotFoundError:
+            pass
+
+
+def write_snapshot(path, rows, fieldnames):
+    with _lock, locking.file_lock(path):
+        if partitions.PARTITION_BY or partitions.is_partitioned(path):
+            partitions.write_all(path, [_clean_row(row, fieldnames) for row in rows], fieldnames)
+            _remove_flat(path)
+            _drop_journal(path)
+            return
+
+        def write(file):
+            writer = csv.DictWriter(file, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(_clean_row(row, fieldnames) for row in rows)
+
+        atomic.write_atomic(path, write, newline="")
+        _drop_journal(path)
+
+
+def partition(path, fieldnames, by=None, compress_after=None):
+    with _lock, locking.file_lock(path):
+        compact(path, fieldnames)
+        if partitions.is_partitioned(path):
+            return partitions.compress_cold(path, compress_after)
+        partitions.write_all(path, [_clean_row(row, fieldnames) for row in load_rows(path)], fieldnames, by,
+                             compress_after)
+        _remove_flat(path)
+        return True
+
+
+def append_rows(path, rows, fieldnames):
+    # Bulk rows are journalled like any other change, so a crash mid-write leaves at most a torn last line,
+    # which replay skips. Compacting only once the journal outgrows the snapshot keeps a long import linear.
+    data = b"".join((json.dumps({"op": "add", "row": _clean_row(row, fieldnames)}) + "\n").encode("utf-8")
+                    for row in rows)
+    with _lock, locking.file_lock(path):
+        atomic.append_durable(journal_path(path), data)
+        atomic.flush()
+        _journals[path] = fieldnames
+        snapshot_size = os.path.getsize(path) if os.path.exists(path) else 0
+        if os.path.getsize(journal_path(path)) >= max(COMPACT_THRESHOLD, snapshot_size):
+            compact(path, fieldnames)
+
+
+def compact(path, fieldnames):
+    with _lock, locking.file_lock(path):
+        if not os.path.exists(journal_path(path)):
+            return False
+        if partitions.is_partitioned(path):
+            # Only the partitions the journalled changes touch are rewritten.
+            partitions.apply(path, read_journal(path), fieldnames)
+            _drop_journal(path)
+        else:
+            write_snapshot(path, load_rows(path), fieldnames)
+        return True
+
+
+def compact_all(threshold=0):
+    with _lock:
+        pending = list(_journals.items())
+    for path, fieldnames in pending:
+        try:
+            if os.path.getsize(journal_path(path)) >= threshold:
+                compact(path, fieldnames)
+        except FileNotFoundError:
+            with _lock:
+                _journals.pop(path, None)
+
+
+def _compaction_loop(interval, threshold):
+    while True:
+        time.sleep(interval)
+        try:
+            compact_all(threshold)
+        except OSError as e:
+            print(f"Error compacting journal: {e}")
+
+
+def start_compactor(interval=COMPACT_INTERVAL, threshold=COMPACT_THRESHOLD):
+    global _compactor
+    if _compactor is None:
+        _compactor = threading.Thread(target=_compaction_loop, args=(interval, threshold), daemon=True)
+        _compactor.start()
+    return _compactor
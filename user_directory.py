@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import threading
+
+import atomic
+import locking
+import metrics
+from cache import file_signature
+
+
+COMPACT_THRESHOLD = 256 * 1024
+USERS_FILE = "users.json"
+# Written by migrate_shards.py; its presence switches a data directory to the sharded layout.
+LAYOUT_FILE = "layout.json"
+# data_files keys written by older versions; each points at the other spelling.
+DATA_TYPE_ALIASES = {"expenses": "expense", "expense": "expenses"}
+
+
+def is_sharded(data_dir):
+    return os.path.exists(os.path.join(data_dir, LAYOUT_FILE))
+
+
+def shard(username):
+    digest = hashlib.sha1(username.encode("utf-8")).hexdigest()
+    return digest[:2], digest[2:4]
+
+
+def user_root(data_dir, username):
+    # Where a user's files live: data/ab/cd/ when sharded, the data directory itself otherwise.
+    if not is_sharded(data_dir):
+        return data_dir
+    return os.path.join(data_dir, *shard(username))
+
+
+def user_file(data_dir, username, filename):
+    # A name for data_files, relative to the data directory like every other entry there.
+    if not is_sharded(data_dir):
+        return filename
+    return os.path.join(*shard(username), filename)
+
+
+def data_file(record, data_type):
+    data_files = record.get("data_files", {})
+    return data_files.get(data_type) or data_files.get(DATA_TYPE_ALIASES.get(data_type))
+
+
+def open_directory(data_dir):
+    if is_sharded(data_dir):
+        return ShardedDirectory(data_dir)
+    return UserDirectory(os.path.join(data_dir, USERS_FILE))
+
+
+class UserDirectory:
+    def __init__(self, path, compact_threshold=COMPACT_THRESHOLD):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_threshold = compact_threshold
+        self._users = {}
+        self._snapshot = ()
+        self._offset = 0
+        self._lock = threading.RLock()
+
+    def _load_snapshot(self):
+        try:
+            with open(self.path, "r") as file:
+                self._users = json.load(file)
+            metrics.add_file("read", self.path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._users = {}
+        self._snapshot = file_signature(self.path)
+        self._offset = 0
+
+    def _apply(self, entry):
+        if entry.get("record") is None:
+            self._users.pop(entry["user"], None)
+        else:
+            self._users[entry["user"]] = entry["record"]
+
+    def refresh(self):
+        with self._lock, locking.file_lock(self.path, shared=True):
+            if file_signature(self.path) != self._snapshot:
+                self._load_snapshot()
+
+            try:
+                size = os.path.getsize(self.journal_path)
+            except FileNotFoundError:
+                size = 0
+
+            # The journal only shrinks when another process compacted it into a new snapshot.
+            if size < self._offset:
+                self._load_snapshot()
+            if size == self._offset:
+                return
+
+            start = self._offset
+            with open(self.journal_path, "rb") as file:
+                file.seek(self._offset)
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        self._apply(json.loads(line))
+                    except (json.JSONDecodeError, KeyError):
+                        pass
+                    self._offset += len(line)
+            metrics.add_bytes("read", self.journal_path, self._offset - start)
+
+    def get(self, username):
+        self.refresh()
+        return self._users.get(username)
+
+    def __contains__(self, username):
+        return self.get(username) is not None
+
+    def __len__(self):
+        self.refresh()
+        return len(self._users)
+
+    def all(self):
+        self.refresh()
+        return dict(self._users)
+
+    def put(self, username, record):
+        line = (json.dumps({"user": username, "record": record}) + "\n").encode("utf-8")
+        with self._lock:
+            with locking.file_lock(self.path, shared=True):
+                atomic.append_durable(self.journal_path, line)
+            self.refresh()
+            if self._offset >= self.compact_threshold:
+                self.compact()
+
+    def delete(self, username):
+        self.put(username, None)
+
+    def replace_all(self, users):
+        with self._lock, locking.file_lock(self.path):
+            self._users = dict(users)
+            self._write_snapshot()
+
+    def compact(self):
+        with self._lock, locking.file_lock(self.path):
+            self.refresh()
+            if self._offset:
+                self._write_snapshot()
+
+    def _write_snapshot(self):
+        atomic.write_json(self.path, self._users, indent=4)
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        self._snapshot = file_signature(self.path)
+        self._offset = 0
+
+
+class ShardedDirectory:
+    # One UserDirectory per top-level shard, so no single registry file holds every user.
+    def __init__(self, data_dir, compact_threshold=COMPACT_THRESHOLD):
+        self.data_dir = data_dir
+        self.compact_threshold = compact_threshold
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    def _directory(self, top, create=False):
+        if create:
+            os.makedirs(os.path.join(self.data_dir, top), exist_ok=True)
+        elif not os.path.isdir(os.path.join(self.data_dir, top)):
+            return None
+        with self._lock:
+            directory = self._shards.get(top)
+            if directory is None:
+                directory = self._shards[top] = UserDirectory(os.path.join(self.data_dir, top, USERS_FILE),
+                                                              self.compact_threshold)
+            return directory
+
+    def _tops(self):
+        try:
+            names = os.listdir(self.data_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if len(name) == 2 and all(c in "0123456789abcdef" for c in name))
+
+    def get(self, username):
+        directory = self._directory(shard(username)[0])
+        return directory.get(username) if directory is not None else None
+
+    def __contains__(self, username):
+        return self.get(username) is not None
+
+    def __len__(self):
+        return sum(len(self._directory(top)) for top in self._tops())
+
+    def all(self):
+        users = {}
+        for top in self._tops():
+            users.update(self._directory(top).all())
+        return users
+
+    def put(self, username, record):
+        self._directory(shard(username)[0], create=True).put(username, record)
+
+    def delete(self, username):
+        directory = self._directory(shard(username)[0])
+        if directory is not None:
+            directory.delete(username)
+
+    def replace_all(self, users):
+        grouped = {}
+        for username, record in users.items():
+            grouped.setdefault(shard(username)[0], {})[username] = record
+        for top in set(self._tops()) | set(grouped):
+            self._directory(top, create=True).replace_all(grouped.get(top, {}))
+
+    def compact(self):
+        for top in self._tops():
+            self._directory(top).compact()
@@ -0,0 +1,178 @@
+import tkinter as tk
+from tkinter import ttk
+
+import ledger
+
+
+COLUMNS = ["ID", "Date", "Category/Source", "Amount (KES)", "Original Amount", "Notes"]
+
+
+class LedgerView:
+    def __init__(self, transactions):
+        self.ledger = transactions
+        self.order = None
+        self.sort_column = None
+        self.reverse = False
+        self.filter_text = ""
+        self.start = None
+        self.end = None
+
+    def __len__(self):
+        return len(self.ledger) if self.order is None else len(self.order)
+
+    def index(self, position):
+        return position if self.order is None else int(self.order[position])
+
+    def values(self, position):
+        index = self.index(position)
+        row = self.ledger.row(index)
+        return (index + 1, row["Date"], row[self.ledger.label_field], f"{row['Amount']:.2f}",
+                ledger.original_text(row), row["Notes"])
+
+    def _matching(self):
+        text = self.filter_text.lower()
+        if not text and self.start is None and self.end is None:
+            return None
+        if self.start is None and self.end is None:
+            candidates = range(len(self.ledger))
+        else:
+            candidates = self.ledger.indices_between(self.start, self.end)
+        if not text:
+            return candidates
+        labels = {code for code, name in enumerate(self.ledger.label_names) if text in name.lower()}
+        codes = self.ledger.labels
+        notes = self.ledger.notes
+        return [index for index in candidates if codes[index] in labels or text in notes[index].lower()]
+
+    def _rebuild(self):
+        import numpy as np
+
+        matching = self._matching()
+        if self.sort_column is None:
+            self.order = None if matching is None else np.array(matching, dtype=np.int64)
+            return
+
+        if self.sort_column == "Date":
+            keys = np.frombuffer(self.ledger.dates, dtype=np.intc)
+        elif self.sort_column == "Amount (KES)":
+            keys = np.frombuffer(self.ledger.amounts, dtype=np.int64)
+        elif self.sort_column == "Category/Source":
+            ranks = np.empty(len(self.ledger.label_names), dtype=np.int64)
+            ranks[np.argsort(np.array(self.ledger.label_names, dtype=object))] = np.arange(len(ranks))
+            keys = ranks[np.frombuffer(self.ledger.labels, dtype=np.intc)] if len(ranks) else np.zeros(0)
+        else:
+            keys = np.arange(len(self.ledger))
+
+        candidates = np.arange(len(self.ledger)) if matching is None else np.array(matching, dtype=np.int64)
+        order = candidates[np.argsort(keys[candidates], kind="stable")]
+        self.order = order[::-1] if self.reverse else order
+
+    def sort(self, column):
+        if column == self.sort_column:
+            self.reverse = not self.reverse
+        else:
+            self.sort_column = column
+            self.reverse = False
+        self._rebuild()
+
+    def filter(self, text, start=None, end=None):
+        self.filter_text = text.strip()
+        self.start = start
+        self.end = end
+        self._rebuild()
+
+
+class VirtualTreeview(ttk.Frame):
+    def __init__(self, master, view, columns=COLUMNS, page_size=25, buffer=50):
+        super().__init__(master)
+        self.view = view
+        self.page_size = page_size
+        self.buffer = buffer
+        self.offset = 0
+        self._cache = {}
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=page_size)
+        for col in columns:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort(c))
+            self.tree.column(col, width=120, anchor=tk.W)
+        self.tree.column("ID", width=50)
+        self.tree.column("Notes", width=200)
+
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill=tk.BOTH, expand=True)
+
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_by(-1 if e.delta > 0 else 1) or "break")
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-1) or "break")
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(1) or "break")
+        self.tree.bind("<Prior>", lambda e: self.scroll_by(-self.page_size) or "break")
+        self.tree.bind("<Next>", lambda e: self.scroll_by(self.page_size) or "break")
+        self.tree.bind("<Configure>", self.on_resize)
+
+        self.refresh()
+
+    def on_resize(self, event):
+        row_height = max(int(ttk.Style().lookup("Treeview", "rowheight") or 20), 1)
+        rows = max(event.height // row_height - 1, 1)
+        if rows != self.page_size:
+            self.page_size = rows
+            self.tree.configure(height=rows)
+            self.refresh()
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.view)))
+        elif unit == "pages":
+            self.scroll_by(int(amount) * self.page_size)
+        else:
+            self.scroll_by(int(amount))
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.offset + rows)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, max(len(self.view) - self.page_size, 0)))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+
+    def _row(self, position):
+        values = self._cache.get(position)
+        if values is None:
+            values = self._cache[position] = self.view.values(position)
+        return values
+
+    def refresh(self):
+        total = len(self.view)
+        end = min(self.offset + self.page_size, total)
+
+        low, high = self.offset - self.buffer, end + self.buffer
+        self._cache = {position: values for position, values in self._cache.items() if low <= position < high}
+
+        items = self.tree.get_children()
+        needed = end - self.offset
+        for iid in items[needed:]:
+            self.tree.delete(iid)
+        for slot, position in enumerate(range(self.offset, end)):
+            if slot < len(items):
+                self.tree.item(items[slot], values=self._row(position))
+            else:
+                self.tree.insert("", tk.END, values=self._row(position))
+
+        if total:
+            self.scrollbar.set(self.offset / total, end / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def reset(self):
+        self.offset = 0
+        self._cache = {}
+        self.refresh()
+
+    def sort(self, column):
+        self.view.sort(column)
+        self.reset()
+
+    def filter(self, text, start=None, end=None):
+        self.view.filter(text, start, end)
+        self.reset()